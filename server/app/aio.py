@@ -0,0 +1,135 @@
+import asyncio
+import contextvars
+import pathlib
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from . import config, database, profiling
+
+# Async read path. A read-only handler is an `async def` that awaits
+# aio.lookup(request, fn, ...) or aio.query(request, fn, ...). fn(db, ...) runs
+# on a dedicated thread with a read-only connection (mode=ro), so reads take no
+# slot in FastAPI's shared threadpool and cannot write by accident.
+#
+# There are two lanes, each with its own threads and connections. "lookup" is
+# for primary-key reads. "query" is for lists, searches and reports. A burst of
+# slow searches only queues behind itself, and GET /customers/{id} still runs
+# at once.
+#
+# Every job has a deadline (READ_TIMEOUT_MS), enforced by a progress handler
+# that SQLite calls every PROGRESS_STEPS VM instructions. The same handler
+# aborts the query when the client disconnects.
+PROGRESS_STEPS = 1000
+DISCONNECT_POLL_SECONDS = 0.05
+
+class _Job:
+    __slots__ = ('deadline', 'cancelled')
+
+    def __init__(self, timeout_ms):
+        self.deadline = time.monotonic() + timeout_ms / 1000
+        self.cancelled = False
+
+    def should_stop(self):
+        return self.cancelled or time.monotonic() > self.deadline
+
+def connect_readonly(path):
+    conn = database.open_connection(f'{pathlib.Path(path).absolute().as_uri()}?mode=ro', uri=True)
+    return database.configure_connection(conn)
+
+class ReadPool:
+    def __init__(self, name, threads):
+        self.name = name
+        self.threads = threads
+        self._executor = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conns = []
+
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=max(1, self.threads), thread_name_prefix=f'sqlite-{self.name}')
+            return self._executor
+
+    def _connection(self):
+        conns = getattr(self._local, 'conns', None)
+        if conns is None:
+            conns = self._local.conns = {}
+        conn = conns.get(database.DB_PATH)
+        if conn is None:
+            conn = conns[database.DB_PATH] = connect_readonly(database.DB_PATH)
+            local = self._local
+            # Non-zero aborts the running statement with "interrupted"
+            conn.set_progress_handler(lambda: local.job is not None and local.job.should_stop(), PROGRESS_STEPS)
+            with self._lock:
+                self._conns.append(conn)
+        return conn
+
+    def _call(self, job, fn, args):
+        # Cancelled or out of time while waiting for a free thread
+        if job.cancelled:
+            raise HTTPException(status_code=499, detail='Client closed request')
+        if job.should_stop():
+            raise HTTPException(status_code=503, detail='Timed out waiting for a database connection')
+        db = self._connection()
+        self._local.job = job
+        try:
+            return fn(db, *args)
+        except sqlite3.OperationalError as e:
+            if str(e) != 'interrupted':
+                raise
+            if job.cancelled:
+                raise HTTPException(status_code=499, detail='Client closed request')
+            raise HTTPException(status_code=504, detail='Query took too long')
+        finally:
+            self._local.job = None
+            if db.in_transaction:
+                db.rollback()
+
+    async def run(self, request, fn, *args, timeout_ms=None):
+        job = _Job(timeout_ms or config.READ_TIMEOUT_MS)
+        if profiling.ENABLED:
+            fn = profiling.wrap(fn)
+        # The request's context goes along, so app/metrics.py can attribute its statements
+        context = contextvars.copy_context()
+        future = asyncio.get_running_loop().run_in_executor(self.executor(), context.run, self._call, job, fn, args)
+        try:
+            while True:
+                done, _ = await asyncio.wait({future}, timeout=DISCONNECT_POLL_SECONDS)
+                if done:
+                    return future.result()
+                if request is not None and await request.is_disconnected():
+                    job.cancelled = True
+                    future.cancel()
+                    raise HTTPException(status_code=499, detail='Client closed request')
+        except asyncio.CancelledError:
+            job.cancelled = True
+            future.cancel()
+            raise
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            conns, self._conns = self._conns, []
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+lookups = ReadPool('lookup', config.READ_LOOKUP_THREADS)
+queries = ReadPool('query', config.READ_QUERY_THREADS)
+
+async def lookup(request, fn, *args, timeout_ms=None):
+    return await lookups.run(request, fn, *args, timeout_ms=timeout_ms)
+
+async def query(request, fn, *args, timeout_ms=None):
+    return await queries.run(request, fn, *args, timeout_ms=timeout_ms)
+
+def close_all():
+    lookups.close()
+    queries.close()
@@ -0,0 +1,101 @@
+import sqlite3
+from fastapi import HTTPException
+from pydantic import ValidationError
+from . import ledger
+
+# Batch writes: validate every item, check all referenced customers with one
+# query, then insert with executemany inside a single transaction (one fsync).
+#   atomic      - any invalid item rejects the whole batch, nothing is written
+#   best_effort - valid items are written, invalid ones are reported per item
+BATCH_MODES = ('atomic', 'best_effort')
+MAX_BATCH_ITEMS = 1000
+
+def _validation_message(error):
+    return '; '.join(f"{'.'.join(str(part) for part in e['loc']) or 'item'}: {e['msg']}" for e in error.errors())
+
+def check_customers(db, accepted):
+    found = ledger.customer_balances(db, (obj.CustomerId for _, obj in accepted))
+    return {index: 'Customer not found' for index, obj in accepted if obj.CustomerId and obj.CustomerId not in found}
+
+def insert_rows(table, columns):
+    column_sql = ', '.join(['Id', *columns])
+    marks = ', '.join('?' for _ in range(len(columns) + 1))
+    sql = f'INSERT INTO {table} ({column_sql}) VALUES ({marks})'
+
+    def insert(db, accepted, mode):
+        rows = [(ledger.new_id(), *(getattr(obj, column) for column in columns)) for _, obj in accepted]
+        # executemany keeps the rows before a failing one, so undo them too
+        db.execute('SAVEPOINT batch_rows')
+        try:
+            db.executemany(sql, rows)
+            db.execute('RELEASE batch_rows')
+            return {index: {"Id": row[0]} for (index, _), row in zip(accepted, rows)}, {}
+        except sqlite3.IntegrityError:
+            db.execute('ROLLBACK TO batch_rows')
+            db.execute('RELEASE batch_rows')
+            if mode == 'atomic':
+                raise
+
+        # best_effort: isolate the offending rows with a savepoint per item
+        created, errors = {}, {}
+        for (index, _), row in zip(accepted, rows):
+            db.execute('SAVEPOINT batch_item')
+            try:
+                db.execute(sql, row)
+                created[index] = {"Id": row[0]}
+            except sqlite3.IntegrityError as e:
+                db.execute('ROLLBACK TO batch_item')
+                errors[index] = str(e)
+            db.execute('RELEASE batch_item')
+        return created, errors
+
+    return insert
+
+def run_batch(db, model, items, mode, insert, check=check_customers):
+    if mode not in BATCH_MODES:
+        raise HTTPException(status_code=400, detail=f'mode must be one of {list(BATCH_MODES)}')
+    if not items:
+        raise HTTPException(status_code=400, detail='No items to create')
+    if len(items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=413, detail=f'At most {MAX_BATCH_ITEMS} items per batch')
+
+    validation_errors = {}
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, model.model_validate(item)))
+        except ValidationError as e:
+            validation_errors[index] = _validation_message(e)
+
+    def attempt():
+        errors = dict(validation_errors)
+        created = {}
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            errors.update(check(db, valid))
+            accepted = [(index, obj) for index, obj in valid if index not in errors]
+            if accepted and not (errors and mode == 'atomic'):
+                created, insert_errors = insert(db, accepted, mode)
+                errors.update(insert_errors)
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        return created, errors
+
+    try:
+        created, errors = ledger.retry_busy(attempt)
+    except sqlite3.IntegrityError as e:
+        raise HTTPException(status_code=400, detail={"message": f'Batch rejected, nothing was created: {e}', "results": []})
+
+    results = []
+    for index in range(len(items)):
+        if index in created:
+            results.append({"index": index, "status": "created", **created[index]})
+        else:
+            results.append({"index": index, "status": "error", "detail": errors.get(index, 'Not created because another item failed')})
+
+    if errors and mode == 'atomic':
+        raise HTTPException(status_code=400, detail={"message": 'Batch rejected, nothing was created', "results": results})
+
+    return {"mode": mode, "created": len(created), "failed": len(items) - len(created), "results": results}
@@ -0,0 +1,216 @@
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from datetime import datetime
+from urllib.parse import parse_qsl, urlencode
+from . import config
+
+# Request capture for replaying real traffic (benchmarks/replay.py). Off unless
+# SWASTIK_CAPTURE_DIR is set, in which case main.py adds CaptureMiddleware and
+# every request becomes one JSON line in gzip files in that directory:
+#
+#   {"ts": 1718000000.123, "method": "GET", "path": "/api/v1/customers",
+#    "query": "page=2", "content_type": null, "body": null, "size": 0,
+#    "status": 200, "ms": 3.21}
+#
+# Sanitising: headers are never recorded, uploads (multipart) are recorded by
+# size only, JSON fields named in CAPTURE_REDACT are replaced by a pseudonym,
+# and so is every query parameter value except those of the paging and
+# formatting parameters in CAPTURE_QUERY_KEEP: ?q= searches and lookups carry
+# names and phone numbers, and a new parameter should not leak until it is
+# listed. Pseudonyms are keyed with a per-process secret but stable within the
+# process, so a phone number posted twice still repeats.
+#
+# The request path only queues a tuple. Redacting, encoding and compression
+# run on a background thread; if it falls behind, records are dropped (and
+# counted) rather than slowing requests down. A file is rotated at
+# CAPTURE_MAX_BYTES and the newest CAPTURE_FILES files are kept.
+FILE_PREFIX = 'capture-'
+FILE_SUFFIX = '.ndjson.gz'
+QUEUE_SIZE = 10000
+FLUSH_SECONDS = 1.0
+
+_salt = secrets.token_bytes(16)
+
+def _names(setting):
+    return {name.strip().lower() for name in setting.split(',') if name.strip()}
+
+def _redacted_names():
+    return _names(config.CAPTURE_REDACT)
+
+def _kept_query_names():
+    return _names(config.CAPTURE_QUERY_KEEP) - _redacted_names()
+
+def pseudonym(value):
+    return '~' + hmac.new(_salt, str(value).encode(), hashlib.sha256).hexdigest()[:12]
+
+def redact(value, names):
+    if isinstance(value, dict):
+        return {key: pseudonym(item) if key.lower() in names and item is not None else redact(item, names)
+                for key, item in value.items()}
+    if isinstance(value, list):
+        return [redact(item, names) for item in value]
+    return value
+
+def redact_query(query, keep):
+    pairs = parse_qsl(query, keep_blank_values=True)
+    if all(key.lower() in keep for key, _ in pairs):
+        return query
+    return urlencode([(key, value if key.lower() in keep else pseudonym(value)) for key, value in pairs])
+
+def _body(content_type, chunks, size):
+    if not chunks or size > config.CAPTURE_MAX_BODY:
+        return None
+    data = b''.join(chunks)
+    if 'json' in content_type:
+        try:
+            return json.loads(data)
+        except ValueError:
+            pass
+    return data.decode('utf-8', errors='replace')
+
+class Recorder:
+    def __init__(self, directory):
+        self.directory = directory
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.dropped = 0
+
+    def record(self, entry):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='request-capture', daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _line(self, entry, names, keep):
+        ts, method, path, query, content_type, upload, chunks, size, status, ms = entry
+        return {
+            "ts": round(ts, 6), "method": method, "path": path, "query": redact_query(query, keep),
+            "content_type": content_type or None,
+            "body": None if upload else redact(_body(content_type, chunks, size), names),
+            "size": size, "status": status, "ms": round(ms, 3),
+        }
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        name = f'{FILE_PREFIX}{datetime.now().strftime("%Y%m%d-%H%M%S-%f")}-{os.getpid()}{FILE_SUFFIX}'
+        raw = open(os.path.join(self.directory, name), 'wb')
+        self._prune()
+        return raw, gzip.GzipFile(fileobj=raw, mode='wb')
+
+    def _prune(self):
+        names = sorted(name for name in os.listdir(self.directory) if name.startswith(FILE_PREFIX) and name.endswith(FILE_SUFFIX))
+        for name in names[:-max(1, config.CAPTURE_FILES)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def _loop(self):
+        names = _redacted_names()
+        keep = _kept_query_names()
+        raw = out = None
+        dirty = False
+        reported = 0
+        try:
+            while True:
+                try:
+                    entry = self._queue.get(timeout=FLUSH_SECONDS)
+                except queue.Empty:
+                    # Idle: make what was written so far readable
+                    if dirty:
+                        out.flush()
+                        dirty = False
+                    continue
+                if entry is None:
+                    break
+                if out is None or raw.tell() >= config.CAPTURE_MAX_BYTES:
+                    if out is not None:
+                        out.close()
+                        raw.close()
+                    raw, out = self._open()
+                lines = [self._line(entry, names, keep)]
+                with self._lock:
+                    dropped = self.dropped
+                if dropped != reported:
+                    lines.append({"ts": round(entry[0], 6), "dropped": dropped - reported})
+                    reported = dropped
+                for line in lines:
+                    out.write(json.dumps(line, separators=(',', ':')).encode() + b'\n')
+                dirty = True
+        finally:
+            if out is not None:
+                out.close()
+                raw.close()
+
+    def close(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+recorder = Recorder(config.CAPTURE_DIR)
+
+def _header(scope, name):
+    for key, value in scope.get('headers', ()):
+        if key == name:
+            return value.decode('latin-1')
+    return ''
+
+class CaptureMiddleware:
+    # Plain ASGI rather than BaseHTTPMiddleware: nothing is buffered, and
+    # streamed responses are timed until their last chunk
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        started = time.time()
+        clock = time.perf_counter()
+        content_type = _header(scope, b'content-type')
+        upload = content_type.startswith('multipart/')
+        chunks = []
+        size = 0
+        status = 500
+
+        async def capture_receive():
+            nonlocal size
+            message = await receive()
+            if message['type'] == 'http.request':
+                body = message.get('body', b'')
+                size += len(body)
+                if not upload and size <= config.CAPTURE_MAX_BODY:
+                    chunks.append(body)
+            return message
+
+        async def capture_send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        finally:
+            recorder.record((
+                started, scope['method'], scope['path'], scope.get('query_string', b'').decode('latin-1'),
+                content_type, upload, chunks, size, status, (time.perf_counter() - clock) * 1000
+            ))
+
+def close():
+    recorder.close()
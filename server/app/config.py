@@ -0,0 +1,107 @@
+import os
+import re
+
+# All settings can be overridden through SWASTIK_* environment variables.
+
+def _env_str(name, default):
+    return os.environ.get(f'SWASTIK_{name}', default)
+
+def _env_int(name, default):
+    value = os.environ.get(f'SWASTIK_{name}')
+    return int(value) if value not in (None, '') else default
+
+def _env_float(name, default):
+    value = os.environ.get(f'SWASTIK_{name}')
+    return float(value) if value not in (None, '') else default
+
+# SQLite connection tuning
+SQLITE_SYNCHRONOUS = _env_str('SQLITE_SYNCHRONOUS', 'NORMAL').upper()
+SQLITE_CACHE_SIZE = _env_int('SQLITE_CACHE_SIZE', -65536)  # negative values are KiB, i.e. 64 MiB
+SQLITE_MMAP_SIZE = _env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+SQLITE_TEMP_STORE = _env_str('SQLITE_TEMP_STORE', 'MEMORY').upper()
+SQLITE_BUSY_TIMEOUT_MS = _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000)
+
+if SQLITE_SYNCHRONOUS not in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+    raise ValueError(f'Invalid SWASTIK_SQLITE_SYNCHRONOUS: {SQLITE_SYNCHRONOUS}')
+if SQLITE_TEMP_STORE not in ('DEFAULT', 'FILE', 'MEMORY'):
+    raise ValueError(f'Invalid SWASTIK_SQLITE_TEMP_STORE: {SQLITE_TEMP_STORE}')
+
+# Ledger posting: retries when SQLite reports the database as busy/locked
+LEDGER_BUSY_RETRIES = _env_int('LEDGER_BUSY_RETRIES', 5)
+LEDGER_BUSY_BACKOFF_MS = _env_int('LEDGER_BUSY_BACKOFF_MS', 10)
+
+# Photo certificate media (content-addressed files, see app/media.py)
+MEDIA_DIR = _env_str('MEDIA_DIR', '')  # empty = a media folder next to the database
+MEDIA_MAX_BYTES = _env_int('MEDIA_MAX_BYTES', 25 * 1024 * 1024)
+MEDIA_THUMBNAIL_SIZE = _env_int('MEDIA_THUMBNAIL_SIZE', 256)  # 128, 256 or 512
+
+if MEDIA_THUMBNAIL_SIZE not in (128, 256, 512):
+    raise ValueError(f'Invalid SWASTIK_MEDIA_THUMBNAIL_SIZE: {MEDIA_THUMBNAIL_SIZE}')
+
+# Customer statements: a balance checkpoint is kept every N credit history
+# entries, and a page holds STATEMENT_PAGE_LIMIT entries unless ?limit= says
+STATEMENT_CHECKPOINT_INTERVAL = _env_int('STATEMENT_CHECKPOINT_INTERVAL', 500)
+STATEMENT_PAGE_LIMIT = _env_int('STATEMENT_PAGE_LIMIT', 500)
+
+# Revenue reports (see app/reports.py) bucket sales by the shop's local day.
+# Timestamps are stored in UTC, so this is the local offset from UTC as
+# +HH:MM or -HH:MM; India is +05:30.
+REPORT_UTC_OFFSET = _env_str('REPORT_UTC_OFFSET', '+05:30')
+
+_offset = re.fullmatch(r'([+-])(\d{2}):([0-5]\d)', REPORT_UTC_OFFSET)
+if not _offset or int(_offset.group(2)) > 14:
+    raise ValueError(f'Invalid SWASTIK_REPORT_UTC_OFFSET: {REPORT_UTC_OFFSET}')
+REPORT_UTC_OFFSET_MINUTES = (-1 if _offset.group(1) == '-' else 1) * (int(_offset.group(2)) * 60 + int(_offset.group(3)))
+
+# Async read path (see app/aio.py): read-only connection threads per lane and
+# the longest a read may run before it is aborted
+READ_LOOKUP_THREADS = _env_int('READ_LOOKUP_THREADS', 4)
+READ_QUERY_THREADS = _env_int('READ_QUERY_THREADS', 4)
+READ_TIMEOUT_MS = _env_int('READ_TIMEOUT_MS', 15000)
+
+# Single writer (see app/writer.py): most jobs per group commit, and how long a
+# batch is held open for more when several writes are already waiting. 0 still
+# groups every write that queued while the previous batch was committing.
+WRITE_BATCH_MAX = _env_int('WRITE_BATCH_MAX', 128)
+WRITE_BATCH_WINDOW_MS = _env_int('WRITE_BATCH_WINDOW_MS', 0)
+
+# Metrics at GET /metrics (see app/metrics.py). Each worker process writes its
+# totals to METRICS_DIR (default: a folder in the system temp directory) every
+# METRICS_FLUSH_MS so any worker can report for all of them.
+#
+# Metrics and the slow-query log are off by default: either one wraps every
+# connection and cursor in Python (app/database.py), which about doubles the
+# cost of a point lookup.
+METRICS_ENABLED = _env_int('METRICS_ENABLED', 0)
+METRICS_DIR = _env_str('METRICS_DIR', '')
+METRICS_FLUSH_MS = _env_int('METRICS_FLUSH_MS', 5000)
+
+# Slow-query log (see app/querylog.py): statements that take at least this
+# long are logged with their query plan and listed at GET /admin/slow-queries.
+# 0 (the default) turns it off; 100 is a good start.
+SLOW_QUERY_MS = _env_int('SLOW_QUERY_MS', 0)
+
+# On-demand profiling (see app/profiling.py): off unless a directory is set.
+# Requests with an X-Profile: 1 header or a profile=1 query parameter are
+# profiled, and so is a PROFILE_SAMPLE_RATE share (0 to 1) of all requests.
+# Stacks are sampled every PROFILE_INTERVAL_MS and the newest PROFILE_FILES
+# profiles are kept.
+PROFILE_DIR = _env_str('PROFILE_DIR', '')
+PROFILE_SAMPLE_RATE = _env_float('PROFILE_SAMPLE_RATE', 0.0)
+PROFILE_INTERVAL_MS = _env_int('PROFILE_INTERVAL_MS', 1)
+PROFILE_FILES = _env_int('PROFILE_FILES', 200)
+
+# Request capture for replay (see app/capture.py): off unless a directory is
+# set. Files rotate at CAPTURE_MAX_BYTES (compressed) and the newest
+# CAPTURE_FILES are kept. CAPTURE_REDACT lists JSON fields recorded as
+# pseudonyms. Query parameter values are pseudonyms too (search terms are
+# names and phone numbers), except for the parameters in CAPTURE_QUERY_KEEP.
+CAPTURE_DIR = _env_str('CAPTURE_DIR', '')
+CAPTURE_MAX_BYTES = _env_int('CAPTURE_MAX_BYTES', 64 * 1024 * 1024)
+CAPTURE_FILES = _env_int('CAPTURE_FILES', 20)
+CAPTURE_MAX_BODY = _env_int('CAPTURE_MAX_BODY', 1024 * 1024)
+CAPTURE_REDACT = _env_str('CAPTURE_REDACT', 'Name,Phone,Notes')
+CAPTURE_QUERY_KEEP = _env_str(
+    'CAPTURE_QUERY_KEEP',
+    'page,limit,cursor,include_total,fields,format,from,to,gzip,group_by,table,mode,status,order,route,size,profile'
+)
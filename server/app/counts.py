@@ -0,0 +1,85 @@
+import argparse
+import sys
+from . import migrate
+
+# Live-row counts are maintained by the *_count_* triggers of the schema and
+# read from rowcounts in O(1). CustomerId '' holds the table-wide count.
+# While an upgraded database is still backfilling rowcounts, counts come from
+# the tables themselves.
+COUNTED_TABLES = [
+    'customers', 'credithistory', 'globals', 'goldcertificate',
+    'goldtest', 'photocertificate', 'silvercertificate', 'weightlosshistory'
+]
+PER_CUSTOMER_TABLES = ['credithistory', 'weightlosshistory']
+
+def get_count(db, table, customer_id=''):
+    if not migrate.rollups_ready(db):
+        if customer_id:
+            cur = db.execute(f'SELECT COUNT(*) FROM {table} WHERE CustomerId = ? AND DeletedAt IS NULL', (customer_id,))
+        else:
+            cur = db.execute(f'SELECT COUNT(*) FROM {table} WHERE DeletedAt IS NULL')
+        return cur.fetchone()[0]
+    cur = db.execute('SELECT Count FROM rowcounts WHERE TableName = ? AND CustomerId = ?', (table, customer_id))
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+def _actual_counts(db):
+    counts = {}
+    for table in COUNTED_TABLES:
+        cur = db.execute(f'SELECT COUNT(*) FROM {table} WHERE DeletedAt IS NULL')
+        counts[(table, '')] = cur.fetchone()[0]
+    for table in PER_CUSTOMER_TABLES:
+        cur = db.execute(f'SELECT CustomerId, COUNT(*) FROM {table} WHERE DeletedAt IS NULL GROUP BY CustomerId')
+        for customer_id, count in cur:
+            counts[(table, customer_id)] = count
+    return counts
+
+def verify_counts(db):
+    stored = {(row[0], row[1]): row[2] for row in db.execute('SELECT TableName, CustomerId, Count FROM rowcounts')}
+    actual = _actual_counts(db)
+    drift = []
+    for key in sorted(set(stored) | set(actual)):
+        expected, found = actual.get(key, 0), stored.get(key, 0)
+        if expected != found:
+            drift.append({"table": key[0], "customer_id": key[1] or None, "stored": found, "actual": expected})
+    return drift
+
+def rebuild_counts(db):
+    # BEGIN IMMEDIATE keeps writers (and their triggers) out while we recount
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        db.execute('DELETE FROM rowcounts')
+        db.executemany(
+            'INSERT INTO rowcounts (TableName, CustomerId, Count) VALUES (?, ?, ?)',
+            ((table, customer_id, count) for (table, customer_id), count in _actual_counts(db).items())
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+def ensure_counts(db):
+    # Databases created before rowcounts existed start with an empty table
+    if not db.execute('SELECT 1 FROM rowcounts LIMIT 1').fetchone():
+        rebuild_counts(db)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m app.counts', description='Verify or rebuild maintained row counts')
+    parser.add_argument('command', choices=['verify', 'repair'])
+    args = parser.parse_args(argv)
+
+    from .database import get_db, init_db
+    init_db()
+    with get_db() as db:
+        drift = verify_counts(db)
+        for item in drift:
+            print(f"{item['table']:<20} {item['customer_id'] or '*':<20} stored={item['stored']} actual={item['actual']}")
+        if args.command == 'repair' and drift:
+            rebuild_counts(db)
+            print(f'Rebuilt row counts ({len(drift)} entries had drifted)')
+        elif not drift:
+            print('Row counts are consistent')
+    return 1 if drift and args.command == 'verify' else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
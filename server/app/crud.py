@@ -0,0 +1,185 @@
+import sqlite3
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+from fastapi import Body, HTTPException, Query, Request, Response
+from . import aio, batch, etag, export, fields, responses, writer
+from .pagination import paginate
+from .schemas import BatchResponse, PaginatedResponse, PaginationParams
+
+# Table-driven CRUD routes. A Resource describes one table; add_routes()
+# registers the standard create / batch / list / export / get / update /
+# delete endpoints for it. Reads are async and run on the read-only pools in
+# app/aio.py; writes go through the single writer in app/writer.py. Every write is a single INSERT or UPDATE with
+# RETURNING *, so a request is one statement in one transaction instead of
+# check + write + commit + re-select.
+#
+# SQL text is built once per (table, column set) and cached, which also keeps
+# the text identical between calls so sqlite3's statement cache reuses the
+# prepared statement.
+
+class Resource:
+    def __init__(self, table, create_model, response_model, label, name, plural,
+                 update_model=None, customer_column='CustomerId', export_customer_column=None,
+                 unique_messages=None):
+        self.table = table
+        self.create_model = create_model
+        self.response_model = response_model
+        # Customers and the credit ledger have their own update/create rules
+        self.update_model = update_model
+        self.label = label
+        self.name = name
+        self.plural = plural
+        # Column referencing customers(Id); None for the customers table itself
+        self.customer_column = customer_column
+        self.export_customer_column = export_customer_column or customer_column
+        # {column: message template} for UNIQUE violations, answered with 409
+        self.unique_messages = unique_messages or {}
+        self.columns = tuple(create_model.model_fields)
+
+@lru_cache(maxsize=None)
+def insert_sql(table, columns, customer_column=None):
+    column_sql = ', '.join(columns)
+    values_sql = ', '.join(f':{column}' for column in columns)
+    if not customer_column:
+        return f'INSERT INTO {table} ({column_sql}) VALUES ({values_sql}) RETURNING *'
+    # Inserts nothing (and returns no row) when the customer is missing or deleted
+    return (
+        f'INSERT INTO {table} ({column_sql}) SELECT {values_sql} '
+        f'WHERE :{customer_column} IS NULL OR EXISTS '
+        f'(SELECT 1 FROM customers WHERE Id = :{customer_column} AND DeletedAt IS NULL) '
+        f'RETURNING *'
+    )
+
+@lru_cache(maxsize=None)
+def update_sql(table, columns):
+    assignments = ', '.join(f'{column} = :{column}' for column in columns)
+    # RETURNING runs before AFTER triggers, so stamp LastModifiedDate here
+    # rather than leaving it to the *_touch_lastmodified trigger
+    assignments += ", LastModifiedDate = strftime('%Y-%m-%d %H:%M:%f', 'now')"
+    return f'UPDATE {table} SET {assignments} WHERE Id = :_id AND DeletedAt IS NULL RETURNING *'
+
+def _write(db, resource, sql, params):
+    try:
+        # fetchall() runs the statement to completion before the commit
+        rows = db.execute(sql, params).fetchall()
+        db.commit()
+    except sqlite3.IntegrityError as e:
+        db.rollback()
+        for column, message in resource.unique_messages.items():
+            if str(e).endswith(f'{resource.table}.{column}'):
+                raise HTTPException(status_code=409, detail=message.format(**params))
+        raise HTTPException(status_code=400, detail=str(e))
+    return dict(rows[0]) if rows else None
+
+def create_row(db, resource, obj):
+    values = obj.model_dump()
+    row = _write(db, resource, insert_sql(resource.table, resource.columns, resource.customer_column), values)
+    if row is None:
+        raise HTTPException(status_code=404, detail='Customer not found')
+    return row
+
+def update_row(db, resource, row_id, obj):
+    return update_values(db, resource, row_id, obj.model_dump(exclude_unset=True))
+
+def update_values(db, resource, row_id, values):
+    if not values:
+        raise HTTPException(status_code=400, detail='No fields to update')
+    row = _write(db, resource, update_sql(resource.table, tuple(values)), {**values, '_id': row_id})
+    if row is None:
+        raise HTTPException(status_code=404, detail=f'{resource.label} not found')
+    return row
+
+def delete_row(db, resource, row_id):
+    db.execute(f'UPDATE {resource.table} SET DeletedAt = CURRENT_TIMESTAMP WHERE Id = ? AND DeletedAt IS NULL', (row_id,))
+    db.commit()
+    return {"message": f'{resource.label} deleted successfully'}
+
+def get_row(db, resource, row_id, columns=None):
+    select = fields.select_list(columns) if columns else '*'
+    row = db.execute(f'SELECT {select} FROM {resource.table} WHERE Id = ? AND DeletedAt IS NULL', (row_id,)).fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail=f'{resource.label} not found')
+    return dict(row)
+
+def add_routes(router, resource, create=True, bulk=True, batch_insert=None, customer_lists=False):
+    # Registration order matters: /<table>/batch and /<table>/export must come
+    # before /<table>/{item_id}. Routes a router defines itself for the same
+    # table should be added before calling this.
+    r = resource
+    path = f'/{r.table}'
+    create_model = r.create_model
+
+    if create:
+        async def create_item(item: create_model):
+            return await writer.run(create_row, r, item)
+        router.add_api_route(path, create_item, methods=['POST'], response_model=r.response_model,
+                             status_code=201, name=f'create_{r.name}')
+
+    if bulk:
+        insert = batch_insert or batch.insert_rows(r.table, list(r.columns))
+
+        async def create_batch(items: List[Dict[str, Any]] = Body(...), mode: str = Query('atomic', pattern='^(atomic|best_effort)$')):
+            return await writer.run(batch.run_batch, create_model, items, mode, insert)
+        router.add_api_route(f'{path}/batch', create_batch, methods=['POST'], response_model=BatchResponse,
+                             response_model_exclude_none=True, status_code=201, name=f'create_{r.plural}_batch')
+
+    async def list_items(request: Request, response: Response, page: int = Query(1, ge=1), limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = Query(None), include_total: bool = Query(True), fields_param: Optional[str] = Query(None, alias='fields', description='Comma-separated columns to return, or * for all')):
+        pagination = PaginationParams(page=page, limit=limit, cursor=cursor, include_total=include_total)
+        columns = fields.parse_fields(r.response_model, fields_param, heavy=False)
+
+        def read(db):
+            not_modified = etag.check_list(request, response, db, r.table)
+            if not_modified:
+                return not_modified
+            return responses.json_response(paginate(db, r.table, pagination, columns=columns), response)
+        return await aio.query(request, read)
+    router.add_api_route(path, list_items, methods=['GET'], response_model=PaginatedResponse, name=f'list_{r.plural}')
+
+    if customer_lists:
+        async def list_customer_items(request: Request, response: Response, customer_id: str, page: int = Query(1, ge=1), limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = Query(None), include_total: bool = Query(True), fields_param: Optional[str] = Query(None, alias='fields', description='Comma-separated columns to return, or * for all')):
+            pagination = PaginationParams(page=page, limit=limit, cursor=cursor, include_total=include_total)
+            columns = fields.parse_fields(r.response_model, fields_param, heavy=False)
+
+            def read(db):
+                not_modified = etag.check_list(request, response, db, r.table)
+                if not_modified:
+                    return not_modified
+                return responses.json_response(paginate(db, r.table, pagination, customer_id=customer_id, columns=columns), response)
+            return await aio.query(request, read)
+        router.add_api_route(f'/customers/{{customer_id}}{path}', list_customer_items, methods=['GET'],
+                             response_model=PaginatedResponse, name=f'list_customer_{r.plural}')
+
+    def export_items(fmt: str = Query('csv', alias='format', pattern='^(csv|ndjson)$'), date_from: Optional[date] = Query(None, alias='from'), date_to: Optional[date] = Query(None, alias='to'), customer_id: Optional[str] = Query(None), gzip: bool = Query(False)):
+        return export.export_response(r.table, fmt, date_from, date_to, customer_id, gzip, customer_column=r.export_customer_column)
+    router.add_api_route(f'{path}/export', export_items, methods=['GET'], name=f'export_{r.plural}')
+
+    async def get_item(item_id: str, request: Request, response: Response, fields_param: Optional[str] = Query(None, alias='fields', description='Comma-separated columns to return, or * for all')):
+        columns = fields.parse_fields(r.response_model, fields_param)
+
+        def read(db):
+            not_modified = etag.check_row(request, db, r.table, item_id, columns=columns)
+            if not_modified:
+                return not_modified
+
+            row = get_row(db, r, item_id, columns)
+            etag.set_etag(response, etag.row_etag(row['Id'], row['LastModifiedDate'], columns))
+            return responses.model_response(detail_model, row, response, exclude_unset=True)
+        return await aio.lookup(request, read)
+    # Rows may be projections, so the response model has every field optional
+    detail_model = fields.partial_model(r.response_model)
+    router.add_api_route(f'{path}/{{item_id}}', get_item, methods=['GET'], response_model=detail_model,
+                         response_model_exclude_unset=True, name=f'get_{r.name}')
+
+    if r.update_model:
+        update_model = r.update_model
+
+        async def update_item(item_id: str, item: update_model):
+            return await writer.run(update_row, r, item_id, item)
+        router.add_api_route(f'{path}/{{item_id}}', update_item, methods=['PUT'], response_model=r.response_model, name=f'update_{r.name}')
+
+    async def delete_item(item_id: str):
+        return await writer.run(delete_row, r, item_id)
+    router.add_api_route(f'{path}/{{item_id}}', delete_item, methods=['DELETE'], name=f'delete_{r.name}')
+
+    return router
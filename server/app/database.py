@@ -1,26 +1,173 @@
 import sqlite3
 import os
+import threading
+import time
 from contextlib import contextmanager
+from . import config, metrics, migrate, querylog, reports
 
 # Get the server directory (one level up from app)
 SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_FOLDER = os.path.join(SERVER_DIR, 'Database')
-os.makedirs(DB_FOLDER, exist_ok=True)
-DB_PATH = os.path.join(DB_FOLDER, 'server.db')
+DB_PATH = os.environ.get('SWASTIK_DB_PATH') or os.path.join(DB_FOLDER, 'server.db')
+os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+
+# One long-lived connection per worker thread, keyed by database path
+_local = threading.local()
+_pool_lock = threading.Lock()
+_pool = []
+_generation = 0
+
+# With metrics or the slow-query log on, connections are created as these
+# subclasses, which time every statement for app/metrics.py and
+# app/querylog.py. A statement's time includes fetchone/fetchmany/fetchall
+# calls on its cursor, but not iterating the cursor row by row.
+class Cursor(sqlite3.Cursor):
+    def __init__(self, connection):
+        super().__init__(connection)
+        self._begin(None, None)
+
+    def _begin(self, sql, parameters):
+        self._sql = sql
+        self._parameters = parameters
+        self._elapsed = 0.0
+        self._slow = None
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        except sqlite3.OperationalError as e:
+            metrics.record_sql_error(e)
+            raise
+        finally:
+            self._account(time.perf_counter() - started, 1)
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql, parameters)
+        if sql[:5].upper() == 'BEGIN' and 'IMMEDIATE' in sql.upper():
+            started = time.perf_counter()
+            try:
+                return self._timed(super().execute, sql, parameters)
+            finally:
+                metrics.observe('sqlite_lock_wait_seconds', time.perf_counter() - started)
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        # The first set of parameters stands in for all of them in the slow-query
+        # log; a generator can't be read twice, so it gets none
+        first = seq_of_parameters[0] if isinstance(seq_of_parameters, (list, tuple)) and seq_of_parameters else None
+        self._begin(sql, first)
+        return self._timed(super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        # Scripts are schema setup rather than queries; not in the slow-query log
+        self._begin(None, None)
+        return self._timed(super().executescript, sql_script)
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+    def _fetch(self, method, *args):
+        # Fetching continues the statement; counted as time, not as a statement
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._account(time.perf_counter() - started, 0)
+
+    def _account(self, seconds, statements):
+        stats = metrics.current.get()
+        if stats is not None:
+            stats.statements += statements
+            stats.seconds += seconds
+        self._elapsed += seconds
+        if self._slow is not None:
+            querylog.extend(self._slow, seconds, self._elapsed)
+        elif querylog.THRESHOLD is not None and self._elapsed >= querylog.THRESHOLD and self._sql is not None:
+            self._slow = querylog.record(self.connection, self._sql, self._parameters, self._elapsed, stats)
+
+class Connection(sqlite3.Connection):
+    def cursor(self, factory=None):
+        return super().cursor(factory or Cursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+def open_connection(database, **kwargs):
+    started = time.perf_counter()
+    if config.METRICS_ENABLED or config.SLOW_QUERY_MS > 0:
+        kwargs['factory'] = Connection
+    conn = sqlite3.connect(database, check_same_thread=False, **kwargs)
+    metrics.inc('sqlite_connections_opened_total')
+    metrics.observe('sqlite_connect_seconds', time.perf_counter() - started)
+    return conn
+
+def configure_connection(conn):
+    conn.row_factory = sqlite3.Row
+    conn.execute(f'PRAGMA busy_timeout = {int(config.SQLITE_BUSY_TIMEOUT_MS)}')
+    conn.execute('PRAGMA foreign_keys = ON')
+    conn.execute(f'PRAGMA synchronous = {config.SQLITE_SYNCHRONOUS}')
+    conn.execute(f'PRAGMA cache_size = {int(config.SQLITE_CACHE_SIZE)}')
+    conn.execute(f'PRAGMA mmap_size = {int(config.SQLITE_MMAP_SIZE)}')
+    conn.execute(f'PRAGMA temp_store = {config.SQLITE_TEMP_STORE}')
+    return conn
+
+def connect(path=None):
+    # check_same_thread is off so close_all() can close connections owned by
+    # other threads; each pooled connection is still only used by its owner.
+    conn = open_connection(path or DB_PATH)
+    conn.execute('PRAGMA journal_mode = WAL')
+    return configure_connection(conn)
+
+def _thread_connection():
+    conns = getattr(_local, 'conns', None)
+    if conns is None or _local.generation != _generation:
+        conns = _local.conns = {}
+        _local.generation = _generation
+    conn = conns.get(DB_PATH)
+    if conn is None:
+        conn = conns[DB_PATH] = connect(DB_PATH)
+        with _pool_lock:
+            _pool.append(conn)
+    return conn
 
 @contextmanager
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    conn = _thread_connection()
     try:
         yield conn
     finally:
-        conn.close()
+        # Never hand an open transaction to the next request on this thread
+        if conn.in_transaction:
+            conn.rollback()
+
+def close_all():
+    global _generation
+    with _pool_lock:
+        conns = list(_pool)
+        _pool.clear()
+        _generation += 1
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
 
 def init_db():
-    if not os.path.exists(DB_PATH):
-        with get_db() as conn:
-            schema_path = os.path.join(SERVER_DIR, 'schema.sql')
-            with open(schema_path, 'r') as f:
-                conn.executescript(f.read())
-            conn.commit()
\ No newline at end of file
+    # Applies pending migrations (see app/migrate.py); when there are none this
+    # is one read of PRAGMA user_version, plus one of the revenue day offset
+    with get_db() as conn:
+        migrate.startup(conn)
+        reports.sync_day_offset(conn)
@@ -0,0 +1,69 @@
+import hashlib
+from fastapi import Response
+
+# Conditional GET support.
+#   Detail routes: strong ETag from (Id, LastModifiedDate) and the selected
+#                  columns, since each projection is its own representation.
+#   List routes:   weak ETag from the table's change version (tableversions)
+#                  plus the query string, checked before any rows are read.
+
+def _digest(*parts):
+    return hashlib.blake2b('\x1f'.join(str(part) for part in parts).encode(), digest_size=12).hexdigest()
+
+def row_etag(row_id, last_modified, columns=()):
+    return f'"{_digest(row_id, last_modified, ",".join(columns))}"'
+
+def table_version(db, table):
+    row = db.execute('SELECT Version FROM tableversions WHERE TableName = ?', (table,)).fetchone()
+    return row[0] if row else 0
+
+def list_etag(request, db, table):
+    query = '&'.join(sorted(f'{key}={value}' for key, value in request.query_params.multi_items()))
+    return f'W/"{_digest(table, table_version(db, table), request.url.path, query)}"'
+
+def matches(request, etag):
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # If-None-Match uses weak comparison
+    wanted = etag[2:] if etag.startswith('W/') else etag
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+def not_modified(etag):
+    return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+
+def set_etag(response, etag):
+    response.headers['ETag'] = etag
+    # Clients may keep a copy but must revalidate it on every use
+    response.headers['Cache-Control'] = 'no-cache'
+
+def check_row(request, db, table, row_id, key_column='Id', columns=()):
+    # 304 response if the client's copy of the row is current, else None
+    if 'if-none-match' not in request.headers:
+        return None
+    row = db.execute(
+        f'SELECT Id, LastModifiedDate FROM {table} WHERE {key_column} = ? AND DeletedAt IS NULL',
+        (row_id,)
+    ).fetchone()
+    if row is not None:
+        etag = row_etag(row[0], row[1], columns)
+        if matches(request, etag):
+            return not_modified(etag)
+    return None
+
+def check_list(request, response, db, table):
+    # 304 response if the client's copy of the page is current; otherwise the
+    # ETag is set on the response and None is returned
+    etag = list_etag(request, db, table)
+    if matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    return None
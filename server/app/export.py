@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, timedelta
+from fastapi.responses import StreamingResponse
+from . import reports
+from .database import connect
+
+# Streaming exports. Rows are pulled with fetchmany and encoded chunk by chunk,
+# so memory use does not depend on how many rows match.
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_CHUNK_SIZE = 500
+MEDIA_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+def _query(table, date_from, date_to, customer_id, customer_column):
+    where = ['DeletedAt IS NULL']
+    params = []
+    if customer_id and customer_column:
+        where.append(f'{customer_column} = ?')
+        params.append(customer_id)
+    # from and to are local days, inclusive, like statements and reports
+    if date_from:
+        where.append('CreatedDate >= ?')
+        params.append(reports.day_start(date_from))
+    if date_to:
+        where.append('CreatedDate < ?')
+        params.append(reports.day_start(date_to + timedelta(days=1)))
+    return f'SELECT * FROM {table} WHERE {" AND ".join(where)} ORDER BY CreatedDate, Id', params
+
+def _encode_csv(columns, chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def _encode_ndjson(columns, chunks):
+    for rows in chunks:
+        yield ''.join(json.dumps(dict(zip(columns, row)), default=str) + '\n' for row in rows).encode('utf-8')
+
+def _gzip(blocks):
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def stream_rows(sql, params, fmt):
+    # A dedicated connection: the generator is resumed on whichever threadpool
+    # thread is free, so it cannot use the per-thread pooled connection.
+    conn = connect()
+    conn.row_factory = None
+    try:
+        cur = conn.execute(sql, params)
+        columns = [description[0] for description in cur.description]
+
+        def chunks():
+            while True:
+                rows = cur.fetchmany(EXPORT_CHUNK_SIZE)
+                if not rows:
+                    break
+                yield rows
+
+        encode = _encode_csv if fmt == 'csv' else _encode_ndjson
+        yield from encode(columns, chunks())
+    finally:
+        conn.close()
+
+def export_response(table, fmt='csv', date_from=None, date_to=None, customer_id=None, gzip=False, customer_column='CustomerId'):
+    sql, params = _query(table, date_from, date_to, customer_id, customer_column)
+    body = stream_rows(sql, params, fmt)
+
+    filename = f'{table}-{date.today().isoformat()}.{fmt}'
+    media_type = MEDIA_TYPES[fmt]
+    if gzip:
+        body = _gzip(body)
+        filename += '.gz'
+        media_type = 'application/gzip'
+
+    return StreamingResponse(body, media_type=media_type, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"'
+    })
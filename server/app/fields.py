@@ -0,0 +1,57 @@
+from typing import Optional
+from fastapi import HTTPException
+from pydantic import create_model
+
+# Sparse fieldsets: ?fields=Name,Total turns into an explicit SQL column list
+# instead of SELECT *. Column names are checked against the response model,
+# so they are safe to put into SQL text.
+#
+# Free-form TEXT columns that can be large are left out of list responses
+# unless asked for by name or with fields=*. Detail responses include them.
+# (photocertificate.Media holds a media hash, see app/media.py.)
+HEAVY_COLUMNS = ('Data',)
+# Needed for keyset cursors and ETags, so always selected
+ALWAYS_COLUMNS = ('Id', 'CreatedDate', 'LastModifiedDate')
+
+def table_columns(model):
+    return tuple(model.model_fields)
+
+def default_columns(model, heavy=True):
+    columns = table_columns(model)
+    if heavy:
+        return columns
+    return tuple(column for column in columns if column not in HEAVY_COLUMNS)
+
+def parse_fields(model, fields, heavy=True, keep=()):
+    # Columns to select for ?fields=..., in table order; None means default.
+    # keep names extra columns the caller needs, e.g. a non-default sort key.
+    if fields is None or not fields.strip():
+        return default_columns(model, heavy)
+    if fields.strip() == '*':
+        return table_columns(model)
+
+    requested = {name.strip() for name in fields.split(',') if name.strip()}
+    available = table_columns(model)
+    unknown = sorted(requested.difference(available))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f'Unknown fields: {", ".join(unknown)}')
+    requested.update(column for column in (*ALWAYS_COLUMNS, *keep) if column in available)
+    return tuple(column for column in available if column in requested)
+
+def select_list(columns, prefix=''):
+    return ', '.join(f'{prefix}{column}' for column in columns)
+
+def project(row, columns):
+    return {column: row[column] for column in columns if column in row}
+
+_partial_models = {}
+
+def partial_model(model):
+    # Same fields as model, all optional, for responses built from a projection.
+    # Use with response_model_exclude_unset=True so missing columns stay missing.
+    if model not in _partial_models:
+        _partial_models[model] = create_model(
+            f'{model.__name__}Partial',
+            **{name: (Optional[field.annotation], None) for name, field in model.model_fields.items()}
+        )
+    return _partial_models[model]
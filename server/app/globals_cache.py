@@ -0,0 +1,79 @@
+import threading
+from .database import get_db
+
+# In-process cache of the globals table.
+#
+# Writes in this process call invalidate(). Writes from other processes (other
+# uvicorn workers, the sqlite3 shell) are caught by PRAGMA data_version, which
+# changes on a connection whenever another connection commits; only then do we
+# read the globals row of tableversions, which triggers bump on every change.
+
+class GlobalsCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._settings = None
+        self._version = None
+        self._generation = 0
+        # PRAGMA data_version last seen per connection (pooled connections are long-lived)
+        self._seen = {}
+
+    def _table_version(self, db):
+        row = db.execute("SELECT Version FROM tableversions WHERE TableName = 'globals'").fetchone()
+        return row[0] if row else 0
+
+    def _reload(self, db, data_version):
+        with self._lock:
+            generation = self._generation
+
+        # One read transaction so the version and the rows match
+        own_transaction = not db.in_transaction
+        if own_transaction:
+            db.execute('BEGIN')
+        try:
+            version = self._table_version(db)
+            rows = db.execute('SELECT * FROM globals WHERE DeletedAt IS NULL').fetchall()
+        finally:
+            if own_transaction:
+                db.commit()
+        settings = {row['Key']: dict(row) for row in rows}
+
+        with self._lock:
+            # An invalidate() while we were reading means our snapshot may be stale
+            if generation == self._generation:
+                self._settings = settings
+                self._version = version
+                self._seen[id(db)] = data_version
+        return settings
+
+    def settings(self, db):
+        data_version = db.execute('PRAGMA data_version').fetchone()[0]
+        with self._lock:
+            settings = self._settings
+            if settings is not None and self._seen.get(id(db)) == data_version:
+                return settings
+            version = self._version
+
+        # Another connection committed something; reload only if globals changed
+        if settings is not None and self._table_version(db) == version:
+            with self._lock:
+                if self._settings is settings:
+                    self._seen[id(db)] = data_version
+            return settings
+        return self._reload(db, data_version)
+
+    def get(self, db, key):
+        return self.settings(db).get(key)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._settings = None
+            self._version = None
+            self._seen.clear()
+
+globals_cache = GlobalsCache()
+
+def get_setting(key, default=None):
+    with get_db() as db:
+        setting = globals_cache.get(db, key)
+    return setting['Value'] if setting else default
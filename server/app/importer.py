@@ -0,0 +1,166 @@
+import csv
+import io
+import json
+import shutil
+import tempfile
+from pydantic import ValidationError
+from fastapi import HTTPException
+from . import ledger
+from .uploads import Upload
+from .schemas import CustomerCreate
+
+# Bulk customer import from CSV or .xlsx uploads. Rows are parsed lazily and
+# handled in chunks: one set-based phone lookup and one executemany per chunk.
+# write(fn) runs fn(db) as one transaction, normally through app/writer.py, so
+# each chunk is its own write job and other writes are not held up for the
+# whole file.
+#
+# import_upload() reads the multipart request body itself (app/uploads.py) rather
+# than letting the framework spool the whole file first, so a CSV is parsed
+# and imported while it is still arriving. .xlsx files are zip archives that
+# openpyxl has to seek in, so those are still spooled.
+IMPORT_CHUNK_SIZE = 1000
+SPOOL_MAX_BYTES = 1024 * 1024
+MAX_REPORTED_ERRORS = 1000
+COLUMNS = list(CustomerCreate.model_fields)
+
+def _normalise_header(header):
+    lookup = {column.lower(): column for column in COLUMNS}
+    return [lookup.get(str(name or '').strip().lower()) for name in header]
+
+def _cell(value):
+    if value is None:
+        return None
+    # Excel stores phone numbers as numbers
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = str(value).strip()
+    return value or None
+
+def _csv_rows(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text)
+    finally:
+        # Leave the upload's file object open for its owner to close
+        try:
+            text.detach()
+        except ValueError:
+            pass
+
+def _xlsx_rows(file):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise HTTPException(status_code=415, detail='Excel import needs the openpyxl package; upload a CSV file instead')
+    if not file.seekable():
+        spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        shutil.copyfileobj(file, spooled)
+        spooled.seek(0)
+        file = spooled
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def read_rows(filename, file):
+    name = (filename or '').lower()
+    if name.endswith('.xlsx'):
+        rows = _xlsx_rows(file)
+    elif name.endswith('.csv') or name.endswith('.txt') or not name:
+        rows = _csv_rows(file)
+    else:
+        raise HTTPException(status_code=415, detail='Upload a .csv or .xlsx file')
+
+    header = next(rows, None)
+    if header is None:
+        raise HTTPException(status_code=400, detail='The uploaded file is empty')
+    columns = _normalise_header(header)
+    if 'Name' not in columns:
+        raise HTTPException(status_code=400, detail='The uploaded file needs a Name column')
+
+    # Row numbers match the spreadsheet: the header is row 1
+    for number, values in enumerate(rows, start=2):
+        record = {column: _cell(value) for column, value in zip(columns, values) if column}
+        if any(value is not None for value in record.values()):
+            yield number, {key: value for key, value in record.items() if value is not None}
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _import_chunk(write, chunk, seen_phones, reject):
+    # seen_phones holds the phones of rows already imported from this file.
+    # Within the chunk only the first row with a phone is a candidate; the
+    # rest are rejected once we know whether that first row was imported.
+    valid = []
+    repeated = []
+    candidates = set()
+    for number, record in chunk:
+        try:
+            customer = CustomerCreate.model_validate(record)
+        except ValidationError as e:
+            reject(number, '; '.join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()))
+            continue
+        if customer.Phone:
+            if customer.Phone in seen_phones or customer.Phone in candidates:
+                repeated.append((number, customer))
+                continue
+            candidates.add(customer.Phone)
+        valid.append((number, customer))
+
+    def insert(db):
+        # Phone is UNIQUE across deleted customers too, so don't filter on DeletedAt
+        phones = [customer.Phone for _, customer in valid if customer.Phone]
+        taken = set()
+        if phones:
+            cur = db.execute('SELECT Phone FROM customers WHERE Phone IN (SELECT value FROM json_each(?))', (json.dumps(phones),))
+            taken = {row[0] for row in cur.fetchall()}
+        rows = [
+            (ledger.new_id(), c.Name, c.Phone, c.Balance, c.Notes, c.Disabled)
+            for _, c in valid if not (c.Phone and c.Phone in taken)
+        ]
+        db.executemany('INSERT INTO customers (Id, Name, Phone, Balance, Notes, Disabled) VALUES (?, ?, ?, ?, ?, ?)', rows)
+        return taken, len(rows)
+
+    taken, imported = write(insert)
+    for number, customer in valid:
+        if customer.Phone and customer.Phone in taken:
+            reject(number, f'Phone number {customer.Phone} already exists')
+        elif customer.Phone:
+            seen_phones.add(customer.Phone)
+    for number, customer in repeated:
+        if customer.Phone in taken:
+            reject(number, f'Phone number {customer.Phone} already exists')
+        else:
+            reject(number, f'Phone number {customer.Phone} appears more than once in the file')
+    return imported
+
+def import_customers(filename, file, write):
+    summary = {"total_rows": 0, "imported": 0, "rejected": 0, "errors": [], "errors_truncated": False}
+
+    def reject(number, detail):
+        summary["rejected"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append({"row": number, "detail": detail})
+        else:
+            summary["errors_truncated"] = True
+
+    seen_phones = set()
+    for chunk in _chunks(read_rows(filename, file), IMPORT_CHUNK_SIZE):
+        summary["total_rows"] += len(chunk)
+        summary["imported"] += _import_chunk(write, chunk, seen_phones, reject)
+
+    summary["errors"].sort(key=lambda error: error["row"])
+    return summary
+
+def import_upload(content_type, receive, write):
+    upload = Upload(content_type, receive)
+    return import_customers(upload.filename, io.BufferedReader(upload, SPOOL_MAX_BYTES // 16), write)
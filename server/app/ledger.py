@@ -0,0 +1,106 @@
+import json
+import random
+import secrets
+import sqlite3
+import time
+from . import config, metrics
+
+# Credit history postings. The balance update and the history insert run in a
+# single BEGIN IMMEDIATE transaction, and the new balance comes back through
+# RETURNING. There is no read-modify-write in Python, so concurrent postings for
+# the same customer cannot lose updates. PreviousBalance is copied from the
+# stored balance before the update, not worked back from the new one: in
+# floating point (0.1 + 0.2) - 0.2 is not 0.1.
+
+def new_id():
+    # Same format as the schema default: upper(hex(randomblob(9)))
+    return secrets.token_hex(9).upper()
+
+def signed_amount(entry_type, amount):
+    return amount if entry_type == 'credit' else -amount
+
+def is_busy(error):
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+def retry_busy(operation):
+    attempts = max(0, config.LEDGER_BUSY_RETRIES) + 1
+    for attempt in range(attempts):
+        try:
+            return operation()
+        except sqlite3.OperationalError as e:
+            if not is_busy(e) or attempt == attempts - 1:
+                raise
+            metrics.inc('sqlite_busy_retries_total')
+            # Exponential backoff with jitter so retries don't collide again
+            delay = config.LEDGER_BUSY_BACKOFF_MS / 1000 * (2 ** attempt)
+            time.sleep(delay * random.uniform(0.5, 1.5))
+
+def _post(db, customer_id, entry_type, amount, mode_of_payment):
+    delta = signed_amount(entry_type, amount)
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        rows = db.execute(
+            'INSERT INTO credithistory (CustomerId, Type, Amount, ModeOfPayment, PreviousBalance) '
+            'SELECT Id, ?, ?, ?, Balance FROM customers WHERE Id = ? AND DeletedAt IS NULL RETURNING Id, PreviousBalance',
+            (entry_type, amount, mode_of_payment, customer_id)
+        ).fetchall()
+        if not rows:
+            db.rollback()
+            return None
+
+        history_id, previous_balance = rows[0]
+        balance = db.execute(
+            'UPDATE customers SET Balance = Balance + ? WHERE Id = ? RETURNING Balance',
+            (delta, customer_id)
+        ).fetchall()[0][0]
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+
+    return {
+        "Id": history_id,
+        "CustomerId": customer_id,
+        "PreviousBalance": previous_balance,
+        "Balance": balance
+    }
+
+def customer_balances(db, customer_ids):
+    ids = sorted({customer_id for customer_id in customer_ids if customer_id})
+    if not ids:
+        return {}
+    cur = db.execute(
+        'SELECT Id, Balance FROM customers WHERE Id IN (SELECT value FROM json_each(?)) AND DeletedAt IS NULL',
+        (json.dumps(ids),)
+    )
+    return {row[0]: row[1] for row in cur.fetchall()}
+
+def insert_entries(db, accepted, mode):
+    # Batch posting; must run inside a BEGIN IMMEDIATE transaction so balances
+    # cannot change between the read below and the updates.
+    # Balances are updated once per entry, in order, so the stored balance is
+    # the same float sum as the running balance reported for each entry
+    balances = customer_balances(db, (entry.CustomerId for _, entry in accepted))
+    updates = []
+    rows = []
+    created = {}
+    for index, entry in accepted:
+        delta = signed_amount(entry.Type, entry.Amount)
+        previous_balance = balances[entry.CustomerId]
+        balances[entry.CustomerId] = previous_balance + delta
+        updates.append((delta, entry.CustomerId))
+        history_id = new_id()
+        rows.append((history_id, entry.CustomerId, entry.Type, entry.Amount, entry.ModeOfPayment, previous_balance))
+        created[index] = {"Id": history_id, "CustomerId": entry.CustomerId, "PreviousBalance": previous_balance, "Balance": balances[entry.CustomerId]}
+
+    db.executemany(
+        'INSERT INTO credithistory (Id, CustomerId, Type, Amount, ModeOfPayment, PreviousBalance) VALUES (?, ?, ?, ?, ?, ?)',
+        rows
+    )
+    db.executemany('UPDATE customers SET Balance = Balance + ? WHERE Id = ?', updates)
+    return created, {}
+
+def post_entry(db, customer_id, entry_type, amount, mode_of_payment):
+    # Returns None when the customer does not exist (or is deleted)
+    return retry_busy(lambda: _post(db, customer_id, entry_type, amount, mode_of_payment))
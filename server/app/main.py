@@ -1,23 +1,33 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from .database import init_db
+from . import aio, capture, config, metrics, migrate, profiling, writer
+from .responses import FastJSONResponse
+from .database import init_db, close_all
 
 # Import routers
-from .routers import customers, credit_history, gold_certificate, gold_test, photo_certificate, silver_certificate, weight_loss, globals
+from .routers import admin, customers, credit_history, gold_certificate, gold_test, media, photo_certificate, reports, silver_certificate, weight_loss, globals
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Initialize database on startup
     init_db()
     yield
-    # Cleanup on shutdown if needed
-    pass
+    # Close pooled connections on shutdown
+    migrate.close()
+    writer.close()
+    aio.close_all()
+    close_all()
+    capture.close()
+    profiling.close()
+    metrics.close()
 
 app = FastAPI(
     title="Swastik Assayers API",
     description="Backend API for Swastik Assayers - Gold and Silver Certification Business",
     version="1.0.0",
+    default_response_class=FastJSONResponse,
     lifespan=lifespan
 )
 
@@ -30,6 +40,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if config.PROFILE_DIR:
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+if config.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# Request capture for benchmarks/replay.py; added last so it is outermost and
+# its timings include the other middleware
+if config.CAPTURE_DIR:
+    app.add_middleware(capture.CaptureMiddleware)
+
 # Include routers
 app.include_router(customers.router, prefix="/api/v1", tags=["customers"])
 app.include_router(credit_history.router, prefix="/api/v1", tags=["credit-history"])
@@ -39,6 +60,9 @@ app.include_router(photo_certificate.router, prefix="/api/v1", tags=["photo-cert
 app.include_router(silver_certificate.router, prefix="/api/v1", tags=["silver-certificate"])
 app.include_router(weight_loss.router, prefix="/api/v1", tags=["weight-loss"])
 app.include_router(globals.router, prefix="/api/v1", tags=["globals"])
+app.include_router(media.router, prefix="/api/v1", tags=["media"])
+app.include_router(reports.router, prefix="/api/v1", tags=["reports"])
+app.include_router(admin.router, prefix="/api/v1", tags=["admin"])
 
 @app.get("/")
 async def root():
@@ -48,6 +72,11 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=5000, reload=True)
\ No newline at end of file
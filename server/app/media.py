@@ -0,0 +1,283 @@
+import argparse
+import base64
+import binascii
+import hashlib
+import os
+import re
+import sys
+import tempfile
+import time
+from fastapi import HTTPException
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from . import config, uploads
+
+# Content-addressed media store for photo certificates. Files are named by the
+# SHA-256 of their bytes and sharded by the first two hex digits:
+#
+#   <media dir>/ab/abcdef...          original upload
+#   <media dir>/thumbs/256/abcdef...  downscaled JPEG, made on first request
+#
+# photocertificate.Media holds only the hash. Identical uploads share one
+# file, and since a hash never changes its content, responses are cacheable
+# forever. Thumbnails come in THUMBNAIL_SIZES only, so the cache holds at most
+# that many copies of an image, and need Pillow (in requirements.txt); without
+# it the thumbnail endpoint answers 501.
+CHUNK_SIZE = 1024 * 1024
+HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+THUMBNAIL_SIZES = (128, 256, 512)
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Sniffed from the first bytes rather than trusting the client's header
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+def media_dir():
+    if config.MEDIA_DIR:
+        return config.MEDIA_DIR
+    from .database import DB_PATH
+    return os.path.join(os.path.dirname(DB_PATH), 'media')
+
+def is_hash(value):
+    return isinstance(value, str) and HASH_PATTERN.match(value) is not None
+
+def media_path(digest):
+    if not is_hash(digest):
+        raise HTTPException(status_code=404, detail='Media not found')
+    return os.path.join(media_dir(), digest[:2], digest)
+
+def exists(digest):
+    return is_hash(digest) and os.path.exists(media_path(digest))
+
+def sniff_type(head):
+    for signature, content_type in SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+def file_type(path):
+    with open(path, 'rb') as f:
+        return sniff_type(f.read(16)) or 'application/octet-stream'
+
+def store_stream(chunks):
+    # Write to a temp file in the media dir while hashing, then rename into
+    # place; a rename within one filesystem is atomic, so readers never see a
+    # partial file and concurrent uploads of the same bytes are harmless.
+    root = media_dir()
+    os.makedirs(root, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    head = b''
+    fd, tmp_path = tempfile.mkstemp(dir=root, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in chunks:
+                size += len(chunk)
+                if size > config.MEDIA_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail=f'Media is larger than {config.MEDIA_MAX_BYTES} bytes')
+                if len(head) < 16:
+                    head += chunk[:16 - len(head)]
+                digest.update(chunk)
+                out.write(chunk)
+
+        content_type = sniff_type(head)
+        if content_type is None:
+            raise HTTPException(status_code=415, detail='Upload a JPEG, PNG, GIF or WebP image')
+
+        digest = digest.hexdigest()
+        path = media_path(digest)
+        if os.path.exists(path):
+            os.unlink(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return {"hash": digest, "size": size, "content_type": content_type}
+
+def store_file(file):
+    return store_stream(iter(lambda: file.read(CHUNK_SIZE), b''))
+
+def store_upload(content_type, receive):
+    # The "file" field of a multipart body, stored as it arrives
+    return store_file(uploads.Upload(content_type, receive))
+
+def store_bytes(data):
+    return store_stream([data])
+
+def thumbnail_path(digest, size):
+    source = media_path(digest)
+    path = os.path.join(media_dir(), 'thumbs', str(size), digest)
+    if os.path.exists(path):
+        return path
+    try:
+        from PIL import Image
+    except ImportError:
+        raise HTTPException(status_code=501, detail='Thumbnails need the Pillow package (pip install Pillow)')
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.thumb-')
+    try:
+        with Image.open(source) as image, os.fdopen(fd, 'wb') as out:
+            image.draft('RGB', (size, size))  # lets JPEG decode at reduced scale
+            image.thumbnail((size, size))
+            image.convert('RGB').save(out, 'JPEG', quality=80, optimize=True)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        # Not an image Pillow can read; the original is better than an error
+        return source
+    return path
+
+def _parse_range(header, size):
+    # Single byte range only ("bytes=0-499", "bytes=500-", "bytes=-500");
+    # anything else is answered with the whole file, which RFC 9110 allows
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    start, end = match.groups()
+    if start == '':
+        length = int(end)
+        if length == 0:
+            raise HTTPException(status_code=416, detail='Range not satisfiable', headers={'Content-Range': f'bytes */{size}'})
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail='Range not satisfiable', headers={'Content-Range': f'bytes */{size}'})
+    return start, end
+
+def _read_range(path, start, end):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def file_response(request, path, etag):
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail='Media not found')
+    headers = {'ETag': etag, 'Cache-Control': CACHE_CONTROL, 'Accept-Ranges': 'bytes'}
+
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match and (if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]):
+        return Response(status_code=304, headers=headers)
+
+    content_type = file_type(path)
+    range_header = request.headers.get('range')
+    # If-Range: only honour the range if the client's copy is this one
+    if range_header and request.headers.get('if-range', etag) == etag:
+        size = os.path.getsize(path)
+        byte_range = _parse_range(range_header, size)
+        if byte_range:
+            start, end = byte_range
+            headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+            headers['Content-Length'] = str(end - start + 1)
+            return StreamingResponse(_read_range(path, start, end), status_code=206, media_type=content_type, headers=headers)
+
+    return FileResponse(path, media_type=content_type, headers=headers)
+
+def media_response(request, digest):
+    return file_response(request, media_path(digest), f'"{digest}"')
+
+def thumbnail_response(request, digest, size=None):
+    size = size or config.MEDIA_THUMBNAIL_SIZE
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=422, detail=f"size must be one of {', '.join(map(str, THUMBNAIL_SIZES))}")
+    path = thumbnail_path(digest, size)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail='Media not found')
+    return file_response(request, path, f'"{digest}-{size}"')
+
+def decode_inline(value):
+    # Media values saved before the media store: data URIs or bare base64
+    if value.startswith('data:'):
+        _, _, value = value.partition(',')
+    try:
+        return base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+def migrate_inline(db, batch_size=100):
+    # Move inline Media values into the store, replacing them with the hash
+    moved = skipped = 0
+    last_rowid = 0
+    while True:
+        rows = db.execute(
+            'SELECT rowid, Id, Media FROM photocertificate WHERE rowid > ? AND Media IS NOT NULL ORDER BY rowid LIMIT ?',
+            (last_rowid, batch_size)
+        ).fetchall()
+        if not rows:
+            break
+        last_rowid = rows[-1][0]
+        updates = []
+        for _, row_id, value in rows:
+            if is_hash(value):
+                continue
+            data = decode_inline(value)
+            if data is None or sniff_type(data[:16]) is None:
+                skipped += 1
+                continue
+            updates.append((store_bytes(data)["hash"], row_id))
+        if updates:
+            db.executemany('UPDATE photocertificate SET Media = ? WHERE Id = ?', updates)
+            db.commit()
+            moved += len(updates)
+    return moved, skipped
+
+def referenced_hashes(db):
+    rows = db.execute('SELECT DISTINCT Media FROM photocertificate WHERE Media IS NOT NULL')
+    return {row[0] for row in rows if is_hash(row[0])}
+
+def collect_garbage(db, dry_run=False, min_age=3600):
+    # Delete stored files (and their thumbnails) no row refers to, deleted rows
+    # included. Recent files are kept: an upload is stored before the row that
+    # refers to it is saved.
+    referenced = referenced_hashes(db)
+    cutoff = time.time() - min_age
+    removed = []
+    root = media_dir()
+    if not os.path.isdir(root):
+        return removed
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if is_hash(name) and name not in referenced and os.path.getmtime(path) < cutoff:
+                removed.append(path)
+    if not dry_run:
+        for path in removed:
+            os.unlink(path)
+    return removed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Photo certificate media store maintenance')
+    parser.add_argument('command', choices=['migrate', 'gc'], help='migrate: move inline Media values into the store; gc: delete unreferenced files')
+    parser.add_argument('--dry-run', action='store_true', help='gc only: list files without deleting them')
+    args = parser.parse_args(argv)
+
+    from .database import get_db, init_db
+    init_db()
+    with get_db() as db:
+        if args.command == 'migrate':
+            moved, skipped = migrate_inline(db)
+            print(f'moved {moved} inline media values into {media_dir()}; {skipped} could not be decoded and were left as is')
+        else:
+            removed = collect_garbage(db, args.dry_run)
+            verb = 'would remove' if args.dry_run else 'removed'
+            print(f'{verb} {len(removed)} unreferenced files')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,336 @@
+import contextvars
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from . import config
+
+# Request and database metrics, served in the Prometheus text format at
+# GET /metrics.
+#
+#   MetricsMiddleware     requests per route and status, latency histogram,
+#                         requests in flight
+#   database.Connection   statements and SQL time, attributed to the request
+#                         that ran them; connection opens, BUSY errors, time
+#                         spent waiting for the write lock (BEGIN IMMEDIATE)
+#   ledger.retry_busy     retries after SQLITE_BUSY
+#
+# Updates are in-process and cheap: a statement only bumps two fields of the
+# current request's RequestStats, and each request takes the registry lock
+# twice. The stats follow the request through the read pools and the writer
+# (which copy the request's context onto their threads); statements outside
+# any request, like the writer's BEGIN and COMMIT, are not attributed.
+#
+# Workers: every process writes its totals to <METRICS_DIR>/<parent pid>/<pid>.json
+# every METRICS_FLUSH_MS, and /metrics adds up all files of the same server
+# (same parent), so any worker can answer for all of them. Gauges only count
+# workers whose file is fresh. A process removes the files of pids that are no
+# longer running when it starts, so a restart under the same parent (a process
+# manager, or pid 1 in a container) does not add the last run's counters again.
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+UNMATCHED = '(unmatched)'
+# Directories of earlier server runs are removed once this old
+STALE_RUN_SECONDS = 3600
+
+METRICS = {
+    'http_requests_total': ('counter', 'Requests handled, by route and status', None),
+    'http_request_duration_seconds': ('histogram', 'Time from receiving a request to sending the last byte of its response', REQUEST_BUCKETS),
+    'http_requests_in_flight': ('gauge', 'Requests being handled', None),
+    'http_workers': ('gauge', 'Worker processes reporting metrics', None),
+    'sqlite_request_statements': ('histogram', 'SQL statements run per request', STATEMENT_BUCKETS),
+    'sqlite_request_seconds': ('histogram', 'Time spent in SQLite per request', REQUEST_BUCKETS),
+    'sqlite_connections_opened_total': ('counter', 'SQLite connections opened', None),
+    'sqlite_connect_seconds': ('histogram', 'Time to open and configure a SQLite connection', WAIT_BUCKETS),
+    'sqlite_lock_wait_seconds': ('histogram', 'Time BEGIN IMMEDIATE waited for the write lock', WAIT_BUCKETS),
+    'sqlite_busy_errors_total': ('counter', 'Statements that failed with SQLITE_BUSY or a locked table', None),
+    'sqlite_busy_retries_total': ('counter', 'Write transactions retried after SQLITE_BUSY', None),
+}
+
+class RequestStats:
+    __slots__ = ('statements', 'seconds', 'scope')
+
+    def __init__(self, scope=None):
+        self.statements = 0
+        self.seconds = 0.0
+        self.scope = scope
+
+current = contextvars.ContextVar('metrics_request', default=None)
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_histograms = {}
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())) if labels else ())
+
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def add_gauge(name, value, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = _gauges.get(key, 0) + value
+
+def _observe(key, value):
+    # Caller holds _lock. Bucket counts are per bucket here and made
+    # cumulative when rendered.
+    buckets = METRICS[key[0]][2]
+    entry = _histograms.get(key)
+    if entry is None:
+        entry = _histograms[key] = [[0] * (len(buckets) + 1), 0.0]
+    index = len(buckets)
+    for i, bound in enumerate(buckets):
+        if value <= bound:
+            index = i
+            break
+    entry[0][index] += 1
+    entry[1] += value
+
+def observe(name, value, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _observe(key, value)
+
+def record_sql_error(error):
+    message = str(error).lower()
+    if 'locked' in message or 'busy' in message:
+        inc('sqlite_busy_errors_total')
+
+def route_template(scope):
+    # The route template rather than the path, so ids don't become labels
+    app = scope.get('app')
+    endpoint = scope.get('endpoint')
+    if app is None or endpoint is None:
+        return UNMATCHED
+    routes = getattr(app.state, 'metrics_routes', None)
+    if routes is None:
+        routes = app.state.metrics_routes = {}
+        for route in app.routes:
+            routes.setdefault(getattr(route, 'endpoint', None), route.path)
+    return routes.get(endpoint, UNMATCHED)
+
+def request_route(stats):
+    # Routing has run by the time a request's statements do
+    if stats is None or stats.scope is None:
+        return None
+    return f"{stats.scope['method']} {route_template(stats.scope)}"
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        _flusher.start()
+        stats = RequestStats(scope)
+        token = current.set(stats)
+        status = 500
+
+        async def metrics_send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        add_gauge('http_requests_in_flight', 1)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, metrics_send)
+        finally:
+            elapsed = time.perf_counter() - started
+            current.reset(token)
+            labels = (('method', scope['method']), ('route', route_template(scope)))
+            with _lock:
+                _gauges[('http_requests_in_flight', ())] -= 1
+                key = ('http_requests_total', labels + (('status', str(status)),))
+                _counters[key] = _counters.get(key, 0) + 1
+                _observe(('http_request_duration_seconds', labels), elapsed)
+                _observe(('sqlite_request_statements', labels), stats.statements)
+                _observe(('sqlite_request_seconds', labels), stats.seconds)
+
+def snapshot():
+    with _lock:
+        return {
+            "pid": os.getpid(),
+            "updated": time.time(),
+            "counters": [[name, list(labels), value] for (name, labels), value in _counters.items()],
+            "gauges": [[name, list(labels), value] for (name, labels), value in _gauges.items()],
+            "histograms": [[name, list(labels), counts, total] for (name, labels), (counts, total) in _histograms.items()],
+        }
+
+def metrics_dir():
+    base = config.METRICS_DIR or os.path.join(tempfile.gettempdir(), 'swastik-metrics')
+    return os.path.join(base, str(os.getppid()))
+
+class _Flusher:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._loop, name='metrics-flush', daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        _remove_stale_runs()
+        _remove_dead_workers()
+        while not self._stop.wait(config.METRICS_FLUSH_MS / 1000):
+            write_snapshot()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+            write_snapshot()
+
+_flusher = _Flusher()
+
+def write_snapshot():
+    directory = metrics_dir()
+    try:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as f:
+            json.dump(snapshot(), f, separators=(',', ':'))
+        os.replace(f.name, path)
+    except OSError:
+        pass
+
+def _remove_stale_runs():
+    base = os.path.dirname(metrics_dir())
+    try:
+        runs = os.listdir(base)
+    except OSError:
+        return
+    own = str(os.getppid())
+    for run in runs:
+        path = os.path.join(base, run)
+        try:
+            if run != own and time.time() - os.path.getmtime(path) > STALE_RUN_SECONDS:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # EPERM: running, but someone else's
+        pass
+    return True
+
+def _remove_dead_workers():
+    directory = metrics_dir()
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    for name in names:
+        pid, ext = os.path.splitext(name)
+        if ext != '.json' or not pid.isdigit() or int(pid) == os.getpid() or _pid_alive(int(pid)):
+            continue
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+def _snapshots():
+    own = snapshot()
+    snapshots = [own]
+    directory = metrics_dir()
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        names = []
+    for name in names:
+        if not name.endswith('.json') or name == f'{own["pid"]}.json':
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+def collect():
+    counters = {}
+    gauges = {}
+    histograms = {}
+    workers = 0
+    fresh_after = time.time() - 3 * config.METRICS_FLUSH_MS / 1000
+    for snap in _snapshots():
+        live = snap["updated"] >= fresh_after
+        workers += live
+        for name, labels, value in snap["counters"]:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        if live:
+            for name, labels, value in snap["gauges"]:
+                key = (name, tuple(map(tuple, labels)))
+                gauges[key] = gauges.get(key, 0) + value
+        for name, labels, counts, total in snap["histograms"]:
+            key = (name, tuple(map(tuple, labels)))
+            entry = histograms.setdefault(key, [[0] * len(counts), 0.0])
+            entry[0] = [a + b for a, b in zip(entry[0], counts)]
+            entry[1] += total
+    gauges[('http_workers', ())] = workers
+    return counters, gauges, histograms
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _number(value):
+    if isinstance(value, float):
+        if value == float('inf'):
+            return '+Inf'
+        return repr(value)
+    return str(value)
+
+def render():
+    counters, gauges, histograms = collect()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        source = {'counter': counters, 'gauge': gauges, 'histogram': histograms}[kind]
+        series = sorted((labels, value) for (metric, labels), value in source.items() if metric == name)
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in series:
+            if kind != 'histogram':
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(buckets + (float('inf'),), counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels, [("le", _number(float(bound)))])} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(float(total))}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+def close():
+    _flusher.stop()
@@ -0,0 +1,417 @@
+import argparse
+import hashlib
+import importlib.util
+import logging
+import os
+import re
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from . import ledger
+
+# Schema migrations: numbered files in server/migrations, applied in order
+# and recorded in schema_version with a checksum of the file.
+#
+#   0002_triggers_and_rollups.sql  plain SQL: runs in one transaction together
+#                                  with its schema_version row, so it applies
+#                                  fully or not at all
+#   0004_backfill_rollups.py       Python: migrate(runner) runs its own
+#                                  transactions
+#   -- migrate: online             (in the first lines of either kind) runs
+#                                  after startup, in the background, so the
+#                                  server doesn't wait for it
+#
+# Index builds and backfills of existing rows belong in online migrations;
+# everything before the first one holds up startup while writers are locked
+# out. They are not atomic and must be safe to run again after an
+# interruption (IF NOT EXISTS, updates that can be repeated). Online SQL runs
+# one statement per transaction; runner.batches() splits a large UPDATE into
+# rowid ranges and runner.transaction() groups a few statements, so API writes
+# get the write lock in between. An index build is a single statement:
+# readers carry on (WAL), writers wait for that one index. A new database has
+# nothing to build or backfill, so there online migrations run at once.
+#
+# PRAGMA user_version holds the last version applied, so startup on an up to
+# date database costs one read of the database header. Applied files must not
+# change; add a new migration instead. python -m app.migrate verify checks.
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+FILE_PATTERN = re.compile(r'^(\d{4})_(\w+)\.(sql|py)$')
+ONLINE_PATTERN = re.compile(r'^\s*(?:--|#)\s*migrate:\s*online\b', re.MULTILINE)
+BATCH_ROWS = 5000
+# A Python or online migration claimed by a process that hasn't reported
+# progress for this long is taken over by the next one to try
+STALE_SECONDS = 300
+WAIT_SECONDS = 0.5
+# 0004_backfill_rollups.py. Until a database has it, rowcounts, customers_fts
+# and revenuedaily are missing the rows from before 0002, so app/counts.py,
+# app/search.py and app/reports.py read the base tables instead.
+ROLLUPS_VERSION = 4
+
+logger = logging.getLogger('swastik.migrate')
+
+VERSION_TABLE = '''
+CREATE TABLE IF NOT EXISTS schema_version (
+    Version INTEGER PRIMARY KEY NOT NULL,
+    Name TEXT NOT NULL,
+    Checksum TEXT NOT NULL,
+    Owner TEXT,
+    Heartbeat REAL,
+    AppliedAt DATETIME
+)
+'''
+
+class MigrationError(Exception):
+    pass
+
+class Stopped(Exception):
+    pass
+
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, 'rb') as f:
+            data = f.read()
+        # Line endings may change on checkout; the content may not
+        self.checksum = hashlib.sha256(data.replace(b'\r\n', b'\n')).hexdigest()
+        self.text = data.decode('utf-8')
+        self.online = bool(ONLINE_PATTERN.search('\n'.join(self.text.splitlines()[:5])))
+        self.kind = 'py' if name.endswith('.py') else 'sql'
+
+    @property
+    def atomic(self):
+        return self.kind == 'sql' and not self.online
+
+def latest_version(directory=None):
+    # From the file names alone, for the startup check
+    versions = [int(match.group(1)) for match in map(FILE_PATTERN.match, os.listdir(directory or MIGRATIONS_DIR)) if match]
+    return max(versions, default=0)
+
+def discover(directory=None):
+    directory = directory or MIGRATIONS_DIR
+    migrations = {}
+    for name in sorted(os.listdir(directory)):
+        match = FILE_PATTERN.match(name)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise MigrationError(f'{name} and {migrations[version].name} have the same version')
+        migrations[version] = Migration(version, name, os.path.join(directory, name))
+    return [migrations[version] for version in sorted(migrations)]
+
+def statements(sql):
+    # sqlite3.complete_statement knows about strings, comments and trigger bodies
+    buffer = ''
+    for line in sql.splitlines(keepends=True):
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            yield buffer.strip()
+            buffer = ''
+    if re.sub(r'--[^\n]*', '', buffer).strip():
+        raise MigrationError(f'incomplete statement at the end: {buffer.strip()[:60]}')
+
+def user_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def rollups_ready(conn):
+    return user_version(conn) >= ROLLUPS_VERSION
+
+def applied(conn):
+    conn.execute(VERSION_TABLE)
+    conn.commit()
+    return {row[0]: row for row in conn.execute('SELECT Version, Name, Checksum, Owner, Heartbeat, AppliedAt FROM schema_version')}
+
+def pending(conn, migrations):
+    done = {version for version, row in applied(conn).items() if row[5] is not None}
+    return [migration for migration in migrations if migration.version not in done]
+
+def _owner():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+def _begin(conn):
+    ledger.retry_busy(lambda: conn.execute('BEGIN IMMEDIATE'))
+
+def _record(conn, migration):
+    # Caller holds the write lock
+    conn.execute(
+        'INSERT INTO schema_version (Version, Name, Checksum, AppliedAt) VALUES (?, ?, ?, CURRENT_TIMESTAMP) '
+        'ON CONFLICT (Version) DO UPDATE SET Name = excluded.Name, Checksum = excluded.Checksum, '
+        'Owner = NULL, Heartbeat = NULL, AppliedAt = excluded.AppliedAt',
+        (migration.version, migration.name, migration.checksum)
+    )
+    conn.execute(f'PRAGMA user_version = {int(migration.version)}')
+
+class Runner:
+    # What a Python migration gets: the connection, and helpers that keep the
+    # claim on the migration alive and stop cleanly on shutdown
+    def __init__(self, conn, migration, stop=None):
+        self.conn = conn
+        self.migration = migration
+        self._stop = stop
+        self._owner = _owner()
+
+    def claim(self):
+        # True once this runner owns the migration, False if it is already
+        # applied; waits while another process is running it
+        waiting = False
+        while True:
+            _begin(self.conn)
+            try:
+                row = self.conn.execute('SELECT Owner, Heartbeat, AppliedAt FROM schema_version WHERE Version = ?',
+                                        (self.migration.version,)).fetchone()
+                if row is not None and row[2] is not None:
+                    claimed = False
+                elif row is None or row[0] is None or time.time() - (row[1] or 0) > STALE_SECONDS:
+                    self.conn.execute(
+                        'INSERT INTO schema_version (Version, Name, Checksum, Owner, Heartbeat) VALUES (?, ?, ?, ?, ?) '
+                        'ON CONFLICT (Version) DO UPDATE SET Owner = excluded.Owner, Heartbeat = excluded.Heartbeat',
+                        (self.migration.version, self.migration.name, self.migration.checksum, self._owner, time.time())
+                    )
+                    claimed = True
+                else:
+                    claimed = None
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            if claimed is not None:
+                return claimed
+            if not waiting:
+                logger.warning('Waiting for %s, which %s is applying', self.migration.name, row[0])
+                waiting = True
+            self.check()
+            time.sleep(WAIT_SECONDS)
+
+    def release(self):
+        # After a failure or shutdown, so the next attempt needn't wait for the
+        # claim to go stale
+        try:
+            self.conn.rollback()
+            self.conn.execute('UPDATE schema_version SET Owner = NULL WHERE Version = ? AND Owner = ?',
+                              (self.migration.version, self._owner))
+            self.conn.commit()
+        except sqlite3.Error:
+            pass
+
+    def check(self):
+        if self._stop is not None and self._stop.is_set():
+            raise Stopped()
+
+    def _heartbeat(self):
+        # Caller holds the write lock
+        self.conn.execute('UPDATE schema_version SET Heartbeat = ? WHERE Version = ? AND Owner = ?',
+                          (time.time(), self.migration.version, self._owner))
+
+    @contextmanager
+    def transaction(self):
+        self.check()
+        _begin(self.conn)
+        try:
+            yield self.conn
+            self._heartbeat()
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+
+    def statement(self, sql, parameters=()):
+        # One statement in its own transaction
+        with self.transaction() as conn:
+            conn.execute(sql, parameters)
+
+    def batches(self, table, sql, size=BATCH_ROWS):
+        # sql must limit itself to rowid BETWEEN :first AND :last
+        low, high = self.conn.execute(f'SELECT min(rowid), max(rowid) FROM {table}').fetchone()
+        if low is None:
+            return
+        for first in range(low, high + 1, size):
+            self.statement(sql, {"first": first, "last": first + size - 1})
+
+    def finish(self):
+        _begin(self.conn)
+        try:
+            _record(self.conn, self.migration)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+def _run_atomic(conn, migration):
+    _begin(conn)
+    try:
+        row = conn.execute('SELECT AppliedAt FROM schema_version WHERE Version = ?', (migration.version,)).fetchone()
+        if row is not None and row[0] is not None:
+            # Another process applied it while we waited for the lock
+            conn.rollback()
+            return False
+        for sql in statements(migration.text):
+            conn.execute(sql)
+        _record(conn, migration)
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+
+def _load(migration):
+    spec = importlib.util.spec_from_file_location(f'migrations.m{migration.version:04d}', migration.path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if not callable(getattr(module, 'migrate', None)):
+        raise MigrationError(f'{migration.name} has no migrate(runner) function')
+    return module
+
+def run(conn, migration, stop=None):
+    # Returns False when another process applied it first
+    if migration.atomic:
+        return _run_atomic(conn, migration)
+    runner = Runner(conn, migration, stop)
+    if not runner.claim():
+        return False
+    try:
+        if migration.kind == 'py':
+            _load(migration).migrate(runner)
+        else:
+            for sql in statements(migration.text):
+                runner.statement(sql)
+        runner.finish()
+    except BaseException:
+        runner.release()
+        raise
+    return True
+
+def apply(conn, migrations=None, stop=None, log=None):
+    migrations = discover() if migrations is None else migrations
+    applied_now = []
+    for migration in pending(conn, migrations):
+        started = time.perf_counter()
+        if run(conn, migration, stop):
+            applied_now.append(migration)
+            message = f'Applied {migration.name} in {time.perf_counter() - started:.2f}s'
+            (log or logger.info)(message)
+    return applied_now
+
+class _Background:
+    # Online migrations left over at startup, applied on their own connection
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, migrations):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(migrations,), name='migrations', daemon=True)
+        self._thread.start()
+
+    def _loop(self, migrations):
+        from . import database
+        conn = database.connect()
+        try:
+            apply(conn, migrations, stop=self._stop)
+        except Stopped:
+            logger.warning('Online migrations interrupted by shutdown; they continue on the next start')
+        except Exception:
+            logger.exception('Online migration failed; it is retried on the next start')
+        finally:
+            conn.close()
+
+    def stop(self):
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+_background = _Background()
+
+def _has_tables(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name != 'schema_version' LIMIT 1").fetchone() is not None
+
+def startup(conn):
+    latest = latest_version()
+    version = user_version(conn)
+    if version == latest:
+        return
+    if version > latest:
+        raise MigrationError(f'the database is at schema version {version}, newer than this code ({latest})')
+    migrations = discover()
+    if version == 0 and not _has_tables(conn):
+        apply(conn, migrations)
+        return
+    # Everything before the first online migration is applied before serving;
+    # from there on, in order, in the background
+    remaining = pending(conn, migrations)
+    for index, migration in enumerate(remaining):
+        if migration.online:
+            _background.start(remaining[index:])
+            return
+        run(conn, migration)
+
+def close():
+    _background.stop()
+
+def verify(conn, migrations):
+    problems = []
+    files = {migration.version: migration for migration in migrations}
+    rows = applied(conn)
+    for version, (_, name, checksum, owner, heartbeat, applied_at) in sorted(rows.items()):
+        migration = files.get(version)
+        if applied_at is None:
+            if owner and time.time() - (heartbeat or 0) <= STALE_SECONDS:
+                problems.append(f'{name}: being applied by {owner}')
+            else:
+                problems.append(f'{name}: started but interrupted; apply runs it again')
+        elif migration is None:
+            problems.append(f'{name}: applied, but the file is missing')
+        elif migration.checksum != checksum:
+            problems.append(f'{name}: changed after it was applied')
+    for migration in pending(conn, migrations):
+        if migration.version not in rows:
+            problems.append(f'{migration.name}: not applied')
+    done = [version for version, row in rows.items() if row[5] is not None]
+    expected = max(done, default=0)
+    if user_version(conn) != expected:
+        problems.append(f'PRAGMA user_version is {user_version(conn)}, expected {expected}')
+    return problems
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m app.migrate', description='Plan, apply and verify schema migrations')
+    parser.add_argument('command', choices=['plan', 'apply', 'verify'])
+    parser.add_argument('--db', help='database file (default: the configured database)')
+    args = parser.parse_args(argv)
+
+    from . import database
+    migrations = discover()
+    conn = database.connect(args.db)
+    try:
+        if args.command == 'plan':
+            todo = pending(conn, migrations)
+            print(f'Schema version {user_version(conn)}, latest {migrations[-1].version if migrations else 0}')
+            for migration in todo:
+                mode = 'online' if migration.online else 'atomic' if migration.atomic else 'blocking'
+                print(f'  {migration.name:<40} {mode:<9} {migration.checksum[:12]}')
+            if not todo:
+                print('Nothing to apply')
+            return 0
+        if args.command == 'apply':
+            # Online migrations too, here and now
+            if not apply(conn, migrations, log=print):
+                print('Nothing to apply')
+            return 0
+        problems = verify(conn, migrations)
+        for problem in problems:
+            print(problem)
+        if not problems:
+            print(f'Schema is at version {user_version(conn)} and matches the migration files')
+        return 1 if problems else 0
+    except MigrationError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    sys.exit(main())
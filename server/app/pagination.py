@@ -0,0 +1,78 @@
+import base64
+import binascii
+import json
+from fastapi import HTTPException
+from . import counts
+
+# Cursors are opaque to clients: base64url-encoded JSON of the sort key values
+# of the last row on the page, e.g. [CreatedDate, Id].
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+def decode_cursor(cursor, size):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+    return values
+
+def paginate(db, table, pagination, customer_id=None, order=('CreatedDate', 'Id'), descending=True, columns=None):
+    if customer_id is not None:
+        where, params = 'CustomerId = ? AND DeletedAt IS NULL', (customer_id,)
+    else:
+        where, params = 'DeletedAt IS NULL', ()
+
+    # An explicit column list must include the sort columns for the cursor
+    select = ', '.join(columns) if columns else '*'
+    direction = 'DESC' if descending else 'ASC'
+    order_by = ', '.join(f'{column} {direction}' for column in order)
+
+    # One extra row tells us whether there is a next page
+    if pagination.cursor:
+        values = decode_cursor(pagination.cursor, len(order))
+        key_columns = ', '.join(order)
+        marks = ', '.join('?' for _ in order)
+        comparison = '<' if descending else '>'
+        cur = db.execute(
+            f'SELECT {select} FROM {table} WHERE {where} AND ({key_columns}) {comparison} ({marks}) ORDER BY {order_by} LIMIT ?',
+            (*params, *values, pagination.limit + 1)
+        )
+    else:
+        cur = db.execute(
+            f'SELECT {select} FROM {table} WHERE {where} ORDER BY {order_by} LIMIT ? OFFSET ?',
+            (*params, pagination.limit + 1, pagination.offset)
+        )
+    rows = [dict(row) for row in cur.fetchall()]
+
+    next_cursor = None
+    if len(rows) > pagination.limit:
+        rows = rows[:pagination.limit]
+        next_cursor = encode_cursor(rows[-1][column] for column in order)
+
+    total_records = None
+    if pagination.include_total:
+        total_records = counts.get_count(db, table, customer_id or '')
+
+    return page_response(rows, pagination, total_records, next_cursor)
+
+def page_response(rows, pagination, total_records, next_cursor=None):
+    return {
+        "data": rows,
+        "pagination": {
+            "total_records": total_records,
+            "current_page": None if pagination.cursor else pagination.page,
+            "total_pages": total_pages(total_records, pagination.limit),
+            "limit": pagination.limit,
+            "next_cursor": next_cursor
+        }
+    }
+
+def total_pages(total_records, limit):
+    if total_records is None:
+        return None
+    return (total_records + limit - 1) // limit if total_records > 0 else 0
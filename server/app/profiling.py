@@ -0,0 +1,314 @@
+import asyncio
+import contextvars
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from urllib.parse import parse_qsl
+from . import config, metrics
+
+# On-demand sampling profiler. Off unless SWASTIK_PROFILE_DIR is set; then
+# main.py adds ProfilingMiddleware, which profiles a request when it has an
+# X-Profile: 1 header or a profile=1 query parameter, and a random
+# PROFILE_SAMPLE_RATE share of all other requests.
+#
+# While a profiled request runs, one sampler thread reads the stacks of the
+# threads doing its work every PROFILE_INTERVAL_MS:
+#
+#   event loop          while the request's own coroutine is running
+#   thread pool         while it runs the request's (sync) endpoint
+#   read pools, writer  while they run a job the request handed them (wrap())
+#
+# so validation, row building, SQLite and JSON encoding each show up under
+# the thread that did them, and time a request spends waiting does not.
+# Each profile is written to PROFILE_DIR in the folded-stack format read by
+# flamegraph.pl, speedscope and inferno, next to a JSON file with its route,
+# status and duration. GET /admin/profiles lists them; the newest
+# PROFILE_FILES are kept.
+#
+# With PROFILE_DIR unset nothing is installed: no middleware, no thread, and
+# the read pools and writer skip wrap() on a flag.
+ENABLED = bool(config.PROFILE_DIR)
+FILE_PREFIX = 'profile-'
+STACKS_SUFFIX = '.folded'
+META_SUFFIX = '.json'
+# More profiled requests at once than this just run unprofiled
+MAX_ACTIVE = 4
+NAME_PATTERN = re.compile(r'^profile-[0-9]{8}-[0-9]{6}-[0-9]{6}-[0-9]+$')
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+current = contextvars.ContextVar('profile', default=None)
+
+class Profile:
+    __slots__ = ('scope', 'frame', 'trigger', 'created', 'started', 'seconds', 'status', 'stacks', 'endpoint_code')
+
+    def __init__(self, scope, frame, trigger):
+        self.scope = scope
+        self.frame = frame
+        self.trigger = trigger
+        self.created = datetime.now()
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.status = 500
+        self.stacks = Counter()
+        self.endpoint_code = None
+
+def _trigger(scope):
+    for key, value in scope.get('headers', ()):
+        if key == b'x-profile' and value.lower() in (b'1', b'true'):
+            return 'header'
+    query = scope.get('query_string', b'')
+    if b'profile=' in query and dict(parse_qsl(query.decode('latin-1'))).get('profile', '').lower() in ('1', 'true'):
+        return 'query'
+    if config.PROFILE_SAMPLE_RATE > 0 and random.random() < config.PROFILE_SAMPLE_RATE:
+        return 'sampled'
+    return None
+
+# Thread ident -> profile, while a read pool or writer thread runs a job for it
+_threads = {}
+
+def wrap(fn):
+    # Called where a request hands work to another thread, on the request's side
+    profile = current.get()
+    if profile is None:
+        return fn
+
+    def run(*args):
+        ident = threading.get_ident()
+        _threads[ident] = profile
+        try:
+            return fn(*args)
+        finally:
+            _threads.pop(ident, None)
+    return run
+
+_labels = {}
+
+def _short(filename):
+    if filename.startswith(SERVER_DIR + os.sep):
+        return os.path.relpath(filename, SERVER_DIR)
+    _, found, rest = filename.rpartition('site-packages' + os.sep)
+    return rest if found else os.path.basename(filename)
+
+def _label(code):
+    label = _labels.get(code)
+    if label is None:
+        # ; separates frames in the folded format
+        label = _labels[code] = f'{code.co_name} ({_short(code.co_filename)}:{code.co_firstlineno})'.replace(';', ':')
+    return label
+
+def _fold(thread_name, frame):
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame.f_code))
+        frame = frame.f_back
+    labels.append(thread_name.replace(';', ':').replace(' ', '_'))
+    return ';'.join(reversed(labels))
+
+def _endpoint_code(profile):
+    # Sync endpoints run on the thread pool, where the request's frames aren't
+    # on the stack; their code object identifies them instead. Async endpoints
+    # are found through the request's frame on the event loop.
+    if profile.endpoint_code is None:
+        endpoint = profile.scope.get('endpoint')
+        if endpoint is None:
+            return None
+        code = getattr(endpoint, '__code__', None)
+        profile.endpoint_code = False if code is None or asyncio.iscoroutinefunction(endpoint) else code
+    return profile.endpoint_code or None
+
+def _owner(frame, active):
+    codes = {}
+    for profile in active:
+        code = _endpoint_code(profile)
+        if code is not None:
+            codes.setdefault(code, profile)
+    by_code = None
+    while frame is not None:
+        for profile in active:
+            if frame is profile.frame:
+                return profile
+        if by_code is None:
+            by_code = codes.get(frame.f_code)
+        frame = frame.f_back
+    return by_code
+
+class _Sampler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._active = []
+        self._finished = []
+        self._thread = None
+        self._stopping = False
+        self._names = {}
+
+    def add(self, profile):
+        with self._lock:
+            if len(self._active) >= MAX_ACTIVE:
+                return False
+            self._active.append(profile)
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._loop, name='profiler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return True
+
+    def finish(self, profile):
+        with self._lock:
+            self._active.remove(profile)
+            self._finished.append(profile)
+        self._wake.set()
+
+    def _loop(self):
+        interval = config.PROFILE_INTERVAL_MS / 1000
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                active = list(self._active)
+                finished, self._finished = self._finished, []
+                if not active and not finished:
+                    if self._stopping:
+                        return
+                    self._wake.clear()
+            # Writing happens here rather than on the event loop
+            for profile in finished:
+                write(profile)
+            if active:
+                self._sample(active, me)
+                time.sleep(interval)
+            elif not finished:
+                self._wake.wait()
+
+    def _thread_name(self, ident):
+        name = self._names.get(ident)
+        if name is None:
+            self._names = {thread.ident: thread.name for thread in threading.enumerate()}
+            name = self._names.get(ident, f'thread-{ident}')
+        return name
+
+    def _sample(self, active, me):
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            profile = _threads.get(ident) or _owner(frame, active)
+            if profile is not None and profile in active:
+                profile.stacks[_fold(self._thread_name(ident), frame)] += 1
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+        if thread is not None:
+            self._wake.set()
+            thread.join()
+
+_sampler = _Sampler()
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        trigger = _trigger(scope)
+        if trigger is None:
+            return await self.app(scope, receive, send)
+
+        # The sampler recognises the event loop working on this request by this
+        # frame being on its stack
+        profile = Profile(scope, sys._getframe(), trigger)
+        if not _sampler.add(profile):
+            return await self.app(scope, receive, send)
+        token = current.set(profile)
+
+        async def profile_send(message):
+            if message['type'] == 'http.response.start':
+                profile.status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, profile_send)
+        finally:
+            current.reset(token)
+            profile.seconds = time.perf_counter() - profile.started
+            _sampler.finish(profile)
+
+def _atomic_write(directory, name, text):
+    with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as f:
+        f.write(text)
+    os.replace(f.name, os.path.join(directory, name))
+
+def write(profile):
+    directory = config.PROFILE_DIR
+    name = f'{FILE_PREFIX}{profile.created.strftime("%Y%m%d-%H%M%S-%f")}-{os.getpid()}'
+    meta = {
+        "name": name,
+        "created": profile.created.isoformat(),
+        "method": profile.scope['method'],
+        "path": profile.scope['path'],
+        "route": metrics.route_template(profile.scope),
+        "status": profile.status,
+        "duration_ms": round(profile.seconds * 1000, 3),
+        "samples": sum(profile.stacks.values()),
+        "interval_ms": config.PROFILE_INTERVAL_MS,
+        "trigger": profile.trigger,
+    }
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # Stacks first: a profile is listed once its JSON file exists
+        _atomic_write(directory, name + STACKS_SUFFIX,
+                      ''.join(f'{stack} {count}\n' for stack, count in profile.stacks.most_common()))
+        _atomic_write(directory, name + META_SUFFIX, json.dumps(meta))
+        _prune(directory)
+    except OSError:
+        pass
+
+def _prune(directory):
+    names = sorted(name[:-len(META_SUFFIX)] for name in os.listdir(directory)
+                   if name.startswith(FILE_PREFIX) and name.endswith(META_SUFFIX))
+    for name in names[:-max(1, config.PROFILE_FILES)]:
+        for suffix in (META_SUFFIX, STACKS_SUFFIX):
+            try:
+                os.remove(os.path.join(directory, name + suffix))
+            except OSError:
+                pass
+
+def list_profiles(limit=50, route=None):
+    if not ENABLED:
+        return []
+    try:
+        names = sorted((name for name in os.listdir(config.PROFILE_DIR)
+                        if name.startswith(FILE_PREFIX) and name.endswith(META_SUFFIX)), reverse=True)
+    except OSError:
+        return []
+    profiles = []
+    for name in names:
+        try:
+            with open(os.path.join(config.PROFILE_DIR, name)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if route is None or meta["route"] == route:
+            profiles.append(meta)
+            if len(profiles) >= limit:
+                break
+    return profiles
+
+def stacks_path(name):
+    if not ENABLED or not NAME_PATTERN.match(name):
+        return None
+    path = os.path.join(config.PROFILE_DIR, name + STACKS_SUFFIX)
+    return path if os.path.exists(path) else None
+
+def close():
+    _sampler.stop()
@@ -0,0 +1,180 @@
+import logging
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from functools import lru_cache
+from . import config, metrics
+
+# Slow-query log. database.Cursor times every statement together with the
+# fetches that follow it, and reports it here as soon as that time passes
+# SLOW_QUERY_MS:
+#
+#   - a WARNING on the 'swastik.slow_query' logger with the time, the route
+#     that ran it, the types of its parameters (never their values) and its
+#     EXPLAIN QUERY PLAN, with full scans of the large tables flagged;
+#   - totals per normalised statement (literals and parameter lists folded
+#     into ?), ranked by GET /admin/slow-queries.
+#
+# Only statements over the threshold cost anything beyond a comparison. The
+# plan is taken once per normalised statement, on the connection that ran it.
+# Totals are per worker process and since it started.
+SCAN_TABLES = {'customers', 'credithistory', 'goldcertificate', 'goldtest', 'silvercertificate',
+               'photocertificate', 'weightlosshistory'}
+MAX_QUERIES = 500
+MAX_ROUTES = 10
+THRESHOLD = config.SLOW_QUERY_MS / 1000 if config.SLOW_QUERY_MS > 0 else None
+ORDERS = {
+    'max': lambda query: query.max,
+    'total': lambda query: query.total,
+    'mean': lambda query: query.total / query.count,
+    'count': lambda query: query.count,
+}
+
+logger = logging.getLogger('swastik.slow_query')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w.?])-?\d+(?:\.\d+)?(?![\w.])')
+_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+_SPACE = re.compile(r'\s+')
+_SOURCE = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+# A table read in full; SCAN ... USING INDEX walks an index and is often cut
+# short by a LIMIT
+_SCAN = re.compile(r'SCAN (\w+)$')
+# Words that can follow a table name where an alias would otherwise be
+_NOT_ALIASES = {'where', 'join', 'left', 'inner', 'cross', 'natural', 'on', 'using', 'order', 'group', 'limit',
+                'indexed', 'not', 'union', 'except', 'intersect', 'having', 'window', 'set', 'values', 'returning'}
+_TYPES = {type(None): 'null', bool: 'integer', int: 'integer', float: 'real', str: 'text', bytes: 'blob'}
+
+_lock = threading.Lock()
+_queries = {}
+_started = datetime.now()
+
+class _Query:
+    __slots__ = ('sql', 'plan', 'full_scans', 'count', 'total', 'max', 'last', 'last_seen', 'routes', 'parameters')
+
+    def __init__(self, sql, plan, full_scans):
+        self.sql = sql
+        self.plan = plan
+        self.full_scans = full_scans
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.last_seen = None
+        self.routes = []
+        self.parameters = []
+
+@lru_cache(maxsize=1024)
+def normalise(sql):
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _LIST.sub('?, ...', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+def parameter_shape(parameters):
+    if parameters is None:
+        return []
+    if isinstance(parameters, dict):
+        return [f'{name}: {_TYPES.get(type(value), type(value).__name__)}' for name, value in parameters.items()]
+    return [_TYPES.get(type(value), type(value).__name__) for value in parameters]
+
+def explain(conn, sql, parameters):
+    # A plain cursor, so the EXPLAIN itself is neither timed nor logged
+    try:
+        cursor = conn.cursor(sqlite3.Cursor)
+        cursor.row_factory = None
+        try:
+            rows = cursor.execute('EXPLAIN QUERY PLAN ' + sql, parameters).fetchall()
+        finally:
+            cursor.close()
+    except sqlite3.Error:
+        return []
+    depth = {0: -1}
+    plan = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        plan.append('  ' * depth[node] + detail)
+    return plan
+
+def full_scans(sql, plan):
+    # Plans name a table by its alias when it has one
+    tables = {}
+    for table, alias in _SOURCE.findall(sql):
+        tables[table.lower()] = table.lower()
+        if alias and alias.lower() not in _NOT_ALIASES:
+            tables[alias.lower()] = table.lower()
+    scans = []
+    for line in plan:
+        match = _SCAN.match(line.strip())
+        if match:
+            table = tables.get(match.group(1).lower(), match.group(1).lower())
+            if table in SCAN_TABLES and table not in scans:
+                scans.append(table)
+    return scans
+
+def _evict():
+    # Caller holds _lock; makes room by dropping the fastest statement
+    del _queries[min(_queries.values(), key=lambda query: query.max).sql]
+
+def record(conn, sql, parameters, seconds, stats=None):
+    # parameters is None when there is no single set to explain with
+    # (executemany over a generator)
+    key = normalise(sql)
+    with _lock:
+        query = _queries.get(key)
+    if query is None:
+        plan = explain(conn, sql, parameters) if parameters is not None else []
+        query = _Query(key, plan, full_scans(sql, plan))
+    route = metrics.request_route(stats)
+    shape = parameter_shape(parameters)
+    with _lock:
+        if key not in _queries and len(_queries) >= MAX_QUERIES:
+            _evict()
+        query = _queries.setdefault(key, query)
+        query.count += 1
+        query.total += seconds
+        query.max = max(query.max, seconds)
+        query.last = seconds
+        query.last_seen = datetime.now()
+        query.parameters = shape
+        if route and route not in query.routes and len(query.routes) < MAX_ROUTES:
+            query.routes.append(route)
+    flagged = f' [full scan: {", ".join(query.full_scans)}]' if query.full_scans else ''
+    logger.warning(
+        'slow query: %.1f ms, route %s%s\n  %s\n  parameters: %s\n  plan:\n%s',
+        seconds * 1000, route or '(none)', flagged, key, ', '.join(shape) or '(none)',
+        '\n'.join(f'    {line}' for line in query.plan) or '    (none)'
+    )
+    return query
+
+def extend(query, seconds, elapsed):
+    # More fetches on a statement already recorded; elapsed is its time so far
+    with _lock:
+        query.total += seconds
+        query.max = max(query.max, elapsed)
+        query.last = elapsed
+
+def report(limit=20, order='max'):
+    with _lock:
+        queries = sorted(_queries.values(), key=ORDERS[order], reverse=True)[:limit]
+        return {
+            "threshold_ms": config.SLOW_QUERY_MS,
+            "since": _started,
+            "queries": [
+                {
+                    "sql": query.sql,
+                    "count": query.count,
+                    "total_ms": round(query.total * 1000, 3),
+                    "max_ms": round(query.max * 1000, 3),
+                    "mean_ms": round(query.total / query.count * 1000, 3),
+                    "last_ms": round(query.last * 1000, 3),
+                    "last_seen": query.last_seen,
+                    "routes": list(query.routes),
+                    "parameters": list(query.parameters),
+                    "plan": list(query.plan),
+                    "full_scans": list(query.full_scans),
+                }
+                for query in queries
+            ],
+        }
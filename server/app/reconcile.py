@@ -0,0 +1,145 @@
+import argparse
+import sys
+import time
+import numpy as np
+from . import ledger
+
+# Balance reconciliation. customers.Balance is a running total updated on each
+# posting, but it can drift: PUT /customers can overwrite it, soft-deleting a
+# credit history entry does not reverse it, and databases from before the
+# ledger lost concurrent updates.
+#
+# The expected balance is the one app/statements.py shows: the PreviousBalance
+# of the customer's first posting plus the signed amounts of all live entries.
+# credithistory is scanned once in table order (no ORDER BY, so no index
+# lookups back into the table) into NumPy arrays: customer ids become integer
+# codes and np.bincount sums every customer's amounts in one pass. The base
+# balances are one correlated query over idx_credithistory_customer_history.
+# Customers without entries have nothing to check.
+FETCH_SIZE = 100_000
+TOLERANCE = 0.005  # half a paisa; balances are floating point
+
+def load_ledger(db):
+    # Returns (customer ids, per-row customer codes, signed live amounts)
+    # Plain tuples; building sqlite3.Row objects costs more than the query
+    cur = db.cursor()
+    cur.row_factory = None
+    cur.execute(
+        "SELECT CustomerId, CASE WHEN DeletedAt IS NOT NULL THEN 0 WHEN Type = 'credit' THEN Amount ELSE -Amount END FROM credithistory"
+    )
+    index = {}
+    codes, amounts = [], []
+    while True:
+        rows = cur.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        chunk_ids, chunk_amounts = zip(*rows)
+        codes.append(np.fromiter((index.setdefault(customer_id, len(index)) for customer_id in chunk_ids), dtype=np.intp, count=len(rows)))
+        amounts.append(np.fromiter(chunk_amounts, dtype=np.float64, count=len(rows)))
+    if not codes:
+        return [], np.empty(0, dtype=np.intp), np.empty(0)
+    return list(index), np.concatenate(codes), np.concatenate(amounts)
+
+def base_balances(db):
+    cur = db.execute(
+        """SELECT c.Id, c.Name, c.Balance,
+            (SELECT PreviousBalance FROM credithistory WHERE CustomerId = c.Id ORDER BY CreatedDate, rowid LIMIT 1)
+        FROM customers c WHERE c.DeletedAt IS NULL"""
+    )
+    return {row[0]: (row[1], row[2] or 0, row[3] or 0) for row in cur}
+
+def expected_balances(customer_ids, codes, amounts, bases):
+    totals = np.bincount(codes, weights=amounts, minlength=len(customer_ids))
+    return {
+        customer_id: bases[customer_id][2] + total
+        for customer_id, total in zip(customer_ids, totals.tolist())
+        if customer_id in bases
+    }
+
+def find_drift(db):
+    # One read transaction so the ledger and the balances are the same snapshot
+    started = time.perf_counter()
+    own_transaction = not db.in_transaction
+    if own_transaction:
+        db.execute('BEGIN')
+    try:
+        customer_ids, codes, amounts = load_ledger(db)
+        customers = base_balances(db)
+    finally:
+        if own_transaction:
+            db.commit()
+    loaded = time.perf_counter()
+
+    expected = expected_balances(customer_ids, codes, amounts, customers)
+    drift = []
+    for customer_id, balance in expected.items():
+        name, current, _ = customers[customer_id]
+        if abs(current - balance) >= TOLERANCE:
+            drift.append({
+                "CustomerId": customer_id,
+                "Name": name,
+                "Balance": current,
+                "ExpectedBalance": round(balance, 2),
+                "Difference": round(current - balance, 2)
+            })
+    drift.sort(key=lambda item: -abs(item["Difference"]))
+
+    return {
+        "ledger_rows": len(codes),
+        "customers_checked": len(expected),
+        "drifted": len(drift),
+        "load_seconds": round(loaded - started, 3),
+        "compute_seconds": round(time.perf_counter() - loaded, 3),
+        "drift": drift
+    }
+
+def repair(db, drift):
+    # Apply the difference rather than the absolute value: a posting that lands
+    # between the snapshot and this transaction moves both sides equally.
+    def attempt():
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany(
+                'UPDATE customers SET Balance = Balance - ? WHERE Id = ? AND DeletedAt IS NULL',
+                ((item["Difference"], item["CustomerId"]) for item in drift)
+            )
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        return len(drift)
+
+    return ledger.retry_busy(attempt) if drift else 0
+
+def reconcile(db, apply=False, limit=None):
+    report = find_drift(db)
+    report["repaired"] = repair(db, report["drift"]) if apply else 0
+    if limit is not None:
+        report["drift"] = report["drift"][:limit]
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m app.reconcile', description='Check customer balances against credit history')
+    parser.add_argument('command', choices=['check', 'repair'])
+    parser.add_argument('--limit', type=int, default=50, help='drifted customers to list')
+    args = parser.parse_args(argv)
+
+    from .database import get_db, init_db
+    init_db()
+    with get_db() as db:
+        report = reconcile(db, apply=args.command == 'repair')
+
+    print(f"{report['ledger_rows']} ledger rows, {report['customers_checked']} customers checked "
+          f"(load {report['load_seconds']}s, compute {report['compute_seconds']}s)")
+    for item in report['drift'][:args.limit]:
+        print(f"{item['CustomerId']}  {item['Name'][:30]:<30} balance={item['Balance']:.2f} expected={item['ExpectedBalance']:.2f} diff={item['Difference']:+.2f}")
+    if report['repaired']:
+        print(f"Repaired {report['repaired']} balances")
+    elif report['drifted']:
+        print(f"{report['drifted']} balances have drifted")
+    else:
+        print('All balances match the ledger')
+    return 1 if report['drifted'] and not report['repaired'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
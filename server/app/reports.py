@@ -0,0 +1,176 @@
+import argparse
+import json
+import sys
+from datetime import datetime, time, timedelta
+from . import config, migrate
+
+# Revenue reports are answered from revenuedaily, a rollup per (Day, TableName,
+# ModeOfPayment, Status) that the *_revenue_* triggers of the schema keep up
+# to date on insert, update and soft delete. A range query reads at most one
+# row per day and group instead of every certificate in the range.
+#
+# Days are the shop's local days: CreatedDate is UTC and is shifted by
+# revenuesettings.DayOffsetMinutes, which sync_day_offset() keeps equal to
+# SWASTIK_REPORT_UTC_OFFSET. Changing that setting rebuilds revenuedaily on the
+# next start.
+#
+# An upgraded database fills revenuedaily in migration 0004 after startup;
+# until that is done, reports group the source tables directly.
+#
+# Source columns per table: (amount, GST, total tax, status). Tables without
+# tax or status columns contribute 0 and ''.
+REVENUE_SOURCES = {
+    'goldcertificate': ('Total', 'GST', 'TotalTax', 'Status'),
+    'silvercertificate': ('Total', 'GST', 'TotalTax', 'Status'),
+    'photocertificate': ('Total', 'GST', 'TotalTax', 'Status'),
+    'goldtest': ('Total', None, None, 'Status'),
+    'weightlosshistory': ('Amount', None, None, None),
+}
+
+# group_by name -> (output key, SQL expression over revenuedaily)
+GROUPINGS = {
+    'day': ('Day', 'Day'),
+    'month': ('Month', 'substr(Day, 1, 7)'),
+    'year': ('Year', 'substr(Day, 1, 4)'),
+    'table': ('TableName', 'TableName'),
+    'mode': ('ModeOfPayment', 'ModeOfPayment'),
+    'status': ('Status', 'Status'),
+}
+METRICS = ('Count', 'Total', 'GST', 'TotalTax')
+LOCAL_DAY = "date(CreatedDate, (SELECT DayOffsetMinutes FROM revenuesettings) || ' minutes')"
+
+def day_start(day):
+    # The UTC CreatedDate at which a local day starts, for date filters on the
+    # base tables (statements, exports)
+    start = datetime.combine(day, time()) - timedelta(minutes=config.REPORT_UTC_OFFSET_MINUTES)
+    return start.strftime('%Y-%m-%d %H:%M:%S')
+
+def _source_query(table):
+    amount, gst, tax, status = REVENUE_SOURCES[table]
+    return f"""SELECT {LOCAL_DAY} AS Day, '{table}' AS TableName, COALESCE(ModeOfPayment, '') AS ModeOfPayment,
+        {f"COALESCE({status}, '')" if status else "''"} AS Status, COUNT(*) AS Count, SUM(COALESCE({amount}, 0)) AS Total,
+        {f'SUM(COALESCE({gst}, 0))' if gst else '0'} AS GST, {f'SUM(COALESCE({tax}, 0))' if tax else '0'} AS TotalTax
+        FROM {table} WHERE DeletedAt IS NULL GROUP BY 1, 3, 4"""
+
+def _rebuild(db):
+    db.execute('DELETE FROM revenuedaily')
+    for table in REVENUE_SOURCES:
+        db.execute(
+            'INSERT INTO revenuedaily (Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax) '
+            + _source_query(table)
+        )
+
+def rebuild_revenue(db):
+    # BEGIN IMMEDIATE keeps writers (and their triggers) out while we rebuild
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        _rebuild(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+def sync_day_offset(db):
+    # Called at startup, after the migrations that must run before serving.
+    # When the offset changes, days already rolled up are recomputed; on a
+    # database upgraded just now revenuedaily is still empty and 0004's
+    # backfill picks the new offset up instead.
+    offset = config.REPORT_UTC_OFFSET_MINUTES
+    if db.execute('SELECT DayOffsetMinutes FROM revenuesettings').fetchone()[0] == offset:
+        return False
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        db.execute('UPDATE revenuesettings SET DayOffsetMinutes = ?', (offset,))
+        if db.execute('SELECT 1 FROM revenuedaily LIMIT 1').fetchone():
+            _rebuild(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return True
+
+def verify_revenue(db):
+    def key(row):
+        return tuple(row[:4])
+
+    stored = {key(row): row[4:] for row in db.execute(
+        'SELECT Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax FROM revenuedaily WHERE Count != 0'
+    )}
+    actual = {}
+    for table in REVENUE_SOURCES:
+        actual.update((key(row), row[4:]) for row in db.execute(_source_query(table)))
+
+    drift = []
+    for group in sorted(set(stored) | set(actual)):
+        expected, found = actual.get(group, (0, 0, 0, 0)), stored.get(group, (0, 0, 0, 0))
+        # Sums are floating point; anything under half a paisa is rounding
+        if expected[0] != found[0] or any(abs(a - b) >= 0.005 for a, b in zip(expected[1:], found[1:])):
+            drift.append({"group": group, "stored": found, "actual": expected})
+    return drift
+
+def ensure_revenue(db):
+    # Databases created before revenuedaily existed start with an empty table
+    if db.execute('SELECT 1 FROM revenuedaily LIMIT 1').fetchone():
+        return
+    if any(db.execute(f'SELECT 1 FROM {table} LIMIT 1').fetchone() for table in REVENUE_SOURCES):
+        rebuild_revenue(db)
+
+def revenue_report(db, date_from, date_to, group_by=('day',), tables=None, modes=None, statuses=None):
+    keys = [GROUPINGS[name][0] for name in group_by]
+    expressions = [GROUPINGS[name][1] for name in group_by]
+
+    where = ['Day BETWEEN ? AND ?']
+    params = [date_from.isoformat(), date_to.isoformat()]
+    for column, values in (('TableName', tables), ('ModeOfPayment', modes), ('Status', statuses)):
+        if values:
+            where.append(f'{column} IN (SELECT value FROM json_each(?))')
+            params.append(json.dumps(list(values)))
+    where_sql = ' AND '.join(where)
+
+    metrics_sql = 'SUM(Count), ROUND(SUM(Total), 2), ROUND(SUM(GST), 2), ROUND(SUM(TotalTax), 2)'
+    source = 'revenuedaily'
+    if not migrate.rollups_ready(db):
+        source = '(' + ' UNION ALL '.join(_source_query(table) for table in REVENUE_SOURCES) + ')'
+    rows = []
+    if expressions:
+        group_sql = ', '.join(expressions)
+        cur = db.execute(
+            f'SELECT {group_sql}, {metrics_sql} FROM {source} WHERE {where_sql} '
+            f'GROUP BY {group_sql} HAVING SUM(Count) != 0 ORDER BY {group_sql}',
+            params
+        )
+        rows = [dict(zip((*keys, *METRICS), row)) for row in cur.fetchall()]
+
+    cur = db.execute(f'SELECT {metrics_sql} FROM {source} WHERE {where_sql}', params)
+    totals = dict(zip(METRICS, (value or 0 for value in cur.fetchone())))
+    return {
+        "date_from": date_from.isoformat(),
+        "date_to": date_to.isoformat(),
+        "group_by": list(group_by),
+        "rows": rows,
+        "totals": totals
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m app.reports', description='Verify or rebuild the revenue rollups')
+    parser.add_argument('command', choices=['verify', 'rebuild'])
+    args = parser.parse_args(argv)
+
+    from .database import get_db, init_db
+    init_db()
+    with get_db() as db:
+        if args.command == 'rebuild':
+            rebuild_revenue(db)
+            count = db.execute('SELECT COUNT(*) FROM revenuedaily').fetchone()[0]
+            print(f'Rebuilt revenuedaily ({count} rows)')
+            return 0
+
+        drift = verify_revenue(db)
+        for item in drift:
+            print(f"{' / '.join(item['group'])}: stored={item['stored']} actual={item['actual']}")
+        if not drift:
+            print('Revenue rollups are consistent')
+    return 1 if drift else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import json
+from functools import lru_cache
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+# JSON responses without the generic encoder.
+#
+# FastAPI's default path validates a handler's return value against its
+# response_model, converts the result to plain Python with jsonable_encoder and
+# then runs json.dumps. Read endpoints skip that:
+#   json_response()   rows straight from our tables are already JSON types, so
+#                     list pages are encoded as they are
+#   model_response()  when a model's conversions matter (datetimes, 0/1 to
+#                     bool), a cached TypeAdapter validates and writes JSON bytes
+#                     in one pydantic-core pass
+# response_model stays on the routes for the OpenAPI schema. orjson is used
+# when installed (pip install orjson), with the stdlib json module as fallback.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(value):
+    return jsonable_encoder(value)
+
+def dumps(content):
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    # Same output as Starlette's JSONResponse
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(',', ':'), default=_default).encode('utf-8')
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content):
+        return dumps(content)
+
+def _headers(response):
+    # Headers a handler set on its injected Response (ETag, Cache-Control)
+    return dict(response.headers) if response is not None else None
+
+@lru_cache(maxsize=None)
+def adapter(model):
+    return TypeAdapter(model)
+
+def json_response(content, response=None, status_code=200):
+    # A ready Response (such as a 304 from app/etag.py) passes through
+    if isinstance(content, Response):
+        return content
+    return FastJSONResponse(content, status_code=status_code, headers=_headers(response))
+
+def model_response(model, content, response=None, status_code=200, exclude_unset=False):
+    if isinstance(content, Response):
+        return content
+    model_adapter = adapter(model)
+    body = model_adapter.dump_json(model_adapter.validate_python(content), exclude_unset=exclude_unset)
+    return Response(body, status_code=status_code, media_type='application/json', headers=_headers(response))
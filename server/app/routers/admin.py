@@ -0,0 +1,40 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse
+from .. import aio, profiling, querylog, reconcile, writer
+from ..schemas import ProfileIndex, ReconcileResponse, SlowQueryResponse
+
+router = APIRouter()
+
+@router.get("/admin/reconcile", response_model=ReconcileResponse)
+async def check_balances(request: Request, limit: int = Query(100, ge=1, le=10000, description='Drifted customers to return')):
+    return await aio.query(request, reconcile.reconcile, False, limit)
+
+@router.post("/admin/reconcile", response_model=ReconcileResponse)
+async def repair_balances(request: Request, limit: int = Query(100, ge=1, le=10000, description='Drifted customers to return')):
+    # The drift is read on a reader; only the differences go through the writer
+    report = await aio.query(request, reconcile.find_drift)
+    report["repaired"] = await writer.run(reconcile.repair, report["drift"])
+    report["drift"] = report["drift"][:limit]
+    return report
+
+@router.get("/admin/slow-queries", response_model=SlowQueryResponse)
+def slow_queries(
+    limit: int = Query(20, ge=1, le=querylog.MAX_QUERIES, description='Statements to return'),
+    order: str = Query('max', pattern='^(max|mean|total|count)$', description='Rank by slowest, mean or total time, or by how often')
+):
+    return querylog.report(limit=limit, order=order)
+
+@router.get("/admin/profiles", response_model=ProfileIndex)
+def list_profiles(
+    limit: int = Query(50, ge=1, le=1000, description='Profiles to return, newest first'),
+    route: Optional[str] = Query(None, description='Only profiles of this route template, e.g. /api/v1/customers/{item_id}')
+):
+    return {"enabled": profiling.ENABLED, "profiles": profiling.list_profiles(limit=limit, route=route)}
+
+@router.get("/admin/profiles/{name}")
+def get_profile(name: str):
+    path = profiling.stacks_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type='text/plain; charset=utf-8', filename=name + profiling.STACKS_SUFFIX)
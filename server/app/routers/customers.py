@@ -1,133 +1,50 @@
-from fastapi import APIRouter, HTTPException, Query
+import anyio
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from datetime import date
 from typing import Optional
-from ..database import get_db
-from ..schemas import CustomerCreate, CustomerUpdate, CustomerResponse, PaginationParams, PaginatedResponse
-import sqlite3
+from .. import aio, crud, etag, fields, importer, responses, search, statements, uploads, writer
+from ..pagination import page_response
+from ..schemas import CustomerCreate, CustomerUpdate, CustomerResponse, CustomerImportResponse, CustomerStatementResponse, PaginationParams, PaginatedResponse
 
 router = APIRouter()
 
-@router.post("/customers", response_model=CustomerResponse, status_code=201)
-def create_customer(customer: CustomerCreate):
-    with get_db() as db:
-        # Check for phone number uniqueness
-        if customer.Phone:
-            cur = db.execute('SELECT Id FROM customers WHERE Phone = ? AND DeletedAt IS NULL', (customer.Phone,))
-            if cur.fetchone():
-                raise HTTPException(status_code=409, detail=f'Phone number {customer.Phone} already exists')
-
-        try:
-            cur = db.execute(
-                'INSERT INTO customers (Name, Phone, Balance, Notes, Disabled) VALUES (?, ?, ?, ?, ?)',
-                (customer.Name, customer.Phone, customer.Balance, customer.Notes, customer.Disabled)
-            )
-            db.commit()
-            
-            # Fetch the created customer
-            cur = db.execute('SELECT * FROM customers WHERE rowid = ?', (cur.lastrowid,))
-            new_customer = cur.fetchone()
-            if new_customer:
-                return dict(new_customer)
-            raise HTTPException(status_code=500, detail="Failed to create customer")
-        except sqlite3.IntegrityError as e:
-            raise HTTPException(status_code=400, detail=str(e))
-
-@router.get("/customers", response_model=PaginatedResponse)
-def list_customers(page: int = Query(1, ge=1), limit: int = Query(20, ge=1, le=100)):
-    pagination = PaginationParams(page=page, limit=limit)
-    
-    with get_db() as db:
-        # Count total records
-        count_cur = db.execute('SELECT COUNT(Id) FROM customers WHERE DeletedAt IS NULL')
-        total_records = count_cur.fetchone()[0]
-
-        # Fetch paginated data
-        cur = db.execute(
-            'SELECT * FROM customers WHERE DeletedAt IS NULL ORDER BY CreatedDate DESC LIMIT ? OFFSET ?',
-            (pagination.limit, pagination.offset)
-        )
-        rows = [dict(row) for row in cur.fetchall()]
-
-        return {
-            "data": rows,
-            "pagination": {
-                "total_records": total_records,
-                "current_page": pagination.page,
-                "total_pages": (total_records + pagination.limit - 1) // pagination.limit if total_records > 0 else 0,
-                "limit": pagination.limit
-            }
-        }
+resource = crud.Resource(
+    'customers', CustomerCreate, CustomerResponse, label='Customer',
+    name='customer', plural='customers', update_model=CustomerUpdate,
+    customer_column=None, export_customer_column='Id',
+    unique_messages={'Phone': 'Phone number {Phone} already exists'}
+)
+
+@router.post("/customers/import", response_model=CustomerImportResponse, openapi_extra=uploads.FILE_REQUEST_BODY)
+async def import_customers(request: Request):
+    # Parsing runs on a worker thread that pulls the body from the event loop
+    # as it is needed; each chunk's insert is a writer job
+    return await anyio.to_thread.run_sync(
+        importer.import_upload, request.headers.get('content-type', ''), uploads.receiver(request), writer.call
+    )
 
 @router.get("/customers/search", response_model=PaginatedResponse)
-def search_customers(q: str = Query(..., min_length=1), page: int = Query(1, ge=1), limit: int = Query(20, ge=1, le=100)):
+async def search_customers(request: Request, response: Response, q: str = Query(..., min_length=1), page: int = Query(1, ge=1), limit: int = Query(20, ge=1, le=100), include_total: bool = Query(True), fields_param: Optional[str] = Query(None, alias='fields', description='Comma-separated columns to return, or * for all')):
     if not q:
         raise HTTPException(status_code=400, detail="Search query 'q' is required")
     
-    pagination = PaginationParams(page=page, limit=limit)
-    like_query = f'%{q}%'
+    pagination = PaginationParams(page=page, limit=limit, include_total=include_total)
+    columns = fields.parse_fields(CustomerResponse, fields_param, heavy=False)
     
-    with get_db() as db:
-        # Count total records
-        count_cur = db.execute(
-            'SELECT COUNT(Id) FROM customers WHERE (Name LIKE ? OR Phone LIKE ?) AND DeletedAt IS NULL',
-            (like_query, like_query)
-        )
-        total_records = count_cur.fetchone()[0]
-
-        # Fetch paginated data
-        cur = db.execute(
-            'SELECT * FROM customers WHERE (Name LIKE ? OR Phone LIKE ?) AND DeletedAt IS NULL ORDER BY Name LIMIT ? OFFSET ?',
-            (like_query, like_query, pagination.limit, pagination.offset)
-        )
-        rows = [dict(row) for row in cur.fetchall()]
-
-        return {
-            "data": rows,
-            "pagination": {
-                "total_records": total_records,
-                "current_page": pagination.page,
-                "total_pages": (total_records + pagination.limit - 1) // pagination.limit if total_records > 0 else 0,
-                "limit": pagination.limit
-            }
-        }
-
-@router.get("/customers/{customer_id}", response_model=CustomerResponse)
-def get_customer(customer_id: str):
-    with get_db() as db:
-        cur = db.execute('SELECT * FROM customers WHERE Id = ? AND DeletedAt IS NULL', (customer_id,))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail='Customer not found')
-        return dict(row)
-
-@router.put("/customers/{customer_id}", response_model=CustomerResponse)
-def update_customer(customer_id: str, customer: CustomerUpdate):
-    with get_db() as db:
-        # Check if customer exists
-        cur = db.execute('SELECT Id FROM customers WHERE Id = ? AND DeletedAt IS NULL', (customer_id,))
-        if not cur.fetchone():
-            raise HTTPException(status_code=404, detail='Customer not found')
-
-        # Build update query
-        fields = []
-        params = []
-        for key, value in customer.dict(exclude_unset=True).items():
-            fields.append(f"{key} = ?")
-            params.append(value)
-
-        if not fields:
-            raise HTTPException(status_code=400, detail='No fields to update')
-
-        params.append(customer_id)
-        db.execute(f'UPDATE customers SET {", ".join(fields)} WHERE Id = ?', params)
-        db.commit()
-
-        # Return updated customer
-        cur = db.execute('SELECT * FROM customers WHERE Id = ?', (customer_id,))
-        return dict(cur.fetchone())
-
-@router.delete("/customers/{customer_id}")
-def delete_customer(customer_id: str):
-    with get_db() as db:
-        db.execute('UPDATE customers SET DeletedAt = CURRENT_TIMESTAMP WHERE Id = ?', (customer_id,))
-        db.commit()
-        return {"message": "Customer deleted successfully"}
\ No newline at end of file
+    def read(db):
+        not_modified = etag.check_list(request, response, db, 'customers')
+        if not_modified:
+            return not_modified
+        rows, total_records = search.search_customers(db, q, pagination, columns)
+        return responses.json_response(page_response(rows, pagination, total_records), response)
+    return await aio.query(request, read)
+
+@router.get("/customers/{customer_id}/statement", response_model=CustomerStatementResponse)
+async def get_customer_statement(request: Request, customer_id: str, date_from: Optional[date] = Query(None, alias='from'), date_to: Optional[date] = Query(None, alias='to'), limit: Optional[int] = Query(None, ge=1, le=5000), cursor: Optional[str] = Query(None)):
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+
+    statement = await aio.query(request, statements.customer_statement, customer_id, date_from, date_to, limit, cursor)
+    return responses.model_response(CustomerStatementResponse, statement)
+
+crud.add_routes(router, resource, bulk=False)
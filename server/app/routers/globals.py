@@ -1,16 +1,22 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from datetime import date
+from typing import Optional
 from ..database import get_db
+from .. import aio, etag, export, fields, responses, writer
+from ..globals_cache import globals_cache
+from ..pagination import paginate
 from ..schemas import GlobalSettingCreate, GlobalSettingResponse, GlobalSettingUpdate, PaginationParams, PaginatedResponse
 import sqlite3
 
 router = APIRouter()
 
 @router.post("/globals", response_model=GlobalSettingResponse, status_code=201)
-def create_global(setting: GlobalSettingCreate):
-    with get_db() as db:
+async def create_global(setting: GlobalSettingCreate):
+    def write(db):
         try:
             cur = db.execute('INSERT INTO globals (Key, Value) VALUES (?, ?)', (setting.Key, setting.Value))
             db.commit()
+            globals_cache.invalidate()
             
             cur = db.execute('SELECT * FROM globals WHERE rowid = ?', (cur.lastrowid,))
             new_setting = cur.fetchone()
@@ -19,43 +25,43 @@ def create_global(setting: GlobalSettingCreate):
             raise HTTPException(status_code=500, detail="Failed to create global setting")
         except sqlite3.IntegrityError:
             raise HTTPException(status_code=409, detail=f'Key "{setting.Key}" already exists')
+    return await writer.run(write)
 
 @router.get("/globals", response_model=PaginatedResponse)
-def list_globals(page: int = Query(1, ge=1), limit: int = Query(20, ge=1, le=100)):
-    pagination = PaginationParams(page=page, limit=limit)
+async def list_globals(request: Request, response: Response, page: int = Query(1, ge=1), limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = Query(None), include_total: bool = Query(True), fields_param: Optional[str] = Query(None, alias='fields', description='Comma-separated columns to return, or * for all')):
+    pagination = PaginationParams(page=page, limit=limit, cursor=cursor, include_total=include_total)
+    # Key is the sort column, so the cursor needs it
+    columns = fields.parse_fields(GlobalSettingResponse, fields_param, heavy=False, keep=('Key',))
     
-    with get_db() as db:
-        count_cur = db.execute('SELECT COUNT(Id) FROM globals WHERE DeletedAt IS NULL')
-        total_records = count_cur.fetchone()[0]
+    def read(db):
+        not_modified = etag.check_list(request, response, db, 'globals')
+        if not_modified:
+            return not_modified
+        return responses.json_response(paginate(db, 'globals', pagination, order=('Key',), descending=False, columns=columns), response)
+    return await aio.query(request, read)
 
-        cur = db.execute(
-            'SELECT * FROM globals WHERE DeletedAt IS NULL ORDER BY Key LIMIT ? OFFSET ?',
-            (pagination.limit, pagination.offset)
-        )
-        rows = [dict(row) for row in cur.fetchall()]
+@router.get("/globals/export")
+def export_globals(fmt: str = Query('csv', alias='format', pattern='^(csv|ndjson)$'), date_from: Optional[date] = Query(None, alias='from'), date_to: Optional[date] = Query(None, alias='to'), gzip: bool = Query(False)):
+    return export.export_response('globals', fmt, date_from, date_to, gzip=gzip, customer_column=None)
 
-        return {
-            "data": rows,
-            "pagination": {
-                "total_records": total_records,
-                "current_page": pagination.page,
-                "total_pages": (total_records + pagination.limit - 1) // pagination.limit if total_records > 0 else 0,
-                "limit": pagination.limit
-            }
-        }
+@router.get("/globals/{key}", response_model=fields.partial_model(GlobalSettingResponse), response_model_exclude_unset=True)
+def get_global(key: str, request: Request, response: Response, fields_param: Optional[str] = Query(None, alias='fields', description='Comma-separated columns to return, or * for all')):
+    columns = fields.parse_fields(GlobalSettingResponse, fields_param)
 
-@router.get("/globals/{key}", response_model=GlobalSettingResponse)
-def get_global(key: str):
     with get_db() as db:
-        cur = db.execute('SELECT * FROM globals WHERE Key = ? AND DeletedAt IS NULL', (key,))
-        row = cur.fetchone()
-        if not row:
+        setting = globals_cache.get(db, key)
+        if not setting:
             raise HTTPException(status_code=404, detail=f'Global setting with key "{key}" not found')
-        return dict(row)
+        # The cached row carries LastModifiedDate, so this needs no query
+        row_etag = etag.row_etag(setting['Id'], setting['LastModifiedDate'], columns)
+        if etag.matches(request, row_etag):
+            return etag.not_modified(row_etag)
+        etag.set_etag(response, row_etag)
+        return responses.model_response(fields.partial_model(GlobalSettingResponse), fields.project(setting, columns), response, exclude_unset=True)
 
 @router.put("/globals/{key}", response_model=GlobalSettingResponse)
-def update_global(key: str, setting: GlobalSettingUpdate):
-    with get_db() as db:
+async def update_global(key: str, setting: GlobalSettingUpdate):
+    def write(db):
         # Check if setting exists
         cur = db.execute('SELECT Id FROM globals WHERE Key = ? AND DeletedAt IS NULL', (key,))
         if not cur.fetchone():
@@ -63,18 +69,22 @@ def update_global(key: str, setting: GlobalSettingUpdate):
 
         db.execute('UPDATE globals SET Value = ? WHERE Key = ?', (setting.Value, key))
         db.commit()
+        globals_cache.invalidate()
 
         # Return updated setting
         cur = db.execute('SELECT * FROM globals WHERE Key = ?', (key,))
         return dict(cur.fetchone())
+    return await writer.run(write)
 
 @router.delete("/globals/{key}")
-def delete_global(key: str):
-    with get_db() as db:
+async def delete_global(key: str):
+    def write(db):
         cur = db.execute('SELECT Id FROM globals WHERE Key = ? AND DeletedAt IS NULL', (key,))
         if not cur.fetchone():
             return {"message": "Global setting already deleted or does not exist"}
 
         db.execute('UPDATE globals SET DeletedAt = CURRENT_TIMESTAMP WHERE Key = ?', (key,))
         db.commit()
-        return {"message": f'Global setting with key "{key}" deleted successfully'}
\ No newline at end of file
+        globals_cache.invalidate()
+        return {"message": f'Global setting with key "{key}" deleted successfully'}
+    return await writer.run(write)
\ No newline at end of file
@@ -0,0 +1,29 @@
+import anyio
+from fastapi import APIRouter, Query, Request
+from typing import Optional
+from .. import crud, media, uploads, writer
+from .photo_certificate import resource as photo_certificates
+from ..schemas import MediaUploadResponse, PhotoCertificateResponse
+
+router = APIRouter()
+
+def _store_upload(request):
+    # Hashing and writing run on a worker thread that pulls the body as needed
+    return anyio.to_thread.run_sync(media.store_upload, request.headers.get('content-type', ''), uploads.receiver(request))
+
+@router.post("/media", response_model=MediaUploadResponse, status_code=201, openapi_extra=uploads.FILE_REQUEST_BODY)
+async def upload_media(request: Request):
+    return await _store_upload(request)
+
+@router.get("/media/{digest}")
+def get_media(digest: str, request: Request):
+    return media.media_response(request, digest)
+
+@router.get("/media/{digest}/thumbnail")
+def get_media_thumbnail(digest: str, request: Request, size: Optional[int] = Query(None, description='128, 256 or 512 pixels')):
+    return media.thumbnail_response(request, digest, size)
+
+@router.put("/photocertificate/{certificate_id}/media", response_model=PhotoCertificateResponse, openapi_extra=uploads.FILE_REQUEST_BODY)
+async def attach_photo_certificate_media(certificate_id: str, request: Request):
+    stored = await _store_upload(request)
+    return await writer.run(crud.update_values, photo_certificates, certificate_id, {"Media": stored["hash"]})
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from datetime import date
+from typing import Optional
+from .. import aio, reports, responses
+from ..schemas import RevenueReportResponse
+
+router = APIRouter()
+
+def _split(value, allowed=None, name=None):
+    if not value:
+        return []
+    items = [item.strip() for item in value.split(',') if item.strip()]
+    if allowed is not None:
+        unknown = [item for item in items if item not in allowed]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f'Unknown {name}: {", ".join(unknown)}; expected one of {list(allowed)}')
+    return items
+
+@router.get("/reports/revenue", response_model=RevenueReportResponse)
+async def get_revenue_report(
+    request: Request,
+    date_from: date = Query(..., alias='from'),
+    date_to: date = Query(..., alias='to'),
+    group_by: str = Query('day', description='Comma-separated: day, month, year, table, mode, status'),
+    table: Optional[str] = Query(None, description='Comma-separated table names'),
+    mode: Optional[str] = Query(None, description='Comma-separated payment modes'),
+    status: Optional[str] = Query(None, description='Comma-separated statuses')
+):
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+
+    report = await aio.query(
+        request, reports.revenue_report, date_from, date_to,
+        _split(group_by, reports.GROUPINGS, 'group_by'),
+        _split(table, reports.REVENUE_SOURCES, 'table'),
+        _split(mode),
+        _split(status)
+    )
+    return responses.json_response(report)
@@ -1,10 +1,25 @@
-from pydantic import BaseModel, Field, validator
-from typing import Optional, List, Dict, Any
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field
+from typing import Annotated, Optional, List, Dict, Any, Literal, get_args
 from datetime import datetime
+from . import media
+
+# Literal types are checked inside pydantic-core; same values as the CHECK
+# constraints in migrations/0001_baseline.sql
+PaymentMode = Literal['bill', 'cash', 'upi', 'cheque', 'neft']
+CertificateStatus = Literal['pending', 'completed', 'cancelled']
+EntryType = Literal['credit', 'debit']
+
+def _stored_media(digest):
+    if not media.exists(digest):
+        raise ValueError('No stored media with this hash; upload it with POST /api/v1/media first')
+    return digest
+
+# SHA-256 of a file already in the media store (app/media.py)
+StoredMedia = Annotated[str, Field(pattern=r'^[0-9a-f]{64}$'), AfterValidator(_stored_media)]
 
 # Constants
-PAYMENT_MODES = ['bill', 'cash', 'upi', 'cheque', 'neft']
-CERT_STATUS = ['pending', 'completed', 'cancelled']
+PAYMENT_MODES = list(get_args(PaymentMode))
+CERT_STATUS = list(get_args(CertificateStatus))
 
 class CustomerBase(BaseModel):
     Name: str = Field(..., min_length=1)
@@ -29,26 +44,24 @@ class CustomerResponse(CustomerBase):
     LastModifiedDate: datetime
     DeletedAt: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+class ImportRowError(BaseModel):
+    row: int
+    detail: str
+
+class CustomerImportResponse(BaseModel):
+    total_rows: int
+    imported: int
+    rejected: int
+    errors: List[ImportRowError]
+    errors_truncated: bool = False
 
 class CreditHistoryBase(BaseModel):
     CustomerId: str
-    Type: str
+    Type: EntryType
     Amount: float = Field(..., gt=0)
-    ModeOfPayment: str
-
-    @validator('Type')
-    def validate_type(cls, v):
-        if v not in ['credit', 'debit']:
-            raise ValueError("Type must be 'credit' or 'debit'")
-        return v
-
-    @validator('ModeOfPayment')
-    def validate_payment_mode(cls, v):
-        if v not in PAYMENT_MODES:
-            raise ValueError(f"ModeOfPayment must be one of {PAYMENT_MODES}")
-        return v
+    ModeOfPayment: PaymentMode
 
 class CreditHistoryCreate(CreditHistoryBase):
     pass
@@ -60,28 +73,22 @@ class CreditHistoryResponse(CreditHistoryBase):
     LastModifiedDate: datetime
     DeletedAt: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+class CreditHistoryPostResponse(BaseModel):
+    message: str
+    Id: str
+    CustomerId: str
+    PreviousBalance: float
+    Balance: float
 
 class CertificateBase(BaseModel):
     CustomerId: Optional[str] = None
-    Status: str = "pending"
+    Status: CertificateStatus = "pending"
     Data: Optional[str] = None
-    ModeOfPayment: str
+    ModeOfPayment: PaymentMode
     Total: float = Field(..., ge=0)
 
-    @validator('Status')
-    def validate_status(cls, v):
-        if v not in CERT_STATUS:
-            raise ValueError(f"Status must be one of {CERT_STATUS}")
-        return v
-
-    @validator('ModeOfPayment')
-    def validate_payment_mode(cls, v):
-        if v not in PAYMENT_MODES:
-            raise ValueError(f"ModeOfPayment must be one of {PAYMENT_MODES}")
-        return v
-
 class GoldCertificateCreate(CertificateBase):
     GST: float = Field(0.00, ge=0)
     GSTBillNumber: Optional[str] = None
@@ -93,8 +100,7 @@ class GoldCertificateResponse(GoldCertificateCreate):
     LastModifiedDate: datetime
     DeletedAt: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class GoldTestCreate(CertificateBase):
     pass
@@ -105,23 +111,28 @@ class GoldTestResponse(GoldTestCreate):
     LastModifiedDate: datetime
     DeletedAt: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class PhotoCertificateCreate(CertificateBase):
-    Media: Optional[str] = None
+    Media: Optional[StoredMedia] = None
     GST: float = Field(0.00, ge=0)
     GSTBillNumber: Optional[str] = None
     TotalTax: float = Field(0.00, ge=0)
 
 class PhotoCertificateResponse(PhotoCertificateCreate):
+    # Rows saved before the media store may still hold inline images
+    Media: Optional[str] = None
     Id: str
     CreatedDate: datetime
     LastModifiedDate: datetime
     DeletedAt: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+class MediaUploadResponse(BaseModel):
+    hash: str
+    size: int
+    content_type: str
 
 class SilverCertificateCreate(CertificateBase):
     GST: float = Field(0.00, ge=0)
@@ -134,19 +145,12 @@ class SilverCertificateResponse(SilverCertificateCreate):
     LastModifiedDate: datetime
     DeletedAt: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class WeightLossHistoryBase(BaseModel):
     CustomerId: str
     Amount: float = Field(..., gt=0)
-    ModeOfPayment: str
-
-    @validator('ModeOfPayment')
-    def validate_payment_mode(cls, v):
-        if v not in PAYMENT_MODES:
-            raise ValueError(f"ModeOfPayment must be one of {PAYMENT_MODES}")
-        return v
+    ModeOfPayment: PaymentMode
 
 class WeightLossHistoryCreate(WeightLossHistoryBase):
     pass
@@ -157,8 +161,7 @@ class WeightLossHistoryResponse(WeightLossHistoryBase):
     LastModifiedDate: datetime
     DeletedAt: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class GlobalSettingBase(BaseModel):
     Key: str = Field(..., min_length=1)
@@ -173,21 +176,116 @@ class GlobalSettingResponse(GlobalSettingBase):
     LastModifiedDate: datetime
     DeletedAt: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class GlobalSettingUpdate(BaseModel):
     Value: str
 
+class BatchItemResult(BaseModel):
+    index: int
+    status: str
+    Id: Optional[str] = None
+    detail: Optional[str] = None
+    CustomerId: Optional[str] = None
+    PreviousBalance: Optional[float] = None
+    Balance: Optional[float] = None
+
+class BatchResponse(BaseModel):
+    mode: str
+    created: int
+    failed: int
+    results: List[BatchItemResult]
+
+class StatementEntry(BaseModel):
+    Id: str
+    CreatedDate: datetime
+    Type: str
+    Amount: float
+    ModeOfPayment: str
+    PreviousBalance: Optional[float] = None
+    Balance: float
+
+class CustomerStatementResponse(BaseModel):
+    customer: Dict[str, Any]
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    opening_balance: float
+    closing_balance: float
+    total_credit: float
+    total_debit: float
+    entries: List[StatementEntry]
+    next_cursor: Optional[str] = None
+
+class RevenueReportResponse(BaseModel):
+    date_from: str
+    date_to: str
+    group_by: List[str]
+    rows: List[Dict[str, Any]]
+    totals: Dict[str, Any]
+
+class BalanceDrift(BaseModel):
+    CustomerId: str
+    Name: str
+    Balance: float
+    ExpectedBalance: float
+    Difference: float
+
+class ReconcileResponse(BaseModel):
+    ledger_rows: int
+    customers_checked: int
+    drifted: int
+    repaired: int
+    load_seconds: float
+    compute_seconds: float
+    drift: List[BalanceDrift]
+
+class SlowQuery(BaseModel):
+    sql: str
+    count: int
+    total_ms: float
+    max_ms: float
+    mean_ms: float
+    last_ms: float
+    last_seen: datetime
+    routes: List[str]
+    parameters: List[str]
+    plan: List[str]
+    full_scans: List[str]
+
+class SlowQueryResponse(BaseModel):
+    threshold_ms: int
+    since: datetime
+    queries: List[SlowQuery]
+
+class ProfileInfo(BaseModel):
+    name: str
+    created: datetime
+    method: str
+    path: str
+    route: str
+    status: int
+    duration_ms: float
+    samples: int
+    interval_ms: int
+    trigger: Literal['header', 'query', 'sampled']
+
+class ProfileIndex(BaseModel):
+    enabled: bool
+    profiles: List[ProfileInfo]
+
 class PaginationParams:
     def __init__(
         self,
         page: int = 1,
-        limit: int = 20
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        include_total: bool = True
     ):
         self.page = max(1, page)
         self.limit = max(1, min(limit, 100))
         self.offset = (self.page - 1) * self.limit
+        self.cursor = cursor or None
+        self.include_total = include_total
 
 class PaginatedResponse(BaseModel):
     data: List[Any]
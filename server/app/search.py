@@ -0,0 +1,112 @@
+import argparse
+import sqlite3
+import sys
+from . import migrate
+
+# Customer search over customers_fts (see
+# migrations/0002_triggers_and_rollups.sql). The trigram tokenizer needs at
+# least 3 characters per term; shorter terms are applied as filters on the FTS
+# result, or as an indexed prefix scan when no term is long enough. A short
+# all-digit query is also matched against the end of the phone number ("last
+# two digits"), which scans the Phone index rather than the table. While an
+# upgraded database is still filling customers_fts, every term is a LIKE over
+# customers, which finds the same rows more slowly.
+MIN_TERM_LENGTH = 3
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def _escape_glob(value):
+    return ''.join(f'[{ch}]' if ch in '*?[' else ch for ch in value)
+
+def _match_expression(terms):
+    return ' AND '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+def search_customers(db, q, pagination, columns=None):
+    terms = q.split()
+    long_terms = [term for term in terms if len(term) >= MIN_TERM_LENGTH]
+    short_terms = [term for term in terms if len(term) < MIN_TERM_LENGTH]
+    query = ' '.join(terms)
+    if not terms:
+        return [], 0 if pagination.include_total else None
+
+    if long_terms and not migrate.rollups_ready(db):
+        source = 'customers c'
+        where = ['c.DeletedAt IS NULL']
+        params = []
+        for term in terms:
+            where.append("(c.Name LIKE ? ESCAPE '\\' OR c.Phone LIKE ? ESCAPE '\\')")
+            params += [f'%{_escape_like(term)}%'] * 2
+        order_by = 'c.Name'
+    elif long_terms:
+        source = 'customers_fts f JOIN customers c ON c.rowid = f.rowid'
+        where = ['customers_fts MATCH ?', 'c.DeletedAt IS NULL']
+        params = [_match_expression(long_terms)]
+        for term in short_terms:
+            where.append("(c.Name LIKE ? ESCAPE '\\' OR c.Phone LIKE ? ESCAPE '\\')")
+            params += [f'%{_escape_like(term)}%'] * 2
+        order_by = 'f.rank, c.Name'
+    else:
+        source = 'customers c'
+        # A UNION of index scans; a plain OR here would scan the table
+        arms = [
+            "SELECT rowid FROM customers WHERE Name LIKE ? ESCAPE '\\' AND DeletedAt IS NULL",
+            'SELECT rowid FROM customers WHERE Phone GLOB ?'
+        ]
+        params = [f'{_escape_like(query)}%', f'{_escape_glob(query)}*']
+        if query.isdigit():
+            arms.append('SELECT rowid FROM customers WHERE Phone GLOB ?')
+            params.append(f'*{query}')
+        where = [f"c.rowid IN ({' UNION '.join(arms)})", 'c.DeletedAt IS NULL']
+        order_by = 'c.Name'
+    where_sql = ' AND '.join(where)
+
+    total_records = None
+    if pagination.include_total:
+        cur = db.execute(f'SELECT COUNT(*) FROM {source} WHERE {where_sql}', params)
+        total_records = cur.fetchone()[0]
+
+    select = ', '.join(f'c.{column}' for column in columns) if columns else 'c.*'
+    # Phone suffix hits (last-N digits) first, then name prefixes, then bm25
+    cur = db.execute(
+        f"""SELECT {select} FROM {source} WHERE {where_sql}
+        ORDER BY (c.Phone LIKE ? ESCAPE '\\') DESC, (c.Name LIKE ? ESCAPE '\\') DESC, {order_by}
+        LIMIT ? OFFSET ?""",
+        (*params, f'%{_escape_like(query)}', f'{_escape_like(query)}%', pagination.limit, pagination.offset)
+    )
+    rows = [dict(row) for row in cur.fetchall()]
+    return rows, total_records
+
+def rebuild_search_index(db):
+    db.execute("INSERT INTO customers_fts (customers_fts) VALUES ('rebuild')")
+    db.commit()
+
+def ensure_search_index(db):
+    # customers_fts_docsize is empty for databases created before the index existed
+    indexed = db.execute('SELECT 1 FROM customers_fts_docsize LIMIT 1').fetchone()
+    if not indexed and db.execute('SELECT 1 FROM customers LIMIT 1').fetchone():
+        rebuild_search_index(db)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m app.search', description='Maintain the customer search index')
+    parser.add_argument('command', choices=['rebuild', 'check'])
+    args = parser.parse_args(argv)
+
+    from .database import get_db, init_db
+    init_db()
+    with get_db() as db:
+        if args.command == 'rebuild':
+            rebuild_search_index(db)
+            print('Rebuilt customer search index')
+        else:
+            # integrity-check with rank=1 also compares the index against customers
+            try:
+                db.execute("INSERT INTO customers_fts (customers_fts, rank) VALUES ('integrity-check', 1)")
+            except sqlite3.DatabaseError as e:
+                print(f'Customer search index is out of date ({e}); run: python -m app.search rebuild')
+                return 1
+            print('Customer search index is consistent')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,225 @@
+import argparse
+import sys
+import threading
+from datetime import timedelta
+from fastapi import HTTPException
+from . import config, ledger, pagination, reports, writer
+
+# Customer statements. Entries are live credit history rows in ledger order,
+# (CreatedDate, rowid): CreatedDate has one-second resolution and Ids are
+# random, so entries posted within the same second are ordered by rowid, which
+# is posting order. The balance before the customer's first posting (deleted
+# or not) is that entry's PreviousBalance, and every live entry adds its signed
+# amount (credit +, debit -). app/reconcile.py uses the same definition.
+#
+# Running balances inside a page come from a window function, started from
+# the balance before the page's first entry. That balance comes from
+# balancecheckpoints: the last checkpoint before it plus the few entries
+# between, so the cost does not grow with the length of the customer's
+# history. Statement reads never write; when a customer has more than
+# STATEMENT_CHECKPOINT_INTERVAL entries past the last checkpoint, the read
+# queues refresh_checkpoints() on the single writer and does not wait for it.
+#
+# Checkpoints hold the entry's rowid. VACUUM keeps rowids of a table like
+# credithistory in current SQLite; after anything that renumbers them,
+# python -m app.statements rebuild.
+SIGNED_AMOUNT = "CASE WHEN Type = 'credit' THEN Amount ELSE -Amount END"
+
+def _base_balance(db, customer_id):
+    row = db.execute(
+        'SELECT PreviousBalance FROM credithistory WHERE CustomerId = ? ORDER BY CreatedDate, rowid LIMIT 1',
+        (customer_id,)
+    ).fetchone()
+    return (row[0] or 0) if row else 0
+
+def _last_checkpoint(db, customer_id, before=None):
+    # before is a ledger position (CreatedDate, rowid); rowid 0 means the
+    # first entry at or after that time
+    if before is None:
+        cur = db.execute(
+            'SELECT CreatedDate, EntryRowid, Balance FROM balancecheckpoints WHERE CustomerId = ? '
+            'ORDER BY CreatedDate DESC, EntryRowid DESC LIMIT 1',
+            (customer_id,)
+        )
+    else:
+        cur = db.execute(
+            'SELECT CreatedDate, EntryRowid, Balance FROM balancecheckpoints WHERE CustomerId = ? '
+            'AND (CreatedDate, EntryRowid) < (?, ?) ORDER BY CreatedDate DESC, EntryRowid DESC LIMIT 1',
+            (customer_id, *before)
+        )
+    return cur.fetchone()
+
+def _entries_after(checkpoint):
+    if checkpoint is None:
+        return '', ()
+    return 'AND (CreatedDate, rowid) > (?, ?)', (checkpoint[0], checkpoint[1])
+
+def _pending_entries(db, customer_id, limit):
+    # Entries after the last checkpoint, counting no further than limit
+    after_sql, after_params = _entries_after(_last_checkpoint(db, customer_id))
+    cur = db.execute(
+        f'SELECT COUNT(*) FROM (SELECT 1 FROM credithistory WHERE CustomerId = ? AND DeletedAt IS NULL {after_sql} LIMIT ?)',
+        (customer_id, *after_params, limit)
+    )
+    return cur.fetchone()[0]
+
+def refresh_checkpoints(db, customer_id, interval=None):
+    interval = interval or config.STATEMENT_CHECKPOINT_INTERVAL
+    if _pending_entries(db, customer_id, interval) < interval:
+        return 0
+
+    def attempt():
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            checkpoint = _last_checkpoint(db, customer_id)
+            balance = checkpoint[2] if checkpoint else _base_balance(db, customer_id)
+            after_sql, after_params = _entries_after(checkpoint)
+            cur = db.execute(
+                f'SELECT CreatedDate, rowid, {SIGNED_AMOUNT} FROM credithistory '
+                f'WHERE CustomerId = ? AND DeletedAt IS NULL {after_sql} ORDER BY CreatedDate, rowid',
+                (customer_id, *after_params)
+            )
+            checkpoints = []
+            for position, (created_date, rowid, amount) in enumerate(cur, start=1):
+                balance += amount
+                if position % interval == 0:
+                    checkpoints.append((customer_id, created_date, rowid, balance))
+            db.executemany(
+                'INSERT OR REPLACE INTO balancecheckpoints (CustomerId, CreatedDate, EntryRowid, Balance) VALUES (?, ?, ?, ?)',
+                checkpoints
+            )
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        return len(checkpoints)
+
+    return ledger.retry_busy(attempt)
+
+_scheduled = set()
+_scheduled_lock = threading.Lock()
+
+def schedule_checkpoints(db, customer_id):
+    if _pending_entries(db, customer_id, config.STATEMENT_CHECKPOINT_INTERVAL) < config.STATEMENT_CHECKPOINT_INTERVAL:
+        return None
+    with _scheduled_lock:
+        if customer_id in _scheduled:
+            return None
+        _scheduled.add(customer_id)
+
+    def done(_):
+        with _scheduled_lock:
+            _scheduled.discard(customer_id)
+
+    future = writer.submit(refresh_checkpoints, customer_id)
+    future.add_done_callback(done)
+    return future
+
+def balance_before(db, customer_id, position):
+    # Balance after every live entry before position (CreatedDate, rowid)
+    checkpoint = _last_checkpoint(db, customer_id, position)
+    balance = checkpoint[2] if checkpoint else _base_balance(db, customer_id)
+    after_sql, after_params = _entries_after(checkpoint)
+    cur = db.execute(
+        f'SELECT TOTAL({SIGNED_AMOUNT}) FROM credithistory '
+        f'WHERE CustomerId = ? AND DeletedAt IS NULL {after_sql} AND (CreatedDate, rowid) < (?, ?)',
+        (customer_id, *after_params, *position)
+    )
+    return balance + cur.fetchone()[0]
+
+def customer_statement(db, customer_id, date_from=None, date_to=None, limit=None, cursor=None):
+    limit = limit or config.STATEMENT_PAGE_LIMIT
+    customer = db.execute('SELECT Id, Name, Phone, Balance FROM customers WHERE Id = ? AND DeletedAt IS NULL', (customer_id,)).fetchone()
+    if not customer:
+        raise HTTPException(status_code=404, detail='Customer not found')
+    position = None
+    if cursor:
+        position = pagination.decode_cursor(cursor, 2)
+        if not isinstance(position[0], str) or not isinstance(position[1], int):
+            raise HTTPException(status_code=400, detail='Invalid cursor')
+
+    where = ['CustomerId = ?', 'DeletedAt IS NULL']
+    params = [customer_id]
+    # from and to are local days, inclusive
+    if date_from:
+        where.append('CreatedDate >= ?')
+        params.append(reports.day_start(date_from))
+    if date_to:
+        where.append('CreatedDate < ?')
+        params.append(reports.day_start(date_to + timedelta(days=1)))
+    range_sql = ' AND '.join(where)
+
+    # One read transaction so the balances, totals and entries agree
+    own_transaction = not db.in_transaction
+    if own_transaction:
+        db.execute('BEGIN')
+    try:
+        if date_from:
+            opening = balance_before(db, customer_id, (reports.day_start(date_from), 0))
+        else:
+            opening = _base_balance(db, customer_id)
+        credit, debit = db.execute(
+            f"SELECT TOTAL(CASE WHEN Type = 'credit' THEN Amount END), TOTAL(CASE WHEN Type != 'credit' THEN Amount END) "
+            f'FROM credithistory WHERE {range_sql}',
+            params
+        ).fetchone()
+
+        page_where, page_params = range_sql, list(params)
+        start = opening
+        if position is not None:
+            page_where += ' AND (CreatedDate, rowid) > (?, ?)'
+            page_params += position
+            start = balance_before(db, customer_id, (position[0], position[1] + 1))
+        # One extra row tells us whether there is a next page
+        cur = db.execute(
+            f"""SELECT Id, CreatedDate, Type, Amount, ModeOfPayment, PreviousBalance, rowid AS Position,
+                ? + SUM({SIGNED_AMOUNT}) OVER (ORDER BY CreatedDate, rowid ROWS UNBOUNDED PRECEDING) AS Balance
+            FROM credithistory WHERE {page_where}
+            ORDER BY CreatedDate, rowid LIMIT ?""",
+            (start, *page_params, limit + 1)
+        )
+        entries = [dict(row) for row in cur.fetchall()]
+    finally:
+        if own_transaction:
+            db.commit()
+
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        next_cursor = pagination.encode_cursor((entries[-1]['CreatedDate'], entries[-1]['Position']))
+    for entry in entries:
+        del entry['Position']
+    schedule_checkpoints(db, customer_id)
+
+    return {
+        "customer": dict(customer),
+        "date_from": date_from.isoformat() if date_from else None,
+        "date_to": date_to.isoformat() if date_to else None,
+        "opening_balance": round(opening, 2),
+        "closing_balance": round(opening + credit - debit, 2),
+        "total_credit": round(credit, 2),
+        "total_debit": round(debit, 2),
+        "entries": entries,
+        "next_cursor": next_cursor
+    }
+
+def rebuild_checkpoints(db):
+    db.execute('DELETE FROM balancecheckpoints')
+    db.commit()
+    customer_ids = [row[0] for row in db.execute('SELECT DISTINCT CustomerId FROM credithistory WHERE DeletedAt IS NULL')]
+    return sum(refresh_checkpoints(db, customer_id) for customer_id in customer_ids)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m app.statements', description='Rebuild customer balance checkpoints')
+    parser.add_argument('command', choices=['rebuild'])
+    args = parser.parse_args(argv)
+
+    from .database import get_db, init_db
+    init_db()
+    with get_db() as db:
+        written = rebuild_checkpoints(db)
+        print(f'Wrote {written} balance checkpoints')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
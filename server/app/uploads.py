@@ -0,0 +1,107 @@
+import io
+import anyio
+from multipart.multipart import MultipartParser, parse_options_header
+from fastapi import HTTPException
+
+# File uploads read straight from the request body. Routes that take a file
+# (customers/import, media) hand receiver(request) to Upload on a worker
+# thread, so the file is processed while it is still arriving instead of
+# being spooled by the framework first.
+
+# Upload reads the body itself, so the docs get its shape from here
+FILE_REQUEST_BODY = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": 'object', "required": ['file'], "properties": {"file": {"type": 'string', "format": 'binary'}}
+}}}}}
+
+def receiver(request):
+    # receive() for Upload: called on a worker thread, it pulls the next piece
+    # of the body from the event loop
+    body = request.stream()
+
+    async def next_chunk():
+        try:
+            return await body.__anext__()
+        except StopAsyncIteration:
+            return b''
+
+    def receive():
+        return anyio.from_thread.run(next_chunk)
+
+    return receive
+
+class Upload(io.RawIOBase):
+    # The "file" field of a multipart/form-data body, read as the body arrives.
+    # receive() returns the next piece of the body, b'' once it has all come.
+    def __init__(self, content_type, receive):
+        media_type, options = parse_options_header(content_type)
+        if media_type != b'multipart/form-data' or not options.get(b'boundary'):
+            raise HTTPException(status_code=415, detail='Upload the file as multipart/form-data')
+        self._receive = receive
+        self._parser = MultipartParser(options[b'boundary'], {
+            'on_part_begin': self._part_begin,
+            'on_header_field': self._header_field,
+            'on_header_value': self._header_value,
+            'on_header_end': self._header_end,
+            'on_headers_finished': self._headers_finished,
+            'on_part_data': self._part_data,
+            'on_part_end': self._part_end,
+        })
+        self._pending = bytearray()
+        self._field = self._value = b''
+        self._headers = {}
+        self._in_file = self._finished = self._body_done = False
+        self.filename = None
+        # Read up to the file's data so that the filename is known
+        while self.filename is None and self._feed():
+            pass
+        if self.filename is None:
+            raise HTTPException(status_code=422, detail='The upload has no file field')
+
+    def _part_begin(self):
+        self._headers = {}
+
+    def _header_field(self, data, start, end):
+        self._field += data[start:end]
+
+    def _header_value(self, data, start, end):
+        self._value += data[start:end]
+
+    def _header_end(self):
+        self._headers[self._field.lower()] = self._value
+        self._field = self._value = b''
+
+    def _headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b'content-disposition', b''))
+        if self.filename is None and options.get(b'name') == b'file':
+            self.filename = options.get(b'filename', b'').decode('utf-8', errors='replace')
+            self._in_file = True
+
+    def _part_data(self, data, start, end):
+        if self._in_file:
+            self._pending += data[start:end]
+
+    def _part_end(self):
+        if self._in_file:
+            self._in_file = False
+            self._finished = True
+
+    def _feed(self):
+        if self._body_done:
+            return False
+        chunk = self._receive()
+        if not chunk:
+            self._body_done = True
+            return False
+        self._parser.write(chunk)
+        return True
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending and not self._finished and self._feed():
+            pass
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        del self._pending[:size]
+        return size
@@ -0,0 +1,186 @@
+import asyncio
+import contextvars
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from . import config, database, ledger, profiling
+
+# Single writer. Mutating endpoints hand their write to one thread with one
+# connection instead of committing on their own, so requests never fight over
+# SQLite's write lock. The thread drains whatever is queued and applies it as
+# one transaction (group commit):
+#
+#   BEGIN IMMEDIATE
+#     SAVEPOINT job; <job 1>; RELEASE job      a failing job is rolled back to
+#     SAVEPOINT job; <job 2>; RELEASE job      its savepoint and gets its own
+#     ...                                      error; the others are unaffected
+#   COMMIT
+#
+# Callers get their result only after the COMMIT, and writes that arrive
+# during a commit form the next batch. WRITE_BATCH_WINDOW_MS additionally holds
+# a batch of several jobs open to collect more, like PostgreSQL's commit_delay;
+# it only pays off when fsync is slow. A lone write never waits.
+#
+# A job is fn(db, *args). Write functions manage their own transactions
+# (BEGIN IMMEDIATE, commit, rollback), and inside the writer those calls apply
+# to the job's savepoint, so the same functions work with or without it.
+
+class _JobConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, sql, *args):
+        # The writer has already begun the transaction
+        if sql.lstrip()[:5].upper() == 'BEGIN':
+            return self._conn.cursor()
+        return self._conn.execute(sql, *args)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self._conn.execute('ROLLBACK TO job')
+
+    @property
+    def in_transaction(self):
+        return True
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+class _Job:
+    __slots__ = ('fn', 'args', 'future', 'context')
+
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+        self.future = Future()
+        # The submitting request's context, for app/metrics.py
+        self.context = contextvars.copy_context()
+
+class Writer:
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, fn, *args):
+        if profiling.ENABLED:
+            fn = profiling.wrap(fn)
+        job = _Job(fn, args)
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='sqlite-writer', daemon=True)
+                self._thread.start()
+            self._queue.put(job)
+        return job.future
+
+    def _collect(self, batch):
+        # Returns False once close() has asked the thread to stop
+        deadline = None
+        while len(batch) < config.WRITE_BATCH_MAX:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                if len(batch) == 1 or config.WRITE_BATCH_WINDOW_MS <= 0:
+                    return True
+                if deadline is None:
+                    deadline = time.monotonic() + config.WRITE_BATCH_WINDOW_MS / 1000
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return True
+                try:
+                    job = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    return True
+            if job is None:
+                return False
+            batch.append(job)
+        return True
+
+    def _apply(self, conn, batch):
+        try:
+            ledger.retry_busy(lambda: conn.execute('BEGIN IMMEDIATE'))
+        except Exception as e:
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            return
+
+        done = []
+        for job in batch:
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            conn.execute('SAVEPOINT job')
+            try:
+                result = job.context.run(job.fn, _JobConnection(conn), *job.args)
+                conn.execute('RELEASE job')
+                done.append((job, result))
+            except Exception as e:
+                conn.execute('ROLLBACK TO job')
+                conn.execute('RELEASE job')
+                job.future.set_exception(e)
+
+        try:
+            conn.execute('COMMIT')
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            for job, _ in done:
+                job.future.set_exception(e)
+            return
+        for job, result in done:
+            job.future.set_result(result)
+
+    def _loop(self):
+        # Explicit transactions only (isolation_level=None): the savepoints
+        # above must not be mixed with sqlite3's implicit BEGIN
+        conn = database.connect()
+        conn.isolation_level = None
+        try:
+            running = True
+            while running:
+                batch = [self._queue.get()]
+                if batch[0] is None:
+                    break
+                running = self._collect(batch)
+                try:
+                    self._apply(conn, batch)
+                except sqlite3.Error as e:
+                    # The connection itself failed (e.g. disk I/O); fail what is left
+                    for job in batch:
+                        if not job.future.done():
+                            job.future.set_exception(e)
+                    if conn.in_transaction:
+                        try:
+                            conn.execute('ROLLBACK')
+                        except sqlite3.Error:
+                            pass
+        finally:
+            conn.close()
+
+    def close(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join()
+
+writer = Writer()
+
+def submit(fn, *args):
+    # Returns the job's Future without waiting for it
+    return writer.submit(fn, *args)
+
+def call(fn, *args):
+    return writer.submit(fn, *args).result()
+
+async def run(fn, *args):
+    # Shielded: a write that was accepted still happens if the client goes away
+    return await asyncio.shield(asyncio.wrap_future(writer.submit(fn, *args)))
+
+def close():
+    writer.close()
@@ -0,0 +1,94 @@
+"""Requests/second of the pooled get_db() versus opening a connection per request.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_connections --threads 8 --seconds 5
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+def _open_per_request(db_path):
+    # The behaviour of get_db() before connections were pooled
+    @contextmanager
+    def get_db():
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+    return get_db
+
+def _seed(db_path, customers):
+    from app import database, migrate
+    conn = database.connect(db_path)
+    migrate.apply(conn)
+    conn.executemany(
+        'INSERT INTO customers (Name, Phone) VALUES (?, ?)',
+        ((f'Customer {i}', f'9{i:09d}') for i in range(customers))
+    )
+    conn.commit()
+    ids = [row[0] for row in conn.execute('SELECT Id FROM customers')]
+    conn.close()
+    return ids
+
+def _request(get_db, ids, writes):
+    with get_db() as db:
+        if writes and random.random() < writes:
+            db.execute('UPDATE customers SET Notes = ? WHERE Id = ?', (str(time.time()), random.choice(ids)))
+            db.commit()
+        elif random.random() < 0.5:
+            db.execute('SELECT * FROM customers WHERE Id = ? AND DeletedAt IS NULL', (random.choice(ids),)).fetchone()
+        else:
+            db.execute(
+                'SELECT * FROM customers WHERE DeletedAt IS NULL ORDER BY CreatedDate DESC LIMIT 20 OFFSET ?',
+                (random.randrange(0, 200),)
+            ).fetchall()
+
+def _run(get_db, ids, threads, seconds, writes):
+    counts = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def worker(n):
+        while time.perf_counter() < deadline:
+            _request(get_db, ids, writes)
+            counts[n] += 1
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return sum(counts) / seconds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--customers', type=int, default=5000)
+    parser.add_argument('--writes', type=float, default=0.05, help='fraction of requests that write')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        os.environ['SWASTIK_DB_PATH'] = db_path
+        from app import database
+        database.DB_PATH = db_path
+        ids = _seed(db_path, args.customers)
+
+        legacy = _run(_open_per_request(db_path), ids, args.threads, args.seconds, args.writes)
+        pooled = _run(database.get_db, ids, args.threads, args.seconds, args.writes)
+        database.close_all()
+
+    print(f'threads={args.threads} writes={args.writes:.0%}')
+    print(f'open-per-request: {legacy:10.0f} req/s')
+    print(f'pooled:           {pooled:10.0f} req/s  ({pooled / legacy:.2f}x)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Credit history posting throughput with many concurrent writers.
+
+Compares the old read-modify-write posting against app.ledger.post_entry and
+checks every customer's final balance for lost updates. Run from the server
+directory:
+
+    python -m benchmarks.bench_ledger --threads 16 --postings 500 --customers 4
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+def _legacy_post(db, customer_id, entry_type, amount, mode_of_payment):
+    # create_credit_history before the ledger write path
+    customer = db.execute('SELECT Balance FROM customers WHERE Id = ? AND DeletedAt IS NULL', (customer_id,)).fetchone()
+    previous_balance = customer['Balance']
+    new_balance = previous_balance + amount if entry_type == 'credit' else previous_balance - amount
+    try:
+        db.execute(
+            'INSERT INTO credithistory (CustomerId, Type, Amount, ModeOfPayment, PreviousBalance) VALUES (?, ?, ?, ?, ?)',
+            (customer_id, entry_type, amount, mode_of_payment, previous_balance)
+        )
+        db.execute('UPDATE customers SET Balance = ? WHERE Id = ?', (new_balance, customer_id))
+        db.commit()
+    except sqlite3.Error:
+        db.rollback()
+        raise
+
+def _setup(db_path, customers):
+    from app import database, migrate
+    conn = database.connect(db_path)
+    migrate.apply(conn)
+    conn.executemany('INSERT INTO customers (Name) VALUES (?)', ((f'Wholesale {i}',) for i in range(customers)))
+    conn.commit()
+    ids = [row[0] for row in conn.execute('SELECT Id FROM customers')]
+    conn.close()
+    return ids
+
+def _run(post, db_path, ids, threads, postings):
+    from app import database
+    errors = []
+    expected = {customer_id: 0 for customer_id in ids}
+    lock = threading.Lock()
+
+    def worker():
+        db = database.connect(db_path)
+        for _ in range(postings):
+            customer_id = random.choice(ids)
+            amount = random.randint(1, 1000)
+            entry_type = random.choice(('credit', 'debit'))
+            try:
+                post(db, customer_id, entry_type, amount, 'cash')
+            except sqlite3.Error as e:
+                errors.append(str(e))
+                continue
+            with lock:
+                expected[customer_id] += amount if entry_type == 'credit' else -amount
+        db.close()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    db = database.connect(db_path)
+    balances = dict(db.execute('SELECT Id, Balance FROM customers').fetchall())
+    db.execute('UPDATE customers SET Balance = 0')
+    db.commit()
+    db.close()
+    lost = sum(1 for customer_id in ids if abs(balances[customer_id] - expected[customer_id]) > 1e-6)
+    return (threads * postings - len(errors)) / elapsed, len(errors), lost
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--postings', type=int, default=500, help='postings per thread')
+    parser.add_argument('--customers', type=int, default=4, help='fewer customers means more contention')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        os.environ['SWASTIK_DB_PATH'] = db_path
+        from app import ledger
+        ids = _setup(db_path, args.customers)
+        results = {
+            'read-modify-write': _run(_legacy_post, db_path, ids, args.threads, args.postings),
+            'ledger.post_entry': _run(ledger.post_entry, db_path, ids, args.threads, args.postings),
+        }
+
+    print(f'threads={args.threads} postings/thread={args.postings} customers={args.customers}')
+    for name, (rate, errors, lost) in results.items():
+        print(f'{name:<18} {rate:8.0f} postings/s  errors={errors:<5} customers with lost updates={lost}')
+
+if __name__ == '__main__':
+    main()
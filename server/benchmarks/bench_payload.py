@@ -0,0 +1,78 @@
+"""List payload size and time with SELECT * versus projected columns.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_payload --rows 5000 --data-bytes 4000 --pages 200
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from fastapi.encoders import jsonable_encoder
+
+def _seed(db_path, rows, data_bytes):
+    from app import database, migrate
+    conn = database.connect(db_path)
+    migrate.apply(conn)
+    conn.execute("INSERT INTO customers (Name, Phone) VALUES ('Bench', '9000000000')")
+    customer_id = conn.execute('SELECT Id FROM customers').fetchone()[0]
+    # Data is a JSON document and Media a data URI in practice; only size matters here
+    blob = lambda: ''.join(random.choice('abcdefghijklmnopqrstuvwxyz0123456789') for _ in range(data_bytes))
+    conn.executemany(
+        'INSERT INTO photocertificate (CustomerId, Media, Status, Data, ModeOfPayment, Total) VALUES (?, ?, ?, ?, ?, ?)',
+        ((customer_id, blob(), 'pending', blob(), 'cash', 100.0) for _ in range(rows))
+    )
+    conn.commit()
+    conn.close()
+
+def _measure(db, pagination_cls, columns, pages, limit):
+    from app.pagination import paginate
+    query_time = encode_time = 0.0
+    total_bytes = 0
+    for page in range(1, pages + 1):
+        pagination = pagination_cls(page=page % 50 + 1, limit=limit, include_total=False)
+        started = time.perf_counter()
+        body = paginate(db, 'photocertificate', pagination, columns=columns)
+        query_time += time.perf_counter() - started
+
+        # What the response path does with the handler's return value
+        started = time.perf_counter()
+        payload = json.dumps(jsonable_encoder(body)).encode()
+        encode_time += time.perf_counter() - started
+        total_bytes += len(payload)
+    return query_time / pages, encode_time / pages, total_bytes / pages
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--data-bytes', type=int, default=4000, help='size of each Data and Media value')
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        os.environ['SWASTIK_DB_PATH'] = db_path
+        from app import database, fields
+        from app.schemas import PaginationParams, PhotoCertificateResponse
+        database.DB_PATH = db_path
+        _seed(db_path, args.rows, args.data_bytes)
+
+        variants = [
+            ('SELECT *', None),
+            ('default list columns', fields.parse_fields(PhotoCertificateResponse, None, heavy=False)),
+            ('fields=Total,Status', fields.parse_fields(PhotoCertificateResponse, 'Total,Status')),
+        ]
+        with database.get_db() as db:
+            results = [(name, *_measure(db, PaginationParams, columns, args.pages, args.limit)) for name, columns in variants]
+        database.close_all()
+
+    print(f'rows={args.rows} data-bytes={args.data_bytes} limit={args.limit}')
+    print(f'{"":22} {"query ms":>9} {"encode ms":>10} {"KiB/page":>9}')
+    for name, query, encode, size in results:
+        print(f'{name:22} {query * 1000:9.2f} {encode * 1000:10.2f} {size / 1024:9.1f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Per-row cost of turning rows into a JSON response body, FastAPI's generic path versus app.responses.
+
+"generic" is what a route with a response_model does with the handler's return
+value (validate, jsonable, json.dumps); "fast" is app.responses. Run from the
+server directory:
+
+    python -m benchmarks.bench_serialization --rows 100 --repeat 300
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+def _rows(count):
+    start = datetime(2024, 4, 1, 10, 30)
+    return [{
+        "CustomerId": 'A1B2C3D4E5F6A7B8C9', "Status": 'completed', "Data": '{"ItemName": "Chain", "Weight": 12.5}',
+        "ModeOfPayment": 'upi', "Total": 1250.0 + i, "GST": 37.5, "GSTBillNumber": f'GST-{i:05d}', "TotalTax": 37.5,
+        "Id": f'{i:018X}', "CreatedDate": (start + timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M:%S'),
+        "LastModifiedDate": (start + timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3], "DeletedAt": None
+    } for i in range(count)]
+
+def _statement(rows):
+    entries = [{
+        "Id": row["Id"], "CreatedDate": row["CreatedDate"], "Type": 'credit' if i % 2 else 'debit', "Amount": row["Total"],
+        "ModeOfPayment": 'cash', "PreviousBalance": 1000.0 + i, "Balance": 1000.0 + i + row["Total"]
+    } for i, row in enumerate(rows)]
+    return {
+        "customer": {"Id": 'A1B2C3D4E5F6A7B8C9', "Name": 'Bench', "Phone": None, "Balance": 10.0},
+        "date_from": None, "date_to": None, "opening_balance": 0.0, "closing_balance": 10.0,
+        "total_credit": 10.0, "total_debit": 0.0, "entries": entries, "next_cursor": None
+    }
+
+def _run_inline(coro):
+    # serialize_response(is_coroutine=True) never suspends, so no event loop is needed
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError('coroutine suspended')
+
+def _time(fn, repeat):
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100, help='rows per page')
+    parser.add_argument('--repeat', type=int, default=300)
+    args = parser.parse_args()
+
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+    from app import fields, responses
+    from app.schemas import CustomerStatementResponse, GoldCertificateResponse, PaginatedResponse
+
+    rows = _rows(args.rows)
+    page = {"data": rows, "pagination": {"total_records": 10000, "current_page": 1, "total_pages": 100, "limit": args.rows, "next_cursor": None}}
+    statement = _statement(rows)
+    detail_model = fields.partial_model(GoldCertificateResponse)
+
+    def generic(model, content, exclude_unset=False):
+        field = create_response_field('Response', model)
+        return lambda: JSONResponse(_run_inline(serialize_response(
+            field=field, response_content=content, exclude_unset=exclude_unset, is_coroutine=True
+        ))).body
+
+    cases = [
+        ('list page', generic(PaginatedResponse, page), lambda: responses.json_response(page).body),
+        ('statement', generic(CustomerStatementResponse, statement), lambda: responses.model_response(CustomerStatementResponse, statement).body),
+        ('detail', generic(detail_model, rows[0], exclude_unset=True),
+         lambda: responses.model_response(detail_model, rows[0], exclude_unset=True).body),
+    ]
+
+    print(f'rows={args.rows} orjson={"yes" if responses.orjson else "no"}')
+    print(f'{"":14} {"generic us/row":>15} {"fast us/row":>12} {"speedup":>8}')
+    for name, before, after in cases:
+        # A detail response is one row
+        per = 1 if name == 'detail' else args.rows
+        old, new = _time(before, args.repeat) / per, _time(after, args.repeat) / per
+        print(f'{name:14} {old * 1e6:15.2f} {new * 1e6:12.2f} {old / new:7.1f}x')
+
+if __name__ == '__main__':
+    main()
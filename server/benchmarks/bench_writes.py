@@ -0,0 +1,85 @@
+"""Write throughput: every request committing on its own versus the single writer.
+
+Each thread creates gold certificates through app.crud.create_row, either on
+its own connection (the old path) or through app.writer. Run from the server
+directory:
+
+    python -m benchmarks.bench_writes --threads 1,8,32,64 --seconds 3 --synchronous FULL
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+def _setup(db_path):
+    from app import database, migrate
+    conn = database.connect(db_path)
+    migrate.apply(conn)
+    conn.execute("INSERT INTO customers (Name) VALUES ('Bench')")
+    conn.commit()
+    customer_id = conn.execute('SELECT Id FROM customers').fetchone()[0]
+    conn.close()
+    return customer_id
+
+def _run(write, db_path, threads, seconds):
+    from app import database
+    done = []
+    errors = []
+    stop = time.perf_counter() + seconds
+
+    def worker():
+        db = database.connect(db_path)
+        count = 0
+        while time.perf_counter() < stop:
+            try:
+                write(db)
+                count += 1
+            except sqlite3.Error as e:
+                errors.append(str(e))
+        done.append(count)
+        db.close()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return sum(done) / (time.perf_counter() - start), len(errors)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', default='1,8,32,64', help='comma-separated concurrency levels')
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--synchronous', default='NORMAL', help='PRAGMA synchronous for the run (FULL fsyncs every commit)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        os.environ['SWASTIK_DB_PATH'] = db_path
+        os.environ['SWASTIK_SQLITE_SYNCHRONOUS'] = args.synchronous
+        from app import crud, database, writer
+        from app.routers.gold_certificate import resource
+        from app.schemas import GoldCertificateCreate
+        database.DB_PATH = db_path
+        customer_id = _setup(db_path)
+        item = GoldCertificateCreate(CustomerId=customer_id, ModeOfPayment='cash', Total=100.0, Data='{"ItemName": "Ring"}')
+
+        variants = {
+            'commit per request': lambda db: crud.create_row(db, resource, item),
+            'single writer': lambda db: writer.call(crud.create_row, resource, item),
+        }
+        print(f'synchronous={args.synchronous} seconds={args.seconds}')
+        print(f'{"threads":>7} ' + ' '.join(f'{name:>26}' for name in variants))
+        for threads in (int(value) for value in args.threads.split(',')):
+            cells = []
+            for write in variants.values():
+                rate, errors = _run(write, db_path, threads, args.seconds)
+                cells.append(f'{rate:>12.0f}/s errors={errors:<5}')
+            print(f'{threads:>7} ' + ' '.join(f'{cell:>26}' for cell in cells))
+        writer.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,377 @@
+"""Drive every route of app.main in-process and report latency per endpoint.
+
+Requests go through httpx's ASGI transport, so the whole stack runs (routing,
+validation, the read pools and the writer) without a network hop. The app
+runs on a copy of the database, which is either one built by benchmarks.seed
+or generated on the spot with --rows. Reads run first, then writes, then
+deletes. Results are written as JSON; pass an earlier file to --compare to see
+what changed between commits. Run from the server directory:
+
+    python -m benchmarks.seed --rows 100k --out bench-100k.db
+    python -m benchmarks.harness --db bench-100k.db --out results.json
+    python -m benchmarks.harness --db bench-100k.db --compare results.json
+"""
+import argparse
+import asyncio
+import calendar
+import json
+import math
+import os
+import platform
+import random
+import sqlite3
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from collections import Counter
+from datetime import date, datetime
+from . import seed
+
+API = '/api/v1'
+CERTIFICATE_TABLES = ['goldcertificate', 'goldtest', 'photocertificate', 'silvercertificate']
+# Tables served by crud.add_routes
+CRUD_TABLES = ['customers', 'credithistory', *CERTIFICATE_TABLES, 'weightlosshistory']
+BATCH_SIZE = 20
+IMPORT_ROWS = 100
+MEDIA_FILES = 20
+# Running order: reads, then writes, then deletes
+PHASES = {'GET': 0, 'POST': 1, 'PUT': 1, 'DELETE': 2}
+
+class Scenario:
+    __slots__ = ('method', 'path', 'build', 'share')
+
+    def __init__(self, method, path, build, share=1.0):
+        # path is the route template, build(i) returns httpx request arguments
+        self.method = method
+        self.path = path
+        self.build = build
+        self.share = share
+
+    @property
+    def name(self):
+        return f'{self.method} {self.path}'
+
+def _png(seed_value, size=256):
+    # A real image so thumbnails have something to scale
+    rng = random.Random(seed_value)
+    r, g, b = rng.randrange(256), rng.randrange(256), rng.randrange(256)
+    raw = bytearray()
+    for y in range(size):
+        raw.append(0)
+        for x in range(size):
+            raw += bytes(((x + r) % 256, (y + g) % 256, (x ^ y ^ b) % 256))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(bytes(raw))) + chunk(b'IEND', b''))
+
+class _Fixtures:
+    # Ids to request, sampled from the database before the app starts
+    def __init__(self, db_path, rng, deletes):
+        conn = sqlite3.connect(db_path)
+        try:
+            self.ids = {}
+            self.doomed = {}
+            for table in CRUD_TABLES:
+                ids = [row[0] for row in conn.execute(f'SELECT Id FROM {table} WHERE DeletedAt IS NULL ORDER BY rowid')]
+                self.ids[table] = ids
+                self.doomed[table] = rng.sample(ids, min(len(ids), deletes))
+            # Drawn from history rows, so busy customers come up as often as in real use
+            self.active_customers = [row[0] for row in conn.execute(
+                'SELECT CustomerId FROM credithistory WHERE DeletedAt IS NULL ORDER BY rowid'
+            )] or self.ids['customers']
+            self.global_keys = [row[0] for row in conn.execute('SELECT Key FROM globals WHERE DeletedAt IS NULL ORDER BY Key')]
+        finally:
+            conn.close()
+        self.media = []
+
+def _certificate_body(rng, customer_id):
+    total = round(rng.uniform(50, 5000), 2)
+    return {
+        "CustomerId": customer_id, "Status": 'completed', "ModeOfPayment": rng.choice(['cash', 'upi', 'bill']),
+        "Data": json.dumps({"ItemName": rng.choice(seed.ITEMS), "Weight": round(rng.uniform(1, 50), 3)}),
+        "Total": total, "GST": round(total * 0.03, 2), "TotalTax": round(total * 0.03, 2),
+    }
+
+def _scenarios(fx, rng):
+    scenarios = []
+
+    def add(method, path, build, share=1.0):
+        scenarios.append(Scenario(method, path, build, share))
+
+    def month():
+        number = rng.randint(1, 12)
+        return {"from": date(2024, number, 1).isoformat(), "to": date(2024, number, calendar.monthrange(2024, number)[1]).isoformat()}
+
+    def customer():
+        return rng.choice(fx.active_customers)
+
+    bodies = {
+        'customers': lambda i: {"Name": f'Bench Customer {i}', "Phone": f'8{i:09d}'},
+        'credithistory': lambda i: {"CustomerId": customer(), "Type": 'credit', "Amount": round(rng.uniform(100, 5000), 2), "ModeOfPayment": 'cash'},
+        'weightlosshistory': lambda i: {"CustomerId": customer(), "Amount": round(rng.uniform(5, 500), 2), "ModeOfPayment": 'cash'},
+        **{table: (lambda i: _certificate_body(rng, customer())) for table in CERTIFICATE_TABLES},
+    }
+
+    for path in ('/', '/health', '/metrics', '/openapi.json', '/docs', '/docs/oauth2-redirect', '/redoc'):
+        add('GET', path, lambda i, path=path: {"url": path})
+
+    for table in CRUD_TABLES:
+        base = f'{API}/{table}'
+        ids = fx.ids[table]
+        add('GET', base, lambda i, base=base: {"url": base, "params": {"page": rng.randint(1, 20), "limit": 50}})
+        add('GET', f'{base}/{{item_id}}', lambda i, base=base, ids=ids: {"url": f'{base}/{rng.choice(ids)}'})
+        add('GET', f'{base}/export', lambda i, base=base: {"url": f'{base}/export', "params": month()}, share=0.1)
+
+    for table in ('credithistory', 'weightlosshistory'):
+        add('GET', f'{API}/customers/{{customer_id}}/{table}',
+            lambda i, table=table: {"url": f'{API}/customers/{customer()}/{table}', "params": {"limit": 50}})
+
+    add('GET', f'{API}/customers/search', lambda i: {"url": f'{API}/customers/search', "params": {"q": rng.choice(seed.FIRST_NAMES)[:3]}})
+    add('GET', f'{API}/customers/{{customer_id}}/statement', lambda i: {"url": f'{API}/customers/{customer()}/statement'})
+    add('GET', f'{API}/globals', lambda i: {"url": f'{API}/globals'})
+    add('GET', f'{API}/globals/{{key}}', lambda i: {"url": f'{API}/globals/{rng.choice(fx.global_keys)}'})
+    add('GET', f'{API}/globals/export', lambda i: {"url": f'{API}/globals/export'})
+    add('GET', f'{API}/media/{{digest}}', lambda i: {"url": f'{API}/media/{rng.choice(fx.media)}'})
+    add('GET', f'{API}/media/{{digest}}/thumbnail', lambda i: {"url": f'{API}/media/{rng.choice(fx.media)}/thumbnail'})
+    add('GET', f'{API}/reports/revenue', lambda i: {"url": f'{API}/reports/revenue', "params": {
+        "from": '2024-01-01', "to": '2024-12-31', "group_by": rng.choice(['day', 'month', 'table,mode', 'status'])
+    }})
+    add('GET', f'{API}/admin/reconcile', lambda i: {"url": f'{API}/admin/reconcile'}, share=0.05)
+    add('GET', f'{API}/admin/slow-queries', lambda i: {"url": f'{API}/admin/slow-queries'}, share=0.05)
+    add('GET', f'{API}/admin/profiles', lambda i: {"url": f'{API}/admin/profiles'}, share=0.05)
+
+    add('POST', f'{API}/customers', lambda i: {"url": f'{API}/customers', "json": bodies['customers'](i)})
+    add('PUT', f'{API}/customers/{{item_id}}',
+        lambda i: {"url": f'{API}/customers/{rng.choice(fx.ids["customers"])}', "json": {"Notes": f'Updated {i}'}})
+    add('POST', f'{API}/customers/import', lambda i: {"url": f'{API}/customers/import', "files": {"file": (
+        'customers.csv', 'Name,Phone\n' + ''.join(f'Imported {i}-{j},7{i * IMPORT_ROWS + j:09d}\n' for j in range(IMPORT_ROWS)), 'text/csv'
+    )}}, share=0.1)
+    add('POST', f'{API}/credithistory', lambda i: {"url": f'{API}/credithistory', "json": bodies['credithistory'](i)})
+    for table in CRUD_TABLES[1:]:
+        base = f'{API}/{table}'
+        if table != 'credithistory':
+            add('POST', base, lambda i, base=base, table=table: {"url": base, "json": bodies[table](i)})
+        add('POST', f'{base}/batch', lambda i, base=base, table=table: {
+            "url": f'{base}/batch', "params": {"mode": 'best_effort'},
+            "json": [bodies[table](i * BATCH_SIZE + k) for k in range(BATCH_SIZE)]
+        }, share=0.25)
+        if table in CERTIFICATE_TABLES:
+            add('PUT', f'{base}/{{item_id}}', lambda i, base=base, table=table: {
+                "url": f'{base}/{rng.choice(fx.ids[table])}', "json": bodies[table](i)
+            })
+    add('POST', f'{API}/globals', lambda i: {"url": f'{API}/globals', "json": {"Key": f'BenchKey{i}', "Value": str(i)}})
+    add('PUT', f'{API}/globals/{{key}}', lambda i: {"url": f'{API}/globals/{rng.choice(fx.global_keys)}', "json": {"Value": str(i)}})
+    add('POST', f'{API}/media', lambda i: {"url": f'{API}/media', "files": {"file": ('photo.png', _png(-1 - i), 'image/png')}}, share=0.25)
+    add('PUT', f'{API}/photocertificate/{{certificate_id}}/media', lambda i: {
+        "url": f'{API}/photocertificate/{rng.choice(fx.ids["photocertificate"])}/media',
+        "files": {"file": ('photo.png', _png(-100000 - i), 'image/png')}
+    }, share=0.25)
+    add('POST', f'{API}/admin/reconcile', lambda i: {"url": f'{API}/admin/reconcile'}, share=0.05)
+
+    for table in CRUD_TABLES:
+        doomed = fx.doomed[table]
+        add('DELETE', f'{API}/{table}/{{item_id}}',
+            lambda i, table=table, doomed=doomed: {"url": f'{API}/{table}/{doomed[i % len(doomed)]}'})
+    # Deletes the keys the POST scenario created
+    add('DELETE', f'{API}/globals/{{key}}', lambda i: {"url": f'{API}/globals/BenchKey{i}'})
+
+    scenarios.sort(key=lambda scenario: PHASES[scenario.method])
+    return scenarios
+
+def _uncovered(app, scenarios):
+    names = {scenario.name for scenario in scenarios}
+    routes = {f'{method} {route.path}' for route in app.routes for method in getattr(route, 'methods', ()) if method != 'HEAD'}
+    return sorted(routes - names)
+
+def percentile(ordered, q):
+    # Nearest rank
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+async def _run_scenario(client, scenario, count, concurrency, warmup):
+    for i in range(warmup):
+        await client.request(scenario.method, **scenario.build(i))
+
+    latencies = []
+    statuses = Counter()
+    sequence = iter(range(warmup, warmup + count))
+
+    async def worker():
+        for i in sequence:
+            request = scenario.build(i)
+            started = time.perf_counter()
+            response = await client.request(scenario.method, **request)
+            latencies.append(time.perf_counter() - started)
+            statuses[str(response.status_code)] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - started)
+
+def summarize(latencies, statuses, elapsed):
+    # Latencies in seconds, statuses a Counter keyed by status code text
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 4),
+        "throughput": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+        "statuses": dict(sorted(statuses.items())),
+    }
+
+def _git(*args):
+    try:
+        result = subprocess.run(['git', *args], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() if result.returncode == 0 else None
+
+def environment():
+    try:
+        import orjson
+    except ImportError:
+        orjson = None
+    return {
+        "commit": _git('rev-parse', 'HEAD'),
+        "dirty": bool(_git('status', '--porcelain', '--untracked-files=no')),
+        "started": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "orjson": orjson is not None,
+        "platform": platform.platform(),
+    }
+
+def copy_database(source, target):
+    # The backup API gives a consistent copy even of a database in use
+    source_conn = sqlite3.connect(source)
+    target_conn = sqlite3.connect(target)
+    try:
+        source_conn.backup(target_conn)
+    finally:
+        source_conn.close()
+        target_conn.close()
+
+def print_header():
+    print(f'{"endpoint":58} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"errors":>6}')
+
+def print_row(name, result):
+    errors = sum(count for status, count in result["statuses"].items() if not status.startswith(('2', '3')))
+    print(f'{name:58} {result["throughput"]:>9.1f} {result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} '
+          f'{result["p99_ms"]:>9.2f} {errors:>6}', flush=True)
+
+async def _run(args, db_path):
+    import httpx
+    from app import media
+    from app.main import app
+
+    rng = random.Random(args.seed)
+    fx = _Fixtures(db_path, rng, args.requests + args.warmup)
+    scenarios = _scenarios(fx, rng)
+    uncovered = _uncovered(app, scenarios)
+    if args.only:
+        scenarios = [scenario for scenario in scenarios if any(part in scenario.name for part in args.only)]
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        fx.media = [media.store_bytes(_png(i))["hash"] for i in range(MEDIA_FILES)]
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://harness', timeout=None) as client:
+            print_header()
+            for scenario in scenarios:
+                count = max(args.min_requests, int(args.requests * scenario.share))
+                result = await _run_scenario(client, scenario, count, args.concurrency, args.warmup)
+                results[scenario.name] = result
+                print_row(scenario.name, result)
+    return results, uncovered
+
+def compare(old, new, threshold):
+    # An endpoint regressed when its median got slower or its throughput
+    # dropped by more than threshold percent
+    regressions = []
+    print(f'\n{"endpoint":58} {"p50 ms":>26} {"p99 ms":>26} {"req/s":>26}')
+    for name, result in new["endpoints"].items():
+        before = old["endpoints"].get(name)
+        if before is None:
+            continue
+        cells = []
+        for key in ('p50_ms', 'p99_ms', 'throughput'):
+            change = (result[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            cells.append(f'{before[key]:.1f} -> {result[key]:.1f} ({change:+.0f}%)'.rjust(26))
+        slower = before["p50_ms"] and (result["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100 > threshold
+        fewer = before["throughput"] and (before["throughput"] - result["throughput"]) / before["throughput"] * 100 > threshold
+        flag = '  REGRESSED' if slower or fewer else ''
+        if flag:
+            regressions.append(name)
+        print(f'{name:58} {" ".join(cells)}{flag}')
+    return regressions
+
+def write_results(output, args):
+    # --out and --compare, shared with benchmarks.replay
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(output, f, indent=2)
+        print(f'\nResults written to {args.out}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), output, args.threshold)
+        if regressions:
+            print(f'\n{len(regressions)} endpoint(s) regressed by more than {args.threshold:g}%')
+            sys.exit(1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--db', help='database built by benchmarks.seed; it is copied, never modified')
+    source.add_argument('--rows', help='generate a database of this size first, e.g. 10k')
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint (heavy endpoints run a fraction)')
+    parser.add_argument('--min-requests', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=8, help='requests in flight per endpoint')
+    parser.add_argument('--warmup', type=int, default=3, help='unmeasured requests before each endpoint')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--only', action='append', help='run endpoints whose name contains this text (repeatable)')
+    parser.add_argument('--out', help='write results to this JSON file')
+    parser.add_argument('--compare', help='earlier results to compare against')
+    parser.add_argument('--threshold', type=float, default=10.0, help='percent change --compare reports as a regression')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'harness.db')
+        # Before anything imports app.database, which reads the path once
+        os.environ['SWASTIK_DB_PATH'] = db_path
+        os.environ['SWASTIK_MEDIA_DIR'] = os.path.join(tmp, 'media')
+        if args.db:
+            copy_database(args.db, db_path)
+        else:
+            seed.generate(db_path, seed.parse_rows(args.rows), seed=args.seed)
+        rows = seed.table_counts(db_path)
+        meta = environment()
+        started = time.perf_counter()
+        endpoints, uncovered = asyncio.run(_run(args, db_path))
+
+    output = {
+        "meta": {
+            **meta,
+            "seconds": round(time.perf_counter() - started, 1),
+            "db": args.db or f'generated:{args.rows}',
+            "rows": rows,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "uncovered": uncovered,
+        },
+        "endpoints": endpoints,
+    }
+    if uncovered:
+        print(f'\nRoutes without a scenario: {", ".join(uncovered)}')
+    write_results(output, args)
+
+if __name__ == '__main__':
+    main()
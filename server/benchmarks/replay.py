@@ -0,0 +1,231 @@
+"""Replay requests captured by app/capture.py against a copy of a database.
+
+Requests are sent in their recorded order, through the same in-process
+transport as benchmarks.harness. They keep their original spacing, divided by
+--speed; with --speed max they are sent as fast as --concurrency allows.
+Latency and throughput are reported per route, and requests whose status
+differs from the recorded one are counted, since those point to a database
+copy that does not match the trace. Take the copy from around the time the
+capture started. Run from the server directory:
+
+    python -m benchmarks.replay captures/ --db server-copy.db --speed 1
+    python -m benchmarks.replay captures/ --db server-copy.db --speed max --concurrency 16 --out replay.json
+"""
+import argparse
+import asyncio
+import gzip
+import itertools
+import json
+import os
+import tempfile
+import time
+from collections import Counter, defaultdict
+from . import harness, seed
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+ALL = '(all requests)'
+
+def _speed(value):
+    return 0.0 if value == 'max' else float(value)
+
+def trace_files(paths):
+    from app import capture
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.startswith(capture.FILE_PREFIX) and name.endswith(capture.FILE_SUFFIX))
+        else:
+            files.append(path)
+    return files
+
+def read_trace(files):
+    records = []
+    dropped = 0
+    for path in files:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            try:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if 'method' in record:
+                        records.append(record)
+                    else:
+                        dropped += record.get('dropped', 0)
+            except EOFError:
+                # The file of a process that is still running (or crashed) ends
+                # mid-stream; everything flushed before that point is usable
+                pass
+    records.sort(key=lambda record: record["ts"])
+    return records, dropped
+
+def route_name(app, method, path):
+    from starlette.routing import Match
+    scope = {"type": 'http', "method": method, "path": path, "root_path": ''}
+    for route in app.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return f'{method} {route.path}'
+    return f'{method} (unmatched)'
+
+class _Uploads:
+    # File bodies are not captured, only their size; these stand in for them.
+    # Every one is distinct so the media store does not deduplicate them.
+    def __init__(self):
+        self._counter = itertools.count()
+
+    def file(self, path, size):
+        n = next(self._counter)
+        if path.endswith('/customers/import'):
+            lines = ['Name,Phone']
+            while sum(len(line) + 1 for line in lines) < size:
+                lines.append(f'Replayed {n}-{len(lines)},6{n % 10000:04d}{len(lines):05d}')
+            return ('customers.csv', '\n'.join(lines) + '\n', 'text/csv')
+        return ('upload.png', PNG_SIGNATURE + n.to_bytes(8, 'big') + bytes(max(0, size - 16)), 'image/png')
+
+def build_request(record, uploads):
+    url = record["path"] + (f'?{record["query"]}' if record.get("query") else '')
+    request = {"url": url}
+    content_type = record.get("content_type") or ''
+    body = record.get("body")
+    if content_type.startswith('multipart/'):
+        request["files"] = {"file": uploads.file(record["path"], record.get("size", 0))}
+    elif body is not None and 'json' in content_type:
+        request["json"] = body
+    elif body is not None:
+        request["content"] = body.encode()
+        request["headers"] = {"content-type": content_type}
+    return request
+
+async def _replay(client, records, names, speed, concurrency):
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    mismatches = Counter()
+    lag = []
+    uploads = _Uploads()
+    pending = set()
+
+    async def send(name, record, request):
+        try:
+            started = time.perf_counter()
+            response = await client.request(record["method"], **request)
+            latencies[name].append(time.perf_counter() - started)
+            statuses[name][str(response.status_code)] += 1
+            if response.status_code != record["status"]:
+                mismatches[name] += 1
+        finally:
+            semaphore.release()
+
+    start = loop.time()
+    first = records[0]["ts"]
+    for name, record in zip(names, records):
+        request = build_request(record, uploads)
+        if speed:
+            due = start + (record["ts"] - first) / speed
+            if due > loop.time():
+                await asyncio.sleep(due - loop.time())
+        await semaphore.acquire()
+        if speed:
+            lag.append(max(0.0, loop.time() - due))
+        task = asyncio.create_task(send(name, record, request))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    await asyncio.gather(*pending)
+    return latencies, statuses, mismatches, lag, loop.time() - start
+
+async def _run(args, records, names):
+    import httpx
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://replay', timeout=None) as client:
+            return await _replay(client, records, names, args.speed, args.concurrency)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('trace', nargs='+', help='capture files or directories')
+    parser.add_argument('--db', required=True, help='database to replay against; it is copied, never modified')
+    parser.add_argument('--media-dir', help='media directory for the app (uploads are written here); defaults to an empty one')
+    parser.add_argument('--speed', type=_speed, default=1.0, help='1 = recorded pace, N = N times faster, max = no waiting')
+    parser.add_argument('--concurrency', type=int, default=32, help='most requests in flight')
+    parser.add_argument('--limit', type=int, help='replay only the first N requests')
+    parser.add_argument('--out', help='write results to this JSON file')
+    parser.add_argument('--compare', help='earlier results to compare against')
+    parser.add_argument('--threshold', type=float, default=10.0, help='percent change --compare reports as a regression')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'replay.db')
+        # Before anything imports app.config and app.database, which read them once
+        os.environ['SWASTIK_DB_PATH'] = db_path
+        os.environ['SWASTIK_MEDIA_DIR'] = args.media_dir or os.path.join(tmp, 'media')
+        os.environ['SWASTIK_CAPTURE_DIR'] = ''
+
+        files = trace_files(args.trace)
+        records, dropped = read_trace(files)
+        if args.limit:
+            records = records[:args.limit]
+        if not records:
+            parser.error('no requests in the trace')
+        harness.copy_database(args.db, db_path)
+        rows = seed.table_counts(db_path)
+        from app.main import app
+        names = [route_name(app, record["method"], record["path"]) for record in records]
+
+        meta = harness.environment()
+        print(f'{len(records)} requests over {records[-1]["ts"] - records[0]["ts"]:.0f}s from {len(files)} file(s)'
+              + (f', {dropped} dropped during capture' if dropped else ''))
+        latencies, statuses, mismatches, lag, elapsed = asyncio.run(_run(args, records, names))
+
+    recorded = defaultdict(list)
+    for name, record in zip(names, records):
+        recorded[name].append(record["ms"] / 1000)
+    endpoints = {}
+    harness.print_header()
+    for name in sorted(latencies, key=lambda name: -len(latencies[name])):
+        result = harness.summarize(latencies[name], statuses[name], elapsed)
+        result["status_mismatches"] = mismatches[name]
+        result["recorded_p50_ms"] = round(harness.percentile(sorted(recorded[name]), 50) * 1000, 3)
+        endpoints[name] = result
+        harness.print_row(name, result)
+    everything = harness.summarize(
+        [value for values in latencies.values() for value in values],
+        sum(statuses.values(), Counter()), elapsed
+    )
+    everything["status_mismatches"] = sum(mismatches.values())
+    endpoints[ALL] = everything
+    harness.print_row(ALL, everything)
+
+    lag.sort()
+    lag_p99_ms = round(harness.percentile(lag, 99) * 1000, 3) if lag else None
+    if everything["status_mismatches"]:
+        print(f'\n{everything["status_mismatches"]} response(s) had a different status than recorded; '
+              'the database copy may not match the trace')
+    if lag_p99_ms and lag_p99_ms > 100:
+        print(f'\nRequests were sent up to {lag_p99_ms:.0f} ms late (p99): the app could not keep up with '
+              f'--speed {args.speed:g} at --concurrency {args.concurrency}')
+
+    output = {
+        "meta": {
+            **meta,
+            "seconds": round(elapsed, 1),
+            "db": args.db,
+            "rows": rows,
+            "trace": files,
+            "trace_requests": len(records),
+            "trace_dropped": dropped,
+            "speed": args.speed or 'max',
+            "concurrency": args.concurrency,
+            "schedule_lag_p99_ms": lag_p99_ms,
+        },
+        "endpoints": endpoints,
+    }
+    harness.write_results(output, args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""Build a synthetic database of a given size for benchmarks.
+
+The same --seed and --rows always give the same data. Rows are spread over
+every table with some skew: a few customers hold most of the history, most
+certificates are completed and a small share are soft-deleted or walk-ins
+with no customer. Customer balances match their credit history, so
+app.reconcile reports no drift. Run from the server directory:
+
+    python -m benchmarks.seed --rows 100k --out bench-100k.db
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+# Share of --rows per table; customers and globals are sized separately
+TABLE_SHARES = {
+    'credithistory': 0.40,
+    'goldcertificate': 0.20,
+    'goldtest': 0.14,
+    'silvercertificate': 0.10,
+    'weightlosshistory': 0.10,
+    'photocertificate': 0.06,
+}
+CUSTOMER_SHARE = 0.02
+MIN_CUSTOMERS = 50
+# Zipf exponent for how entries are spread over customers
+CUSTOMER_SKEW = 1.1
+WALK_IN_SHARE = 0.1
+DELETED_SHARE = 0.01
+STATUS_WEIGHTS = {'completed': 88, 'pending': 8, 'cancelled': 4}
+PAYMENT_WEIGHTS = {'cash': 40, 'upi': 35, 'bill': 12, 'neft': 8, 'cheque': 5}
+CREDIT_SHARE = 0.55
+
+FIRST_NAMES = ['Ramesh', 'Suresh', 'Anita', 'Priya', 'Vikram', 'Kavita', 'Arjun', 'Meena', 'Rahul', 'Sunita',
+               'Deepak', 'Pooja', 'Manoj', 'Rekha', 'Sanjay', 'Neha', 'Amit', 'Geeta', 'Rajesh', 'Lakshmi']
+LAST_NAMES = ['Kumar', 'Sharma', 'Patel', 'Soni', 'Verma', 'Gupta', 'Jain', 'Agarwal', 'Mehta', 'Shah',
+              'Reddy', 'Nair', 'Iyer', 'Chopra', 'Malhotra', 'Bansal', 'Joshi', 'Rao', 'Das', 'Singh']
+ITEMS = ['Chain', 'Ring', 'Bangle', 'Necklace', 'Earrings', 'Bracelet', 'Pendant', 'Anklet', 'Coin', 'Bar']
+GLOBAL_KEYS = ['GoldRate', 'SilverRate', 'GSTRate', 'ShopName', 'ShopAddress', 'ShopPhone', 'InvoicePrefix',
+               'CertificateFooter', 'HallmarkCharge', 'TestingCharge', 'PhotoCharge', 'PrinterName']
+
+def parse_rows(value):
+    # 10k, 100k, 1M or a plain number
+    value = value.strip().lower()
+    scale = {'k': 1000, 'm': 1000000}.get(value[-1:], 1)
+    number = value[:-1] if scale > 1 else value
+    return int(float(number) * scale)
+
+class _Generator:
+    def __init__(self, rows, seed, end, days):
+        self.rng = random.Random(seed)
+        self.rows = rows
+        self.start = end - timedelta(days=days)
+        self.span = int((end - self.start).total_seconds())
+
+    def new_id(self):
+        # Same format as the schema default: upper(hex(randomblob(9)))
+        return f'{self.rng.getrandbits(72):018X}'
+
+    def timestamp(self, high=1.0):
+        offset = self.rng.randrange(int(self.span * high))
+        return (self.start + timedelta(seconds=offset)).strftime('%Y-%m-%d %H:%M:%S')
+
+    def weighted(self, weights, count):
+        return self.rng.choices(list(weights), weights=list(weights.values()), k=count)
+
+    def customers(self):
+        rng = self.rng
+        count = max(MIN_CUSTOMERS, int(self.rows * CUSTOMER_SHARE))
+        phones = rng.sample(range(10 ** 9), count)
+        rows = []
+        for i in range(count):
+            # Customers join early in the period, before most of their history
+            created = self.timestamp(0.1)
+            rows.append({
+                "Id": self.new_id(),
+                "Name": f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                "Phone": f'9{phones[i]:09d}' if rng.random() > 0.1 else None,
+                "Notes": 'Wholesale' if rng.random() < 0.05 else None,
+                "Disabled": 1 if rng.random() < 0.02 else 0,
+                "CreatedDate": created,
+            })
+        # Popularity is independent of when a customer joined
+        self.popular = [row["Id"] for row in rows]
+        rng.shuffle(self.popular)
+        self.popularity = list(itertools.accumulate(1 / (rank + 1) ** CUSTOMER_SKEW for rank in range(count)))
+        return rows
+
+    def pick_customers(self, count, walk_ins=False):
+        picked = self.rng.choices(self.popular, cum_weights=self.popularity, k=count)
+        if walk_ins:
+            picked = [None if self.rng.random() < WALK_IN_SHARE else customer_id for customer_id in picked]
+        return picked
+
+    def deleted_at(self, created):
+        return created if self.rng.random() < DELETED_SHARE else None
+
+    def ledger(self, customers):
+        # Entries are generated in time order so PreviousBalance and the final
+        # Balance follow the same rules as app/ledger.py; debits never take a
+        # balance below zero
+        count = int(self.rows * TABLE_SHARES['credithistory'])
+        entries = sorted(zip((self.timestamp() for _ in range(count)), self.pick_customers(count)))
+        modes = self.weighted(PAYMENT_WEIGHTS, count)
+        balances = {row["Id"]: 0.0 for row in customers}
+        rows = []
+        for (created, customer_id), mode in zip(entries, modes):
+            amount = round(self.rng.lognormvariate(8, 1.2), 2)
+            previous = balances[customer_id]
+            entry_type = 'credit' if previous < amount or self.rng.random() < CREDIT_SHARE else 'debit'
+            balances[customer_id] = round(previous + (amount if entry_type == 'credit' else -amount), 2)
+            rows.append((self.new_id(), customer_id, entry_type, amount, mode, previous, created, created))
+        for row in customers:
+            row["Balance"] = balances[row["Id"]]
+        return rows
+
+    def certificates(self, table):
+        rng = self.rng
+        count = int(self.rows * TABLE_SHARES[table])
+        customer_ids = self.pick_customers(count, walk_ins=True)
+        statuses = self.weighted(STATUS_WEIGHTS, count)
+        modes = self.weighted(PAYMENT_WEIGHTS, count)
+        taxed = table != 'goldtest'
+        rows = []
+        for customer_id, status, mode in zip(customer_ids, statuses, modes):
+            created = self.timestamp()
+            weight = round(rng.lognormvariate(2.5, 0.8), 3)
+            data = {"ItemName": rng.choice(ITEMS), "Weight": weight, "Purity": rng.choice([91.6, 87.5, 75.0, 99.9])}
+            total = round(weight * rng.uniform(40, 60), 2)
+            row = {
+                "Id": self.new_id(), "CustomerId": customer_id, "Status": status, "Data": json.dumps(data),
+                "ModeOfPayment": mode, "Total": total, "CreatedDate": created, "LastModifiedDate": created,
+                "DeletedAt": self.deleted_at(created),
+            }
+            if taxed:
+                gst = round(total * 0.03, 2) if mode == 'bill' else 0.0
+                row.update(GST=gst, TotalTax=gst, GSTBillNumber=f'GST-{rng.randrange(10 ** 6):06d}' if gst else None)
+            if table == 'photocertificate':
+                row["Media"] = None
+            rows.append(row)
+        return rows
+
+    def weight_loss(self):
+        count = int(self.rows * TABLE_SHARES['weightlosshistory'])
+        customer_ids = self.pick_customers(count)
+        modes = self.weighted(PAYMENT_WEIGHTS, count)
+        rows = []
+        for customer_id, mode in zip(customer_ids, modes):
+            created = self.timestamp()
+            rows.append((self.new_id(), customer_id, round(self.rng.uniform(5, 500), 2), mode, created, created, self.deleted_at(created)))
+        return rows
+
+def _insert_dicts(conn, table, rows):
+    if not rows:
+        return
+    columns = list(rows[0])
+    conn.executemany(
+        f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" for _ in columns)})',
+        (tuple(row[column] for column in columns) for row in rows)
+    )
+
+def generate(db_path, rows, seed=1, end=None, days=730):
+    from app import counts, database, migrate, reports, search
+    if os.path.exists(db_path):
+        raise FileExistsError(db_path)
+    generator = _Generator(rows, seed, end or datetime(2024, 12, 31), days)
+    conn = database.connect(db_path)
+    # A throwaway build: no need to survive a crash halfway through
+    conn.execute('PRAGMA synchronous = OFF')
+    migrate.apply(conn)
+
+    customers = generator.customers()
+    ledger = generator.ledger(customers)
+    for row in customers:
+        row["LastModifiedDate"] = row["CreatedDate"]
+    _insert_dicts(conn, 'customers', customers)
+    conn.executemany(
+        'INSERT INTO credithistory (Id, CustomerId, Type, Amount, ModeOfPayment, PreviousBalance, CreatedDate, LastModifiedDate) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        ledger
+    )
+    for table in ('goldcertificate', 'goldtest', 'silvercertificate', 'photocertificate'):
+        _insert_dicts(conn, table, generator.certificates(table))
+    conn.executemany(
+        'INSERT INTO weightlosshistory (Id, CustomerId, Amount, ModeOfPayment, CreatedDate, LastModifiedDate, DeletedAt) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+        generator.weight_loss()
+    )
+    conn.executemany(
+        'INSERT INTO globals (Id, Key, Value) VALUES (?, ?, ?)',
+        ((generator.new_id(), key, str(generator.rng.randrange(100, 10000))) for key in GLOBAL_KEYS)
+    )
+    conn.commit()
+
+    counts.ensure_counts(conn)
+    search.ensure_search_index(conn)
+    reports.ensure_revenue(conn)
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.close()
+
+def table_counts(db_path):
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = ['customers', *TABLE_SHARES, 'globals']
+        return {table: conn.execute(f'SELECT count(*) FROM {table}').fetchone()[0] for table in tables}
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='100k', help='total rows across all tables, e.g. 10k, 100k, 1M')
+    parser.add_argument('--out', required=True, help='database file to create')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--days', type=int, default=730, help='history length, ending 2024-12-31')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    generate(args.out, parse_rows(args.rows), seed=args.seed, days=args.days)
+    print(f'{args.out} built in {time.perf_counter() - started:.1f}s')
+    for table, count in table_counts(args.out).items():
+        print(f'{table:20} {count:>10}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,828 @@
+-- Tables and triggers added on top of the baseline: millisecond LastModifiedDate
+-- (distinct ETags for edits within one second), table versions, the customer
+-- search index, row counts, daily revenue rollups and balance checkpoints.
+-- The tables start empty and cost nothing to create; 0004 fills them for rows
+-- that existed before this migration.
+
+-- Millisecond precision so two edits within one second still get distinct ETags
+DROP TRIGGER IF EXISTS customers_update_lastmodified;
+CREATE TRIGGER IF NOT EXISTS customers_touch_lastmodified
+AFTER UPDATE ON customers
+FOR EACH ROW WHEN (NEW.LastModifiedDate = OLD.LastModifiedDate)
+BEGIN
+  UPDATE customers SET LastModifiedDate = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE Id = OLD.Id;
+END;
+
+DROP TRIGGER IF EXISTS credithistory_update_lastmodified;
+CREATE TRIGGER IF NOT EXISTS credithistory_touch_lastmodified
+AFTER UPDATE ON credithistory
+FOR EACH ROW WHEN (NEW.LastModifiedDate = OLD.LastModifiedDate)
+BEGIN
+  UPDATE credithistory SET LastModifiedDate = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE Id = OLD.Id;
+END;
+
+DROP TRIGGER IF EXISTS globals_update_lastmodified;
+CREATE TRIGGER IF NOT EXISTS globals_touch_lastmodified
+AFTER UPDATE ON globals
+FOR EACH ROW WHEN (NEW.LastModifiedDate = OLD.LastModifiedDate)
+BEGIN
+  UPDATE globals SET LastModifiedDate = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE Id = OLD.Id;
+END;
+
+DROP TRIGGER IF EXISTS goldcertificate_update_lastmodified;
+CREATE TRIGGER IF NOT EXISTS goldcertificate_touch_lastmodified
+AFTER UPDATE ON goldcertificate
+FOR EACH ROW WHEN (NEW.LastModifiedDate = OLD.LastModifiedDate)
+BEGIN
+  UPDATE goldcertificate SET LastModifiedDate = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE Id = OLD.Id;
+END;
+
+DROP TRIGGER IF EXISTS goldtest_update_lastmodified;
+CREATE TRIGGER IF NOT EXISTS goldtest_touch_lastmodified
+AFTER UPDATE ON goldtest
+FOR EACH ROW WHEN (NEW.LastModifiedDate = OLD.LastModifiedDate)
+BEGIN
+  UPDATE goldtest SET LastModifiedDate = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE Id = OLD.Id;
+END;
+
+DROP TRIGGER IF EXISTS photocertificate_update_lastmodified;
+CREATE TRIGGER IF NOT EXISTS photocertificate_touch_lastmodified
+AFTER UPDATE ON photocertificate
+FOR EACH ROW WHEN (NEW.LastModifiedDate = OLD.LastModifiedDate)
+BEGIN
+  UPDATE photocertificate SET LastModifiedDate = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE Id = OLD.Id;
+END;
+
+DROP TRIGGER IF EXISTS silvercertificate_update_lastmodified;
+CREATE TRIGGER IF NOT EXISTS silvercertificate_touch_lastmodified
+AFTER UPDATE ON silvercertificate
+FOR EACH ROW WHEN (NEW.LastModifiedDate = OLD.LastModifiedDate)
+BEGIN
+  UPDATE silvercertificate SET LastModifiedDate = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE Id = OLD.Id;
+END;
+
+DROP TRIGGER IF EXISTS weightlosshistory_update_lastmodified;
+CREATE TRIGGER IF NOT EXISTS weightlosshistory_touch_lastmodified
+AFTER UPDATE ON weightlosshistory
+FOR EACH ROW WHEN (NEW.LastModifiedDate = OLD.LastModifiedDate)
+BEGIN
+  UPDATE weightlosshistory SET LastModifiedDate = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE Id = OLD.Id;
+END;
+
+-- tableversions table: a counter bumped by triggers on every change to a table,
+-- used to validate in-process caches and list ETags cheaply
+CREATE TABLE IF NOT EXISTS tableversions (
+  TableName TEXT PRIMARY KEY NOT NULL,
+  Version INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS globals_version_insert
+AFTER INSERT ON globals
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('globals', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS globals_version_update
+AFTER UPDATE ON globals
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('globals', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS globals_version_delete
+AFTER DELETE ON globals
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('globals', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS customers_version_insert
+AFTER INSERT ON customers
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('customers', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS customers_version_update
+AFTER UPDATE ON customers
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('customers', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS customers_version_delete
+AFTER DELETE ON customers
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('customers', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS credithistory_version_insert
+AFTER INSERT ON credithistory
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('credithistory', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS credithistory_version_update
+AFTER UPDATE ON credithistory
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('credithistory', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS credithistory_version_delete
+AFTER DELETE ON credithistory
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('credithistory', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS goldcertificate_version_insert
+AFTER INSERT ON goldcertificate
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('goldcertificate', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS goldcertificate_version_update
+AFTER UPDATE ON goldcertificate
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('goldcertificate', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS goldcertificate_version_delete
+AFTER DELETE ON goldcertificate
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('goldcertificate', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS goldtest_version_insert
+AFTER INSERT ON goldtest
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('goldtest', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS goldtest_version_update
+AFTER UPDATE ON goldtest
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('goldtest', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS goldtest_version_delete
+AFTER DELETE ON goldtest
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('goldtest', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS photocertificate_version_insert
+AFTER INSERT ON photocertificate
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('photocertificate', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS photocertificate_version_update
+AFTER UPDATE ON photocertificate
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('photocertificate', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS photocertificate_version_delete
+AFTER DELETE ON photocertificate
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('photocertificate', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS silvercertificate_version_insert
+AFTER INSERT ON silvercertificate
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('silvercertificate', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS silvercertificate_version_update
+AFTER UPDATE ON silvercertificate
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('silvercertificate', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS silvercertificate_version_delete
+AFTER DELETE ON silvercertificate
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('silvercertificate', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS weightlosshistory_version_insert
+AFTER INSERT ON weightlosshistory
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('weightlosshistory', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS weightlosshistory_version_update
+AFTER UPDATE ON weightlosshistory
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('weightlosshistory', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS weightlosshistory_version_delete
+AFTER DELETE ON weightlosshistory
+BEGIN
+  INSERT INTO tableversions (TableName, Version) VALUES ('weightlosshistory', 1)
+  ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1;
+END;
+
+-- Customer search: trigram full-text index over Name and Phone (external content,
+-- kept in sync by triggers). Trigrams match any substring of 3+ characters, which
+-- covers name tokens, name prefixes and last-N-digit phone lookups.
+CREATE VIRTUAL TABLE IF NOT EXISTS customers_fts USING fts5(
+  Name, Phone, content='customers', content_rowid='rowid', tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS customers_fts_insert
+AFTER INSERT ON customers
+BEGIN
+  INSERT INTO customers_fts (rowid, Name, Phone) VALUES (NEW.rowid, NEW.Name, NEW.Phone);
+END;
+
+CREATE TRIGGER IF NOT EXISTS customers_fts_update
+AFTER UPDATE OF Name, Phone ON customers
+BEGIN
+  INSERT INTO customers_fts (customers_fts, rowid, Name, Phone) VALUES ('delete', OLD.rowid, OLD.Name, OLD.Phone);
+  INSERT INTO customers_fts (rowid, Name, Phone) VALUES (NEW.rowid, NEW.Name, NEW.Phone);
+END;
+
+CREATE TRIGGER IF NOT EXISTS customers_fts_delete
+AFTER DELETE ON customers
+BEGIN
+  INSERT INTO customers_fts (customers_fts, rowid, Name, Phone) VALUES ('delete', OLD.rowid, OLD.Name, OLD.Phone);
+END;
+
+-- rowcounts table: live (DeletedAt IS NULL) row counts kept up to date by triggers.
+-- CustomerId is '' for the table-wide count; the history tables also keep one
+-- row per customer. Rebuild with: python -m app.counts repair
+CREATE TABLE IF NOT EXISTS rowcounts (
+  TableName TEXT NOT NULL,
+  CustomerId TEXT NOT NULL DEFAULT '',
+  Count INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (TableName, CustomerId)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS customers_count_insert
+AFTER INSERT ON customers
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL)
+BEGIN
+  INSERT INTO rowcounts (TableName, CustomerId, Count) VALUES ('customers', '', 1)
+  ON CONFLICT (TableName, CustomerId) DO UPDATE SET Count = Count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS customers_count_softdelete
+AFTER UPDATE OF DeletedAt ON customers
+FOR EACH ROW WHEN (NEW.DeletedAt IS NOT NULL AND OLD.DeletedAt IS NULL)
+BEGIN
+  UPDATE rowcounts SET Count = Count - 1 WHERE TableName = 'customers' AND CustomerId = '';
+END;
+
+CREATE TRIGGER IF NOT EXISTS customers_count_restore
+AFTER UPDATE OF DeletedAt ON customers
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL AND OLD.DeletedAt IS NOT NULL)
+BEGIN
+  INSERT INTO rowcounts (TableName, CustomerId, Count) VALUES ('customers', '', 1)
+  ON CONFLICT (TableName, CustomerId) DO UPDATE SET Count = Count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS customers_count_delete
+AFTER DELETE ON customers
+FOR EACH ROW WHEN (OLD.DeletedAt IS NULL)
+BEGIN
+  UPDATE rowcounts SET Count = Count - 1 WHERE TableName = 'customers' AND CustomerId = '';
+END;
+
+CREATE TRIGGER IF NOT EXISTS credithistory_count_insert
+AFTER INSERT ON credithistory
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL)
+BEGIN
+  INSERT INTO rowcounts (TableName, CustomerId, Count) VALUES ('credithistory', '', 1)
+  ON CONFLICT (TableName, CustomerId) DO UPDATE SET Count = Count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS credithistory_count_softdelete
+AFTER UPDATE OF DeletedAt ON credithistory
+FOR EACH ROW WHEN (NEW.DeletedAt IS NOT NULL AND OLD.DeletedAt IS NULL)
+BEGIN
+  UPDATE rowcounts SET Count = Count - 1 WHERE TableName = 'credithistory' AND CustomerId = '';
+END;
+
+CREATE TRIGGER IF NOT EXISTS credithistory_count_restore
+AFTER UPDATE OF DeletedAt ON credithistory
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL AND OLD.DeletedAt IS NOT NULL)
+BEGIN
+  INSERT INTO rowcounts (TableName, CustomerId, Count) VALUES ('credithistory', '', 1)
+  ON CONFLICT (TableName, CustomerId) DO UPDATE SET Count = Count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS credithistory_count_delete
+AFTER DELETE ON credithistory
+FOR EACH ROW WHEN (OLD.DeletedAt IS NULL)
+BEGIN
+  UPDATE rowcounts SET Count = Count - 1 WHERE TableName = 'credithistory' AND CustomerId = '';
+END;
+
+CREATE TRIGGER IF NOT EXISTS credithistory_customer_count_insert
+AFTER INSERT ON credithistory
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL)
+BEGIN
+  INSERT INTO rowcounts (TableName, CustomerId, Count) VALUES ('credithistory', NEW.CustomerId, 1)
+  ON CONFLICT (TableName, CustomerId) DO UPDATE SET Count = Count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS credithistory_customer_count_update
+AFTER UPDATE OF DeletedAt, CustomerId ON credithistory
+FOR EACH ROW WHEN ((OLD.DeletedAt IS NULL) <> (NEW.DeletedAt IS NULL) OR OLD.CustomerId IS NOT NEW.CustomerId)
+BEGIN
+  UPDATE rowcounts SET Count = Count - 1
+  WHERE TableName = 'credithistory' AND CustomerId = OLD.CustomerId AND OLD.DeletedAt IS NULL;
+  INSERT INTO rowcounts (TableName, CustomerId, Count) SELECT 'credithistory', NEW.CustomerId, 1 WHERE NEW.DeletedAt IS NULL
+  ON CONFLICT (TableName, CustomerId) DO UPDATE SET Count = Count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS credithistory_customer_count_delete
+AFTER DELETE ON credithistory
+FOR EACH ROW WHEN (OLD.DeletedAt IS NULL)
+BEGIN
+  UPDATE rowcounts SET Count = Count - 1 WHERE TableName = 'credithistory' AND CustomerId = OLD.CustomerId;
+END;
+
+CREATE TRIGGER IF NOT EXISTS globals_count_insert
+AFTER INSERT ON globals
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL)
+BEGIN
+  INSERT INTO rowcounts (TableName, CustomerId, Count) VALUES ('globals', '', 1)
+  ON CONFLICT (TableName, CustomerId) DO UPDATE SET Count = Count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS globals_count_softdelete
+AFTER UPDATE OF DeletedAt ON globals
+FOR EACH ROW WHEN (NEW.DeletedAt IS NOT NULL AND OLD.DeletedAt IS NULL)
+BEGIN
+  UPDATE rowcounts SET Count = Count - 1 WHERE TableName = 'globals' AND CustomerId = '';
+END;
+
+CREATE TRIGGER IF NOT EXISTS globals_count_restore
+AFTER UPDATE OF DeletedAt ON globals
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL AND OLD.DeletedAt IS NOT NULL)
+BEGIN
+  INSERT INTO rowcounts (TableName, CustomerId, Count) VALUES ('globals', '', 1)
+  ON CONFLICT (TableName, CustomerId) DO UPDATE SET Count = Count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS globals_count_delete
+AFTER DELETE ON globals
+FOR EACH ROW WHEN (OLD.DeletedAt IS NULL)
+BEGIN
+  UPDATE rowcounts SET Count = Count - 1 WHERE TableName = 'globals' AND CustomerId = '';
+END;
+
+CREATE TRIGGER IF NOT EXISTS goldcertificate_count_insert
+AFTER INSERT ON goldcertificate
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL)
+BEGIN
+  INSERT INTO rowcounts (TableName, CustomerId, Count) VALUES ('goldcertificate', '', 1)
+  ON CONFLICT (TableName, CustomerId) DO UPDATE SET Count = Count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS goldcertificate_count_softdelete
+AFTER UPDATE OF DeletedAt ON goldcertificate
+FOR EACH ROW WHEN (NEW.DeletedAt IS NOT NULL AND OLD.DeletedAt IS NULL)
+BEGIN
+  UPDATE rowcounts SET Count = Count - 1 WHERE TableName = 'goldcertificate' AND CustomerId = '';
+END;
+
+CREATE TRIGGER IF NOT EXISTS goldcertificate_count_restore
+AFTER UPDATE OF DeletedAt ON goldcertificate
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL AND OLD.DeletedAt IS NOT NULL)
+BEGIN
+  INSERT INTO rowcounts (TableName, CustomerId, Count) VALUES ('goldcertificate', '', 1)
+  ON CONFLICT (TableName, CustomerId) DO UPDATE SET Count = Count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS goldcertificate_count_delete
+AFTER DELETE ON goldcertificate
+FOR EACH ROW WHEN (OLD.DeletedAt IS NULL)
+BEGIN
+  UPDATE rowcounts SET Count = Count - 1 WHERE TableName = 'goldcertificate' AND CustomerId = '';
+END;
+
+CREATE TRIGGER IF NOT EXISTS goldtest_count_insert
+AFTER INSERT ON goldtest
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL)
+BEGIN
+  INSERT INTO rowcounts (TableName, CustomerId, Count) VALUES ('goldtest', '', 1)
+  ON CONFLICT (TableName, CustomerId) DO UPDATE SET Count = Count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS goldtest_count_softdelete
+AFTER UPDATE OF DeletedAt ON goldtest
+FOR EACH ROW WHEN (NEW.DeletedAt IS NOT NULL AND OLD.DeletedAt IS NULL)
+BEGIN
+  UPDATE rowcounts SET Count = Count - 1 WHERE TableName = 'goldtest' AND CustomerId = '';
+END;
+
+CREATE TRIGGER IF NOT EXISTS goldtest_count_restore
+AFTER UPDATE OF DeletedAt ON goldtest
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL AND OLD.DeletedAt IS NOT NULL)
+BEGIN
+  INSERT INTO rowcounts (TableName, CustomerId, Count) VALUES ('goldtest', '', 1)
+  ON CONFLICT (TableName, CustomerId) DO UPDATE SET Count = Count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS goldtest_count_delete
+AFTER DELETE ON goldtest
+FOR EACH ROW WHEN (OLD.DeletedAt IS NULL)
+BEGIN
+  UPDATE rowcounts SET Count = Count - 1 WHERE TableName = 'goldtest' AND CustomerId = '';
+END;
+
+CREATE TRIGGER IF NOT EXISTS photocertificate_count_insert
+AFTER INSERT ON photocertificate
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL)
+BEGIN
+  INSERT INTO rowcounts (TableName, CustomerId, Count) VALUES ('photocertificate', '', 1)
+  ON CONFLICT (TableName, CustomerId) DO UPDATE SET Count = Count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS photocertificate_count_softdelete
+AFTER UPDATE OF DeletedAt ON photocertificate
+FOR EACH ROW WHEN (NEW.DeletedAt IS NOT NULL AND OLD.DeletedAt IS NULL)
+BEGIN
+  UPDATE rowcounts SET Count = Count - 1 WHERE TableName = 'photocertificate' AND CustomerId = '';
+END;
+
+CREATE TRIGGER IF NOT EXISTS photocertificate_count_restore
+AFTER UPDATE OF DeletedAt ON photocertificate
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL AND OLD.DeletedAt IS NOT NULL)
+BEGIN
+  INSERT INTO rowcounts (TableName, CustomerId, Count) VALUES ('photocertificate', '', 1)
+  ON CONFLICT (TableName, CustomerId) DO UPDATE SET Count = Count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS photocertificate_count_delete
+AFTER DELETE ON photocertificate
+FOR EACH ROW WHEN (OLD.DeletedAt IS NULL)
+BEGIN
+  UPDATE rowcounts SET Count = Count - 1 WHERE TableName = 'photocertificate' AND CustomerId = '';
+END;
+
+CREATE TRIGGER IF NOT EXISTS silvercertificate_count_insert
+AFTER INSERT ON silvercertificate
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL)
+BEGIN
+  INSERT INTO rowcounts (TableName, CustomerId, Count) VALUES ('silvercertificate', '', 1)
+  ON CONFLICT (TableName, CustomerId) DO UPDATE SET Count = Count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS silvercertificate_count_softdelete
+AFTER UPDATE OF DeletedAt ON silvercertificate
+FOR EACH ROW WHEN (NEW.DeletedAt IS NOT NULL AND OLD.DeletedAt IS NULL)
+BEGIN
+  UPDATE rowcounts SET Count = Count - 1 WHERE TableName = 'silvercertificate' AND CustomerId = '';
+END;
+
+CREATE TRIGGER IF NOT EXISTS silvercertificate_count_restore
+AFTER UPDATE OF DeletedAt ON silvercertificate
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL AND OLD.DeletedAt IS NOT NULL)
+BEGIN
+  INSERT INTO rowcounts (TableName, CustomerId, Count) VALUES ('silvercertificate', '', 1)
+  ON CONFLICT (TableName, CustomerId) DO UPDATE SET Count = Count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS silvercertificate_count_delete
+AFTER DELETE ON silvercertificate
+FOR EACH ROW WHEN (OLD.DeletedAt IS NULL)
+BEGIN
+  UPDATE rowcounts SET Count = Count - 1 WHERE TableName = 'silvercertificate' AND CustomerId = '';
+END;
+
+CREATE TRIGGER IF NOT EXISTS weightlosshistory_count_insert
+AFTER INSERT ON weightlosshistory
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL)
+BEGIN
+  INSERT INTO rowcounts (TableName, CustomerId, Count) VALUES ('weightlosshistory', '', 1)
+  ON CONFLICT (TableName, CustomerId) DO UPDATE SET Count = Count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS weightlosshistory_count_softdelete
+AFTER UPDATE OF DeletedAt ON weightlosshistory
+FOR EACH ROW WHEN (NEW.DeletedAt IS NOT NULL AND OLD.DeletedAt IS NULL)
+BEGIN
+  UPDATE rowcounts SET Count = Count - 1 WHERE TableName = 'weightlosshistory' AND CustomerId = '';
+END;
+
+CREATE TRIGGER IF NOT EXISTS weightlosshistory_count_restore
+AFTER UPDATE OF DeletedAt ON weightlosshistory
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL AND OLD.DeletedAt IS NOT NULL)
+BEGIN
+  INSERT INTO rowcounts (TableName, CustomerId, Count) VALUES ('weightlosshistory', '', 1)
+  ON CONFLICT (TableName, CustomerId) DO UPDATE SET Count = Count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS weightlosshistory_count_delete
+AFTER DELETE ON weightlosshistory
+FOR EACH ROW WHEN (OLD.DeletedAt IS NULL)
+BEGIN
+  UPDATE rowcounts SET Count = Count - 1 WHERE TableName = 'weightlosshistory' AND CustomerId = '';
+END;
+
+CREATE TRIGGER IF NOT EXISTS weightlosshistory_customer_count_insert
+AFTER INSERT ON weightlosshistory
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL)
+BEGIN
+  INSERT INTO rowcounts (TableName, CustomerId, Count) VALUES ('weightlosshistory', NEW.CustomerId, 1)
+  ON CONFLICT (TableName, CustomerId) DO UPDATE SET Count = Count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS weightlosshistory_customer_count_update
+AFTER UPDATE OF DeletedAt, CustomerId ON weightlosshistory
+FOR EACH ROW WHEN ((OLD.DeletedAt IS NULL) <> (NEW.DeletedAt IS NULL) OR OLD.CustomerId IS NOT NEW.CustomerId)
+BEGIN
+  UPDATE rowcounts SET Count = Count - 1
+  WHERE TableName = 'weightlosshistory' AND CustomerId = OLD.CustomerId AND OLD.DeletedAt IS NULL;
+  INSERT INTO rowcounts (TableName, CustomerId, Count) SELECT 'weightlosshistory', NEW.CustomerId, 1 WHERE NEW.DeletedAt IS NULL
+  ON CONFLICT (TableName, CustomerId) DO UPDATE SET Count = Count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS weightlosshistory_customer_count_delete
+AFTER DELETE ON weightlosshistory
+FOR EACH ROW WHEN (OLD.DeletedAt IS NULL)
+BEGIN
+  UPDATE rowcounts SET Count = Count - 1 WHERE TableName = 'weightlosshistory' AND CustomerId = OLD.CustomerId;
+END;
+
+-- revenuesettings: one row holding the offset of the shop's local time from
+-- UTC, in which CreatedDate is stored. app/reports.py sets it from
+-- SWASTIK_REPORT_UTC_OFFSET at startup.
+CREATE TABLE IF NOT EXISTS revenuesettings (
+  Id INTEGER PRIMARY KEY CHECK (Id = 1),
+  DayOffsetMinutes INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO revenuesettings (Id, DayOffsetMinutes) VALUES (1, 0);
+
+-- revenuedaily: live (DeletedAt IS NULL) totals per local day, table, payment
+-- mode and status, kept up to date by the *_revenue_* triggers so reports never
+-- scan the source tables. weightlosshistory has no status or tax columns: its
+-- Amount is recorded as Total with Status ''. Rebuild with: python -m app.reports rebuild
+CREATE TABLE IF NOT EXISTS revenuedaily (
+  Day TEXT NOT NULL,
+  TableName TEXT NOT NULL,
+  ModeOfPayment TEXT NOT NULL DEFAULT '',
+  Status TEXT NOT NULL DEFAULT '',
+  Count INTEGER NOT NULL DEFAULT 0,
+  Total REAL NOT NULL DEFAULT 0,
+  GST REAL NOT NULL DEFAULT 0,
+  TotalTax REAL NOT NULL DEFAULT 0,
+  PRIMARY KEY (Day, TableName, ModeOfPayment, Status)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS goldcertificate_revenue_insert
+AFTER INSERT ON goldcertificate
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL)
+BEGIN
+  INSERT INTO revenuedaily (Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax)
+  VALUES (date(NEW.CreatedDate, (SELECT DayOffsetMinutes FROM revenuesettings) || ' minutes'), 'goldcertificate', COALESCE(NEW.ModeOfPayment, ''), COALESCE(NEW.Status, ''), 1, COALESCE(NEW.Total, 0), COALESCE(NEW.GST, 0), COALESCE(NEW.TotalTax, 0))
+  ON CONFLICT (Day, TableName, ModeOfPayment, Status) DO UPDATE SET
+    Count = Count + excluded.Count, Total = Total + excluded.Total,
+    GST = GST + excluded.GST, TotalTax = TotalTax + excluded.TotalTax;
+END;
+
+CREATE TRIGGER IF NOT EXISTS goldcertificate_revenue_update
+AFTER UPDATE OF DeletedAt, CreatedDate, ModeOfPayment, Status, Total, GST, TotalTax ON goldcertificate
+FOR EACH ROW WHEN (OLD.DeletedAt IS NOT NEW.DeletedAt OR OLD.CreatedDate IS NOT NEW.CreatedDate OR OLD.ModeOfPayment IS NOT NEW.ModeOfPayment OR OLD.Status IS NOT NEW.Status OR OLD.Total IS NOT NEW.Total OR OLD.GST IS NOT NEW.GST OR OLD.TotalTax IS NOT NEW.TotalTax)
+BEGIN
+  INSERT INTO revenuedaily (Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax)
+  SELECT date(OLD.CreatedDate, (SELECT DayOffsetMinutes FROM revenuesettings) || ' minutes'), 'goldcertificate', COALESCE(OLD.ModeOfPayment, ''), COALESCE(OLD.Status, ''), -1, -COALESCE(OLD.Total, 0), -COALESCE(OLD.GST, 0), -COALESCE(OLD.TotalTax, 0) WHERE OLD.DeletedAt IS NULL
+  ON CONFLICT (Day, TableName, ModeOfPayment, Status) DO UPDATE SET
+    Count = Count + excluded.Count, Total = Total + excluded.Total,
+    GST = GST + excluded.GST, TotalTax = TotalTax + excluded.TotalTax;
+  INSERT INTO revenuedaily (Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax)
+  SELECT date(NEW.CreatedDate, (SELECT DayOffsetMinutes FROM revenuesettings) || ' minutes'), 'goldcertificate', COALESCE(NEW.ModeOfPayment, ''), COALESCE(NEW.Status, ''), 1, COALESCE(NEW.Total, 0), COALESCE(NEW.GST, 0), COALESCE(NEW.TotalTax, 0) WHERE NEW.DeletedAt IS NULL
+  ON CONFLICT (Day, TableName, ModeOfPayment, Status) DO UPDATE SET
+    Count = Count + excluded.Count, Total = Total + excluded.Total,
+    GST = GST + excluded.GST, TotalTax = TotalTax + excluded.TotalTax;
+END;
+
+CREATE TRIGGER IF NOT EXISTS goldcertificate_revenue_delete
+AFTER DELETE ON goldcertificate
+FOR EACH ROW WHEN (OLD.DeletedAt IS NULL)
+BEGIN
+  INSERT INTO revenuedaily (Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax)
+  VALUES (date(OLD.CreatedDate, (SELECT DayOffsetMinutes FROM revenuesettings) || ' minutes'), 'goldcertificate', COALESCE(OLD.ModeOfPayment, ''), COALESCE(OLD.Status, ''), -1, -COALESCE(OLD.Total, 0), -COALESCE(OLD.GST, 0), -COALESCE(OLD.TotalTax, 0))
+  ON CONFLICT (Day, TableName, ModeOfPayment, Status) DO UPDATE SET
+    Count = Count + excluded.Count, Total = Total + excluded.Total,
+    GST = GST + excluded.GST, TotalTax = TotalTax + excluded.TotalTax;
+END;
+
+CREATE TRIGGER IF NOT EXISTS silvercertificate_revenue_insert
+AFTER INSERT ON silvercertificate
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL)
+BEGIN
+  INSERT INTO revenuedaily (Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax)
+  VALUES (date(NEW.CreatedDate, (SELECT DayOffsetMinutes FROM revenuesettings) || ' minutes'), 'silvercertificate', COALESCE(NEW.ModeOfPayment, ''), COALESCE(NEW.Status, ''), 1, COALESCE(NEW.Total, 0), COALESCE(NEW.GST, 0), COALESCE(NEW.TotalTax, 0))
+  ON CONFLICT (Day, TableName, ModeOfPayment, Status) DO UPDATE SET
+    Count = Count + excluded.Count, Total = Total + excluded.Total,
+    GST = GST + excluded.GST, TotalTax = TotalTax + excluded.TotalTax;
+END;
+
+CREATE TRIGGER IF NOT EXISTS silvercertificate_revenue_update
+AFTER UPDATE OF DeletedAt, CreatedDate, ModeOfPayment, Status, Total, GST, TotalTax ON silvercertificate
+FOR EACH ROW WHEN (OLD.DeletedAt IS NOT NEW.DeletedAt OR OLD.CreatedDate IS NOT NEW.CreatedDate OR OLD.ModeOfPayment IS NOT NEW.ModeOfPayment OR OLD.Status IS NOT NEW.Status OR OLD.Total IS NOT NEW.Total OR OLD.GST IS NOT NEW.GST OR OLD.TotalTax IS NOT NEW.TotalTax)
+BEGIN
+  INSERT INTO revenuedaily (Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax)
+  SELECT date(OLD.CreatedDate, (SELECT DayOffsetMinutes FROM revenuesettings) || ' minutes'), 'silvercertificate', COALESCE(OLD.ModeOfPayment, ''), COALESCE(OLD.Status, ''), -1, -COALESCE(OLD.Total, 0), -COALESCE(OLD.GST, 0), -COALESCE(OLD.TotalTax, 0) WHERE OLD.DeletedAt IS NULL
+  ON CONFLICT (Day, TableName, ModeOfPayment, Status) DO UPDATE SET
+    Count = Count + excluded.Count, Total = Total + excluded.Total,
+    GST = GST + excluded.GST, TotalTax = TotalTax + excluded.TotalTax;
+  INSERT INTO revenuedaily (Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax)
+  SELECT date(NEW.CreatedDate, (SELECT DayOffsetMinutes FROM revenuesettings) || ' minutes'), 'silvercertificate', COALESCE(NEW.ModeOfPayment, ''), COALESCE(NEW.Status, ''), 1, COALESCE(NEW.Total, 0), COALESCE(NEW.GST, 0), COALESCE(NEW.TotalTax, 0) WHERE NEW.DeletedAt IS NULL
+  ON CONFLICT (Day, TableName, ModeOfPayment, Status) DO UPDATE SET
+    Count = Count + excluded.Count, Total = Total + excluded.Total,
+    GST = GST + excluded.GST, TotalTax = TotalTax + excluded.TotalTax;
+END;
+
+CREATE TRIGGER IF NOT EXISTS silvercertificate_revenue_delete
+AFTER DELETE ON silvercertificate
+FOR EACH ROW WHEN (OLD.DeletedAt IS NULL)
+BEGIN
+  INSERT INTO revenuedaily (Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax)
+  VALUES (date(OLD.CreatedDate, (SELECT DayOffsetMinutes FROM revenuesettings) || ' minutes'), 'silvercertificate', COALESCE(OLD.ModeOfPayment, ''), COALESCE(OLD.Status, ''), -1, -COALESCE(OLD.Total, 0), -COALESCE(OLD.GST, 0), -COALESCE(OLD.TotalTax, 0))
+  ON CONFLICT (Day, TableName, ModeOfPayment, Status) DO UPDATE SET
+    Count = Count + excluded.Count, Total = Total + excluded.Total,
+    GST = GST + excluded.GST, TotalTax = TotalTax + excluded.TotalTax;
+END;
+
+CREATE TRIGGER IF NOT EXISTS photocertificate_revenue_insert
+AFTER INSERT ON photocertificate
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL)
+BEGIN
+  INSERT INTO revenuedaily (Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax)
+  VALUES (date(NEW.CreatedDate, (SELECT DayOffsetMinutes FROM revenuesettings) || ' minutes'), 'photocertificate', COALESCE(NEW.ModeOfPayment, ''), COALESCE(NEW.Status, ''), 1, COALESCE(NEW.Total, 0), COALESCE(NEW.GST, 0), COALESCE(NEW.TotalTax, 0))
+  ON CONFLICT (Day, TableName, ModeOfPayment, Status) DO UPDATE SET
+    Count = Count + excluded.Count, Total = Total + excluded.Total,
+    GST = GST + excluded.GST, TotalTax = TotalTax + excluded.TotalTax;
+END;
+
+CREATE TRIGGER IF NOT EXISTS photocertificate_revenue_update
+AFTER UPDATE OF DeletedAt, CreatedDate, ModeOfPayment, Status, Total, GST, TotalTax ON photocertificate
+FOR EACH ROW WHEN (OLD.DeletedAt IS NOT NEW.DeletedAt OR OLD.CreatedDate IS NOT NEW.CreatedDate OR OLD.ModeOfPayment IS NOT NEW.ModeOfPayment OR OLD.Status IS NOT NEW.Status OR OLD.Total IS NOT NEW.Total OR OLD.GST IS NOT NEW.GST OR OLD.TotalTax IS NOT NEW.TotalTax)
+BEGIN
+  INSERT INTO revenuedaily (Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax)
+  SELECT date(OLD.CreatedDate, (SELECT DayOffsetMinutes FROM revenuesettings) || ' minutes'), 'photocertificate', COALESCE(OLD.ModeOfPayment, ''), COALESCE(OLD.Status, ''), -1, -COALESCE(OLD.Total, 0), -COALESCE(OLD.GST, 0), -COALESCE(OLD.TotalTax, 0) WHERE OLD.DeletedAt IS NULL
+  ON CONFLICT (Day, TableName, ModeOfPayment, Status) DO UPDATE SET
+    Count = Count + excluded.Count, Total = Total + excluded.Total,
+    GST = GST + excluded.GST, TotalTax = TotalTax + excluded.TotalTax;
+  INSERT INTO revenuedaily (Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax)
+  SELECT date(NEW.CreatedDate, (SELECT DayOffsetMinutes FROM revenuesettings) || ' minutes'), 'photocertificate', COALESCE(NEW.ModeOfPayment, ''), COALESCE(NEW.Status, ''), 1, COALESCE(NEW.Total, 0), COALESCE(NEW.GST, 0), COALESCE(NEW.TotalTax, 0) WHERE NEW.DeletedAt IS NULL
+  ON CONFLICT (Day, TableName, ModeOfPayment, Status) DO UPDATE SET
+    Count = Count + excluded.Count, Total = Total + excluded.Total,
+    GST = GST + excluded.GST, TotalTax = TotalTax + excluded.TotalTax;
+END;
+
+CREATE TRIGGER IF NOT EXISTS photocertificate_revenue_delete
+AFTER DELETE ON photocertificate
+FOR EACH ROW WHEN (OLD.DeletedAt IS NULL)
+BEGIN
+  INSERT INTO revenuedaily (Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax)
+  VALUES (date(OLD.CreatedDate, (SELECT DayOffsetMinutes FROM revenuesettings) || ' minutes'), 'photocertificate', COALESCE(OLD.ModeOfPayment, ''), COALESCE(OLD.Status, ''), -1, -COALESCE(OLD.Total, 0), -COALESCE(OLD.GST, 0), -COALESCE(OLD.TotalTax, 0))
+  ON CONFLICT (Day, TableName, ModeOfPayment, Status) DO UPDATE SET
+    Count = Count + excluded.Count, Total = Total + excluded.Total,
+    GST = GST + excluded.GST, TotalTax = TotalTax + excluded.TotalTax;
+END;
+
+CREATE TRIGGER IF NOT EXISTS goldtest_revenue_insert
+AFTER INSERT ON goldtest
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL)
+BEGIN
+  INSERT INTO revenuedaily (Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax)
+  VALUES (date(NEW.CreatedDate, (SELECT DayOffsetMinutes FROM revenuesettings) || ' minutes'), 'goldtest', COALESCE(NEW.ModeOfPayment, ''), COALESCE(NEW.Status, ''), 1, COALESCE(NEW.Total, 0), 0, 0)
+  ON CONFLICT (Day, TableName, ModeOfPayment, Status) DO UPDATE SET
+    Count = Count + excluded.Count, Total = Total + excluded.Total,
+    GST = GST + excluded.GST, TotalTax = TotalTax + excluded.TotalTax;
+END;
+
+CREATE TRIGGER IF NOT EXISTS goldtest_revenue_update
+AFTER UPDATE OF DeletedAt, CreatedDate, ModeOfPayment, Status, Total ON goldtest
+FOR EACH ROW WHEN (OLD.DeletedAt IS NOT NEW.DeletedAt OR OLD.CreatedDate IS NOT NEW.CreatedDate OR OLD.ModeOfPayment IS NOT NEW.ModeOfPayment OR OLD.Status IS NOT NEW.Status OR OLD.Total IS NOT NEW.Total)
+BEGIN
+  INSERT INTO revenuedaily (Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax)
+  SELECT date(OLD.CreatedDate, (SELECT DayOffsetMinutes FROM revenuesettings) || ' minutes'), 'goldtest', COALESCE(OLD.ModeOfPayment, ''), COALESCE(OLD.Status, ''), -1, -COALESCE(OLD.Total, 0), 0, 0 WHERE OLD.DeletedAt IS NULL
+  ON CONFLICT (Day, TableName, ModeOfPayment, Status) DO UPDATE SET
+    Count = Count + excluded.Count, Total = Total + excluded.Total,
+    GST = GST + excluded.GST, TotalTax = TotalTax + excluded.TotalTax;
+  INSERT INTO revenuedaily (Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax)
+  SELECT date(NEW.CreatedDate, (SELECT DayOffsetMinutes FROM revenuesettings) || ' minutes'), 'goldtest', COALESCE(NEW.ModeOfPayment, ''), COALESCE(NEW.Status, ''), 1, COALESCE(NEW.Total, 0), 0, 0 WHERE NEW.DeletedAt IS NULL
+  ON CONFLICT (Day, TableName, ModeOfPayment, Status) DO UPDATE SET
+    Count = Count + excluded.Count, Total = Total + excluded.Total,
+    GST = GST + excluded.GST, TotalTax = TotalTax + excluded.TotalTax;
+END;
+
+CREATE TRIGGER IF NOT EXISTS goldtest_revenue_delete
+AFTER DELETE ON goldtest
+FOR EACH ROW WHEN (OLD.DeletedAt IS NULL)
+BEGIN
+  INSERT INTO revenuedaily (Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax)
+  VALUES (date(OLD.CreatedDate, (SELECT DayOffsetMinutes FROM revenuesettings) || ' minutes'), 'goldtest', COALESCE(OLD.ModeOfPayment, ''), COALESCE(OLD.Status, ''), -1, -COALESCE(OLD.Total, 0), 0, 0)
+  ON CONFLICT (Day, TableName, ModeOfPayment, Status) DO UPDATE SET
+    Count = Count + excluded.Count, Total = Total + excluded.Total,
+    GST = GST + excluded.GST, TotalTax = TotalTax + excluded.TotalTax;
+END;
+
+CREATE TRIGGER IF NOT EXISTS weightlosshistory_revenue_insert
+AFTER INSERT ON weightlosshistory
+FOR EACH ROW WHEN (NEW.DeletedAt IS NULL)
+BEGIN
+  INSERT INTO revenuedaily (Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax)
+  VALUES (date(NEW.CreatedDate, (SELECT DayOffsetMinutes FROM revenuesettings) || ' minutes'), 'weightlosshistory', COALESCE(NEW.ModeOfPayment, ''), '', 1, COALESCE(NEW.Amount, 0), 0, 0)
+  ON CONFLICT (Day, TableName, ModeOfPayment, Status) DO UPDATE SET
+    Count = Count + excluded.Count, Total = Total + excluded.Total,
+    GST = GST + excluded.GST, TotalTax = TotalTax + excluded.TotalTax;
+END;
+
+CREATE TRIGGER IF NOT EXISTS weightlosshistory_revenue_update
+AFTER UPDATE OF DeletedAt, CreatedDate, ModeOfPayment, Amount ON weightlosshistory
+FOR EACH ROW WHEN (OLD.DeletedAt IS NOT NEW.DeletedAt OR OLD.CreatedDate IS NOT NEW.CreatedDate OR OLD.ModeOfPayment IS NOT NEW.ModeOfPayment OR OLD.Amount IS NOT NEW.Amount)
+BEGIN
+  INSERT INTO revenuedaily (Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax)
+  SELECT date(OLD.CreatedDate, (SELECT DayOffsetMinutes FROM revenuesettings) || ' minutes'), 'weightlosshistory', COALESCE(OLD.ModeOfPayment, ''), '', -1, -COALESCE(OLD.Amount, 0), 0, 0 WHERE OLD.DeletedAt IS NULL
+  ON CONFLICT (Day, TableName, ModeOfPayment, Status) DO UPDATE SET
+    Count = Count + excluded.Count, Total = Total + excluded.Total,
+    GST = GST + excluded.GST, TotalTax = TotalTax + excluded.TotalTax;
+  INSERT INTO revenuedaily (Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax)
+  SELECT date(NEW.CreatedDate, (SELECT DayOffsetMinutes FROM revenuesettings) || ' minutes'), 'weightlosshistory', COALESCE(NEW.ModeOfPayment, ''), '', 1, COALESCE(NEW.Amount, 0), 0, 0 WHERE NEW.DeletedAt IS NULL
+  ON CONFLICT (Day, TableName, ModeOfPayment, Status) DO UPDATE SET
+    Count = Count + excluded.Count, Total = Total + excluded.Total,
+    GST = GST + excluded.GST, TotalTax = TotalTax + excluded.TotalTax;
+END;
+
+CREATE TRIGGER IF NOT EXISTS weightlosshistory_revenue_delete
+AFTER DELETE ON weightlosshistory
+FOR EACH ROW WHEN (OLD.DeletedAt IS NULL)
+BEGIN
+  INSERT INTO revenuedaily (Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax)
+  VALUES (date(OLD.CreatedDate, (SELECT DayOffsetMinutes FROM revenuesettings) || ' minutes'), 'weightlosshistory', COALESCE(OLD.ModeOfPayment, ''), '', -1, -COALESCE(OLD.Amount, 0), 0, 0)
+  ON CONFLICT (Day, TableName, ModeOfPayment, Status) DO UPDATE SET
+    Count = Count + excluded.Count, Total = Total + excluded.Total,
+    GST = GST + excluded.GST, TotalTax = TotalTax + excluded.TotalTax;
+END;
+
+-- balancecheckpoints: a customer's running balance after a given credit history
+-- entry, at its ledger position (CreatedDate, rowid), written every
+-- STATEMENT_CHECKPOINT_INTERVAL entries by app/statements.py so an opening
+-- balance needs at most that many rows summed. Any change at or before a
+-- checkpoint's position deletes the checkpoints from there on; they are
+-- written again by the single writer after the next statement request.
+CREATE TABLE IF NOT EXISTS balancecheckpoints (
+  CustomerId TEXT NOT NULL,
+  CreatedDate DATETIME NOT NULL,
+  EntryRowid INTEGER NOT NULL,
+  Balance REAL NOT NULL,
+  PRIMARY KEY (CustomerId, CreatedDate, EntryRowid)
+) WITHOUT ROWID;
+
+-- Deleted entries count too: an earlier one can become the customer's first
+-- posting, whose PreviousBalance every checkpoint starts from
+CREATE TRIGGER IF NOT EXISTS credithistory_checkpoint_insert
+AFTER INSERT ON credithistory
+FOR EACH ROW
+BEGIN
+  DELETE FROM balancecheckpoints
+  WHERE CustomerId = NEW.CustomerId AND (CreatedDate, EntryRowid) >= (NEW.CreatedDate, NEW.rowid);
+END;
+
+CREATE TRIGGER IF NOT EXISTS credithistory_checkpoint_update
+AFTER UPDATE OF DeletedAt, CustomerId, Type, Amount, PreviousBalance, CreatedDate ON credithistory
+FOR EACH ROW
+BEGIN
+  DELETE FROM balancecheckpoints
+  WHERE CustomerId = OLD.CustomerId AND (CreatedDate, EntryRowid) >= (OLD.CreatedDate, OLD.rowid);
+  DELETE FROM balancecheckpoints
+  WHERE CustomerId = NEW.CustomerId AND (CreatedDate, EntryRowid) >= (NEW.CreatedDate, NEW.rowid);
+END;
+
+CREATE TRIGGER IF NOT EXISTS credithistory_checkpoint_delete
+AFTER DELETE ON credithistory
+FOR EACH ROW
+BEGIN
+  DELETE FROM balancecheckpoints
+  WHERE CustomerId = OLD.CustomerId AND (CreatedDate, EntryRowid) >= (OLD.CreatedDate, OLD.rowid);
+END;
@@ -0,0 +1,25 @@
+-- migrate: online
+-- Indexes for keyset pagination, short name searches and per-customer history.
+-- On a large database each takes a while to build, so this runs after startup;
+-- every statement is its own transaction, and until an index exists the
+-- queries that use it are only slower.
+
+-- Keyset pagination indexes: list endpoints walk (CreatedDate, Id) over live rows only
+CREATE INDEX IF NOT EXISTS idx_customers_createddate ON customers(CreatedDate, Id) WHERE DeletedAt IS NULL;
+CREATE INDEX IF NOT EXISTS idx_credithistory_createddate ON credithistory(CreatedDate, Id) WHERE DeletedAt IS NULL;
+CREATE INDEX IF NOT EXISTS idx_credithistory_customer_createddate ON credithistory(CustomerId, CreatedDate, Id) WHERE DeletedAt IS NULL;
+CREATE INDEX IF NOT EXISTS idx_goldcertificate_createddate ON goldcertificate(CreatedDate, Id) WHERE DeletedAt IS NULL;
+CREATE INDEX IF NOT EXISTS idx_goldtest_createddate ON goldtest(CreatedDate, Id) WHERE DeletedAt IS NULL;
+CREATE INDEX IF NOT EXISTS idx_photocertificate_createddate ON photocertificate(CreatedDate, Id) WHERE DeletedAt IS NULL;
+CREATE INDEX IF NOT EXISTS idx_silvercertificate_createddate ON silvercertificate(CreatedDate, Id) WHERE DeletedAt IS NULL;
+CREATE INDEX IF NOT EXISTS idx_weightlosshistory_createddate ON weightlosshistory(CreatedDate, Id) WHERE DeletedAt IS NULL;
+CREATE INDEX IF NOT EXISTS idx_weightlosshistory_customer_createddate ON weightlosshistory(CustomerId, CreatedDate, Id) WHERE DeletedAt IS NULL;
+
+-- Short (1-2 character) queries fall back to prefix range scans on Name
+CREATE INDEX IF NOT EXISTS idx_customers_name ON customers(Name COLLATE NOCASE) WHERE DeletedAt IS NULL;
+
+-- Whole per-customer history in ledger order, deleted entries included: the
+-- rowid every index ends with makes it (CustomerId, CreatedDate, rowid). It is
+-- a superset of the old CustomerId-only index, which goes once it exists.
+CREATE INDEX IF NOT EXISTS idx_credithistory_customer_history ON credithistory(CustomerId, CreatedDate);
+DROP INDEX IF EXISTS idx_credithistory_customerid;
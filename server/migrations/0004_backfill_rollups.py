@@ -0,0 +1,69 @@
+# migrate: online
+# Fills the tables of 0002 for rows that existed before it: row counts, the
+# customer search index and the daily revenue rollups. 0002's triggers keep
+# them current from then on, so each table is recomputed from scratch in a
+# transaction of its own, which the triggers cannot interleave with. Running
+# it again gives the same result. Each table's tableversions entry is bumped
+# with its rollup, so list and search ETags handed out meanwhile go stale.
+#
+# The SQL is spelled out here rather than taken from app/ so that this
+# migration keeps doing what its checksum says when that code changes.
+COUNTED_TABLES = [
+    'customers', 'credithistory', 'globals', 'goldcertificate',
+    'goldtest', 'photocertificate', 'silvercertificate', 'weightlosshistory'
+]
+PER_CUSTOMER_TABLES = ['credithistory', 'weightlosshistory']
+
+# table -> (amount, GST, total tax, status)
+REVENUE_SOURCES = {
+    'goldcertificate': ('Total', 'GST', 'TotalTax', 'Status'),
+    'silvercertificate': ('Total', 'GST', 'TotalTax', 'Status'),
+    'photocertificate': ('Total', 'GST', 'TotalTax', 'Status'),
+    'goldtest': ('Total', None, None, 'Status'),
+    'weightlosshistory': ('Amount', None, None, None),
+}
+
+def bump_version(conn, table):
+    conn.execute(
+        'INSERT INTO tableversions (TableName, Version) VALUES (?, 1) '
+        'ON CONFLICT (TableName) DO UPDATE SET Version = Version + 1',
+        (table,)
+    )
+
+def backfill_counts(runner):
+    for table in COUNTED_TABLES:
+        with runner.transaction() as conn:
+            conn.execute('DELETE FROM rowcounts WHERE TableName = ?', (table,))
+            conn.execute(
+                f"INSERT INTO rowcounts (TableName, CustomerId, Count) "
+                f"SELECT ?, '', COUNT(*) FROM {table} WHERE DeletedAt IS NULL",
+                (table,)
+            )
+            if table in PER_CUSTOMER_TABLES:
+                conn.execute(
+                    f'INSERT INTO rowcounts (TableName, CustomerId, Count) '
+                    f'SELECT ?, CustomerId, COUNT(*) FROM {table} WHERE DeletedAt IS NULL GROUP BY CustomerId',
+                    (table,)
+                )
+            bump_version(conn, table)
+
+def backfill_revenue(runner):
+    for table, (amount, gst, tax, status) in REVENUE_SOURCES.items():
+        with runner.transaction() as conn:
+            conn.execute('DELETE FROM revenuedaily WHERE TableName = ?', (table,))
+            conn.execute(
+                f"""INSERT INTO revenuedaily (Day, TableName, ModeOfPayment, Status, Count, Total, GST, TotalTax)
+                SELECT date(CreatedDate, (SELECT DayOffsetMinutes FROM revenuesettings) || ' minutes'), ?, COALESCE(ModeOfPayment, ''), {f"COALESCE({status}, '')" if status else "''"},
+                    COUNT(*), SUM(COALESCE({amount}, 0)), {f'SUM(COALESCE({gst}, 0))' if gst else '0'},
+                    {f'SUM(COALESCE({tax}, 0))' if tax else '0'}
+                FROM {table} WHERE DeletedAt IS NULL GROUP BY 1, 3, 4""",
+                (table,)
+            )
+            bump_version(conn, table)
+
+def migrate(runner):
+    backfill_counts(runner)
+    with runner.transaction() as conn:
+        conn.execute("INSERT INTO customers_fts (customers_fts) VALUES ('rebuild')")
+        bump_version(conn, 'customers')
+    backfill_revenue(runner)
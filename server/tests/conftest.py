@@ -0,0 +1,51 @@
+import os
+import tempfile
+
+# Settings are read when app.config is imported, so they are set before any
+# test module imports the app. Every test gets its own database file (see the
+# db_path fixture); these only keep the rest out of the working tree.
+_scratch = tempfile.mkdtemp(prefix='swastik-tests-')
+os.environ.setdefault('SWASTIK_DB_PATH', os.path.join(_scratch, 'unused.db'))
+os.environ.setdefault('SWASTIK_METRICS_DIR', os.path.join(_scratch, 'metrics'))
+os.environ.setdefault('SWASTIK_MEDIA_DIR', os.path.join(_scratch, 'media'))
+
+import pytest
+from app import aio, database, migrate, writer
+
+def _close_connections():
+    migrate.close()
+    writer.close()
+    aio.close_all()
+    database.close_all()
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / 'server.db')
+    monkeypatch.setattr(database, 'DB_PATH', path)
+    yield path
+    _close_connections()
+
+@pytest.fixture
+def db(db_path):
+    database.init_db()
+    with database.get_db() as conn:
+        yield conn
+
+@pytest.fixture
+def client(db_path):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+@pytest.fixture
+def customer(client):
+    def create(name='Test Customer', phone=None, balance=0):
+        create.count += 1
+        response = client.post('/api/v1/customers', json={
+            "Name": name, "Phone": phone or f'90000{create.count:05d}', "Balance": balance
+        })
+        assert response.status_code == 201, response.text
+        return response.json()
+    create.count = 0
+    return create
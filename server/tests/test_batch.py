@@ -0,0 +1,57 @@
+import pytest
+from fastapi import HTTPException
+from app import batch, database
+from app.schemas import GlobalSettingCreate
+
+def _certificates(client, items, mode):
+    return client.post('/api/v1/goldcertificate/batch', params={"mode": mode}, json=items)
+
+def _count(table):
+    with database.get_db() as conn:
+        return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+def test_atomic_batch_writes_nothing_when_an_item_fails(client, customer):
+    customer_id = customer()['Id']
+    items = [
+        {"CustomerId": customer_id, "ModeOfPayment": 'cash', "Total": 100},
+        {"CustomerId": customer_id, "ModeOfPayment": 'barter', "Total": 100},
+        {"CustomerId": 'MISSING', "ModeOfPayment": 'cash', "Total": 100},
+    ]
+    response = _certificates(client, items, 'atomic')
+    assert response.status_code == 400
+    results = response.json()['detail']['results']
+    assert [result['status'] for result in results] == ['error'] * 3
+    assert results[2]['detail'] == 'Customer not found'
+    assert _count('goldcertificate') == 0
+
+    response = _certificates(client, items, 'best_effort')
+    assert response.status_code == 201
+    assert (response.json()['created'], response.json()['failed']) == (1, 2)
+    assert _count('goldcertificate') == 1
+
+def test_credit_batch_chains_balances(client, customer):
+    first, second = customer(balance=100)['Id'], customer()['Id']
+    response = client.post('/api/v1/credithistory/batch', json=[
+        {"CustomerId": first, "Type": 'credit', "Amount": 50, "ModeOfPayment": 'cash'},
+        {"CustomerId": second, "Type": 'credit', "Amount": 10, "ModeOfPayment": 'upi'},
+        {"CustomerId": first, "Type": 'debit', "Amount": 30, "ModeOfPayment": 'cash'},
+    ])
+    assert response.status_code == 201, response.text
+    results = response.json()['results']
+    assert [(result['PreviousBalance'], result['Balance']) for result in results] == [(100, 150), (0, 10), (150, 120)]
+    assert client.get(f'/api/v1/customers/{first}').json()['Balance'] == 120
+
+def test_best_effort_isolates_constraint_failures_with_savepoints(db):
+    insert = batch.insert_rows('globals', ['Key', 'Value'])
+    no_customers = lambda db, accepted: {}
+    items = [{"Key": 'a', "Value": '1'}, {"Key": 'b', "Value": '2'}, {"Key": 'a', "Value": '3'}]
+
+    with pytest.raises(HTTPException) as error:
+        batch.run_batch(db, GlobalSettingCreate, items, 'atomic', insert, check=no_customers)
+    assert error.value.status_code == 400
+    assert db.execute('SELECT COUNT(*) FROM globals').fetchone()[0] == 0
+
+    report = batch.run_batch(db, GlobalSettingCreate, items, 'best_effort', insert, check=no_customers)
+    assert [result['status'] for result in report['results']] == ['created', 'created', 'error']
+    assert 'UNIQUE' in report['results'][2]['detail']
+    assert sorted(tuple(row) for row in db.execute('SELECT Key, Value FROM globals')) == [('a', '1'), ('b', '2')]
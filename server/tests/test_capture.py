@@ -0,0 +1,39 @@
+import gzip
+import json
+import time
+from urllib.parse import parse_qs
+from app import capture
+
+def _record(recorder, path, query='', body=None):
+    chunks = [json.dumps(body).encode()] if body is not None else []
+    recorder.record((
+        time.time(), 'POST' if body is not None else 'GET', path, query,
+        'application/json' if body is not None else '', False, chunks, sum(map(len, chunks)), 200, 1.0
+    ))
+
+def _lines(directory):
+    lines = []
+    for path in sorted(directory.iterdir()):
+        with gzip.open(path) as f:
+            lines.extend(json.loads(line) for line in f)
+    return lines
+
+def test_query_values_are_pseudonyms_unless_kept():
+    keep = capture._kept_query_names()
+    query = parse_qs(capture.redact_query('q=9876543210&page=2&limit=20&phone=9123456780', keep))
+    assert query['page'] == ['2'] and query['limit'] == ['20']
+    assert query['q'] == [capture.pseudonym('9876543210')]
+    assert query['phone'][0].startswith('~') and '9123456780' not in query['phone'][0]
+    assert capture.redact_query('page=2&include_total=false', keep) == 'page=2&include_total=false'
+
+def test_recorded_requests_leave_out_customer_details(tmp_path):
+    recorder = capture.Recorder(str(tmp_path))
+    _record(recorder, '/api/v1/customers/search', 'q=Ramesh+Kumar&limit=10')
+    _record(recorder, '/api/v1/customers', body={"Name": 'Ramesh Kumar', "Phone": '9876543210', "Balance": 500})
+    recorder.close()
+
+    search, create = _lines(tmp_path)
+    assert 'Ramesh' not in json.dumps(search) and parse_qs(search['query'])['limit'] == ['10']
+    assert create['body']['Balance'] == 500
+    assert create['body']['Name'] == capture.pseudonym('Ramesh Kumar')
+    assert '9876543210' not in json.dumps(create)
@@ -0,0 +1,53 @@
+from app import counts, database
+
+def _post(client, customer_id, amount):
+    response = client.post('/api/v1/credithistory', json={
+        "CustomerId": customer_id, "Type": 'credit', "Amount": amount, "ModeOfPayment": 'cash'
+    })
+    assert response.status_code == 201, response.text
+    return response.json()['Id']
+
+def _count(table, customer_id=''):
+    with database.get_db() as conn:
+        return counts.get_count(conn, table, customer_id)
+
+def test_counts_follow_inserts_and_soft_deletes(client, customer):
+    first, second = customer(name='First')['Id'], customer(name='Second')['Id']
+    assert _count('customers') == 2
+    entries = [_post(client, first, amount) for amount in (10, 20, 30)]
+    _post(client, second, 40)
+    assert _count('credithistory') == 4
+    assert (_count('credithistory', first), _count('credithistory', second)) == (3, 1)
+
+    assert client.delete(f'/api/v1/credithistory/{entries[0]}').status_code in (200, 204)
+    assert _count('credithistory') == 3 and _count('credithistory', first) == 2
+    assert client.delete(f'/api/v1/customers/{second}').status_code in (200, 204)
+    assert _count('customers') == 1
+    assert client.get('/api/v1/customers').json()['pagination']['total_records'] == 1
+
+def test_batch_inserts_are_counted(client, customer):
+    customer_id = customer()['Id']
+    response = client.post('/api/v1/credithistory/batch', json=[
+        {"CustomerId": customer_id, "Type": 'credit', "Amount": amount, "ModeOfPayment": 'cash'} for amount in (1, 2, 3)
+    ])
+    assert response.status_code in (200, 201), response.text
+    assert _count('credithistory') == 3 and _count('credithistory', customer_id) == 3
+    assert client.get(f'/api/v1/customers/{customer_id}/credithistory').json()['pagination']['total_records'] == 3
+
+def test_drift_is_found_and_rebuilt(client, customer):
+    customer_id = customer()['Id']
+    _post(client, customer_id, 10)
+    _post(client, customer_id, 20)
+    with database.get_db() as conn:
+        assert counts.verify_counts(conn) == []
+        conn.execute("UPDATE rowcounts SET Count = 7 WHERE TableName = 'credithistory' AND CustomerId = ?", (customer_id,))
+        conn.execute("DELETE FROM rowcounts WHERE TableName = 'customers'")
+        conn.commit()
+
+        assert counts.verify_counts(conn) == [
+            {"table": 'credithistory', "customer_id": customer_id, "stored": 7, "actual": 2},
+            {"table": 'customers', "customer_id": None, "stored": 0, "actual": 1},
+        ]
+        counts.rebuild_counts(conn)
+        assert counts.verify_counts(conn) == []
+        assert counts.get_count(conn, 'credithistory', customer_id) == 2 and counts.get_count(conn, 'customers') == 1
@@ -0,0 +1,50 @@
+import sqlite3
+import threading
+from app import config, database
+
+def test_connection_is_reused_per_thread(db_path):
+    with database.get_db() as first:
+        pass
+    with database.get_db() as second:
+        pass
+    assert first is second
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(database._thread_connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not first
+
+def test_pragmas(db_path):
+    with database.get_db() as conn:
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn.execute('PRAGMA foreign_keys').fetchone()[0] == 1
+        assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == config.SQLITE_BUSY_TIMEOUT_MS
+        assert conn.execute('PRAGMA cache_size').fetchone()[0] == config.SQLITE_CACHE_SIZE
+
+def test_open_transaction_is_rolled_back(db_path):
+    database.init_db()
+    with database.get_db() as conn:
+        conn.execute('BEGIN')
+        conn.execute("INSERT INTO customers (Name) VALUES ('left open')")
+    with database.get_db() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM customers WHERE Name = 'left open'").fetchone()[0] == 0
+
+def test_close_all_opens_new_connections(db_path):
+    with database.get_db() as before:
+        pass
+    database.close_all()
+    with database.get_db() as after:
+        assert after is not before
+        assert after.execute('SELECT 1').fetchone()[0] == 1
+
+def test_statements_are_only_timed_when_asked(tmp_path, monkeypatch):
+    conn = database.open_connection(str(tmp_path / 'plain.db'))
+    assert type(conn) is sqlite3.Connection
+    conn.close()
+
+    monkeypatch.setattr(config, 'SLOW_QUERY_MS', 100)
+    conn = database.open_connection(str(tmp_path / 'timed.db'))
+    assert isinstance(conn, database.Connection)
+    conn.close()
@@ -0,0 +1,33 @@
+def _revalidate(client, url, etag, **params):
+    return client.get(url, params=params, headers={"If-None-Match": etag})
+
+def test_detail_etag_changes_with_the_row(client, customer):
+    customer_id = customer()['Id']
+    url = f'/api/v1/customers/{customer_id}'
+    first = client.get(url)
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    response = _revalidate(client, url, etag)
+    assert response.status_code == 304 and response.content == b'' and response.headers['ETag'] == etag
+    # Each projection is its own representation
+    assert _revalidate(client, url, etag, fields='Name').status_code == 200
+
+    assert client.put(url, json={"Notes": 'changed'}).status_code == 200
+    response = _revalidate(client, url, etag)
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+    assert response.json()['Notes'] == 'changed'
+
+def test_list_etag_follows_the_table_version(client, customer):
+    customer(name='First')
+    url = '/api/v1/customers'
+    etag = client.get(url, params={"limit": 5}).headers['ETag']
+    assert etag.startswith('W/')
+
+    assert _revalidate(client, url, etag, limit=5).status_code == 304
+    assert _revalidate(client, url, etag, limit=6).status_code == 200
+    assert _revalidate(client, url, f'"other", {etag}', limit=5).status_code == 304
+
+    customer(name='Second')
+    response = _revalidate(client, url, etag, limit=5)
+    assert response.status_code == 200 and len(response.json()['data']) == 2
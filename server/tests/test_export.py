@@ -0,0 +1,21 @@
+import json
+from app import config, database
+
+def test_date_range_uses_local_days(client, customer, monkeypatch):
+    monkeypatch.setattr(config, 'REPORT_UTC_OFFSET_MINUTES', 330)
+    customer_id = customer()['Id']
+    for amount in (1, 2, 3, 4):
+        response = client.post('/api/v1/credithistory', json={
+            "CustomerId": customer_id, "Type": 'credit', "Amount": amount, "ModeOfPayment": 'cash'
+        })
+        assert response.status_code == 201, response.text
+    # 2024-05-01 in IST is 2024-04-30 18:30:00 to 2024-05-01 18:30:00 UTC
+    with database.get_db() as conn:
+        for created_date, amount in [('2024-04-30 18:29:59', 1), ('2024-04-30 18:30:00', 2),
+                                     ('2024-05-01 18:29:59', 3), ('2024-05-01 18:30:00', 4)]:
+            conn.execute('UPDATE credithistory SET CreatedDate = ? WHERE Amount = ?', (created_date, amount))
+        conn.commit()
+
+    response = client.get('/api/v1/credithistory/export', params={"format": 'ndjson', "from": '2024-05-01', "to": '2024-05-01'})
+    assert response.status_code == 200
+    assert [json.loads(line)['Amount'] for line in response.text.splitlines()] == [2, 3]
@@ -0,0 +1,69 @@
+import io
+from app import database, importer
+
+BOUNDARY = 'importboundary'
+
+def _multipart(data, filename='customers.csv', name='file'):
+    return (
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="note"\r\n\r\nhello\r\n'
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+        f'Content-Type: text/csv\r\n\r\n'
+    ).encode() + data + f'\r\n--{BOUNDARY}--\r\n'.encode()
+
+def _import(client, csv_text):
+    response = client.post('/api/v1/customers/import', files={"file": ('customers.csv', csv_text.encode(), 'text/csv')})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_duplicate_phones(client, customer, monkeypatch):
+    monkeypatch.setattr(importer, 'IMPORT_CHUNK_SIZE', 2)
+    customer(name='Already Here', phone='9000000001')
+    summary = _import(client, '\n'.join([
+        'Name,Phone,Balance',
+        'Existing Phone,9000000001,0',   # row 2
+        'Same Again,9000000001,0',       # row 3
+        'First,9000000002,10',           # row 4
+        'Second,9000000002,20',          # row 5: same chunk as row 4
+        'Third,9000000002,30',           # row 6: a later chunk
+        'No Phone,,5',                   # row 7
+        ',9000000003,5',                 # row 8: no name
+    ]))
+
+    assert summary['total_rows'] == 7 and summary['imported'] == 2 and summary['rejected'] == 5
+    assert [(error['row'], error['detail']) for error in summary['errors'][:4]] == [
+        (2, 'Phone number 9000000001 already exists'),
+        (3, 'Phone number 9000000001 already exists'),
+        (5, 'Phone number 9000000002 appears more than once in the file'),
+        (6, 'Phone number 9000000002 appears more than once in the file'),
+    ]
+    assert summary['errors'][4]['row'] == 8
+    with database.get_db() as conn:
+        assert conn.execute("SELECT Balance FROM customers WHERE Phone = '9000000002'").fetchone()[0] == 10
+
+def test_upload_is_parsed_as_it_arrives():
+    data = ('Name,Phone\n' + ''.join(f'Customer {i},98{i:08d}\n' for i in range(5000))).encode()
+    body = _multipart(data)
+    pieces = [body[i:i + 512] for i in range(0, len(body), 512)]
+    received = []
+
+    def receive():
+        if len(received) == len(pieces):
+            return b''
+        received.append(pieces[len(received)])
+        return received[-1]
+
+    upload = importer.Upload(f'multipart/form-data; boundary={BOUNDARY}', receive)
+    assert upload.filename == 'customers.csv'
+    rows = importer.read_rows(upload.filename, io.BufferedReader(upload, 1024))
+    assert next(rows) == (2, {"Name": 'Customer 0', "Phone": '9800000000'})
+    assert len(received) < len(pieces) / 10
+
+    assert sum(1 for _ in rows) == 4999
+    assert len(received) == len(pieces)
+
+def test_upload_must_be_a_form_with_a_file(client):
+    response = client.post('/api/v1/customers/import', content=b'Name\nA\n', headers={"Content-Type": 'text/csv'})
+    assert response.status_code == 415
+    response = client.post('/api/v1/customers/import', content=_multipart(b'Name\nA\n', name='other'),
+                           headers={"Content-Type": f'multipart/form-data; boundary={BOUNDARY}'})
+    assert response.status_code == 422
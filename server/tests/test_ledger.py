@@ -0,0 +1,71 @@
+import threading
+from app import database, ledger
+
+def test_concurrent_postings_lose_no_updates(client, customer):
+    customer_id = customer(balance=100)['Id']
+    errors = []
+
+    def post(thread_index):
+        try:
+            with database.get_db() as conn:
+                for i in range(25):
+                    entry_type = 'credit' if (thread_index + i) % 2 else 'debit'
+                    assert ledger.post_entry(conn, customer_id, entry_type, 10 if entry_type == 'credit' else 3, 'cash')
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=post, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+    with database.get_db() as conn:
+        entries = conn.execute(
+            "SELECT PreviousBalance, CASE WHEN Type = 'credit' THEN Amount ELSE -Amount END FROM credithistory "
+            'WHERE CustomerId = ? ORDER BY rowid',
+            (customer_id,)
+        ).fetchall()
+    assert len(entries) == 200
+    assert entries[0][0] == 100
+    # Postings were serialised: each one starts from the balance the previous one left
+    for (previous, amount), (following, _) in zip(entries, entries[1:]):
+        assert previous + amount == following
+    expected = 100 + sum(amount for _, amount in entries)
+    assert client.get(f'/api/v1/customers/{customer_id}').json()['Balance'] == expected
+
+def test_posting_returns_the_new_balance(client, customer):
+    customer_id = customer(balance=50)['Id']
+    response = client.post('/api/v1/credithistory', json={
+        "CustomerId": customer_id, "Type": 'debit', "Amount": 20, "ModeOfPayment": 'upi'
+    })
+    assert response.status_code == 201
+    assert response.json()['PreviousBalance'] == 50 and response.json()['Balance'] == 30
+
+    response = client.post('/api/v1/credithistory', json={
+        "CustomerId": 'MISSING', "Type": 'credit', "Amount": 20, "ModeOfPayment": 'upi'
+    })
+    assert response.status_code == 404
+
+def test_previous_balance_is_the_stored_balance(client, customer):
+    customer_id = customer()['Id']
+    for amount in (0.1, 0.2):
+        response = client.post('/api/v1/credithistory', json={
+            "CustomerId": customer_id, "Type": 'credit', "Amount": amount, "ModeOfPayment": 'cash'
+        })
+        assert response.status_code == 201
+    # Not (0.1 + 0.2) - 0.2, which is 0.10000000000000003
+    assert response.json()['PreviousBalance'] == 0.1
+    response = client.post('/api/v1/credithistory/batch', json=[
+        {"CustomerId": customer_id, "Type": 'credit', "Amount": 0.1, "ModeOfPayment": 'cash'},
+        {"CustomerId": customer_id, "Type": 'debit', "Amount": 0.2, "ModeOfPayment": 'cash'},
+    ])
+    results = response.json()['results']
+    with database.get_db() as conn:
+        stored = [row[0] for row in conn.execute(
+            'SELECT PreviousBalance FROM credithistory WHERE CustomerId = ? ORDER BY rowid', (customer_id,)
+        )]
+        balance = conn.execute('SELECT Balance FROM customers WHERE Id = ?', (customer_id,)).fetchone()[0]
+    assert stored == [0, 0.1, 0.1 + 0.2, 0.1 + 0.2 + 0.1]
+    assert balance == results[-1]['Balance'] == 0.1 + 0.2 + 0.1 - 0.2
@@ -0,0 +1,66 @@
+import hashlib
+import io
+import struct
+import zlib
+import pytest
+from app import config
+
+def _png(size=600):
+    # A gradient, so the image has something to scale
+    rows = b''.join(b'\x00' + bytes(value for x in range(size) for value in (x % 256, y % 256, (x ^ y) % 256))
+                    for y in range(size))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b''))
+
+def _upload(client, data):
+    response = client.post('/api/v1/media', files={"file": ('photo.png', data, 'image/png')})
+    assert response.status_code == 201, response.text
+    return response.json()['hash']
+
+def _certificate(client, **values):
+    return client.post('/api/v1/photocertificate', json={"ModeOfPayment": 'cash', "Total": 100, **values})
+
+def test_media_must_be_a_stored_hash(client):
+    digest = _upload(client, _png(8))
+    response = _certificate(client, Media=digest)
+    assert response.status_code == 201 and response.json()['Media'] == digest
+
+    assert _certificate(client, Media='data:image/png;base64,AAAA').status_code == 422
+    assert _certificate(client, Media=hashlib.sha256(b'never uploaded').hexdigest()).status_code == 422
+
+    certificate_id = response.json()['Id']
+    response = client.put(f'/api/v1/photocertificate/{certificate_id}', json={"Media": 'f' * 64})
+    assert response.status_code == 422
+
+def test_thumbnail_sizes(client):
+    pytest.importorskip('PIL')
+    from PIL import Image
+    digest = _upload(client, _png())
+
+    for size in (128, 256, 512):
+        response = client.get(f'/api/v1/media/{digest}/thumbnail', params={"size": size})
+        assert response.status_code == 200 and response.headers['content-type'] == 'image/jpeg'
+        assert max(Image.open(io.BytesIO(response.content)).size) == size
+    assert client.get(f'/api/v1/media/{digest}/thumbnail').status_code == 200
+    assert client.get(f'/api/v1/media/{digest}/thumbnail', params={"size": 300}).status_code == 422
+
+def test_upload_is_read_from_the_request_body(client, monkeypatch):
+    data = _png(300)
+    assert len(data) > 65536  # more than one body chunk
+    assert _upload(client, data) == hashlib.sha256(data).hexdigest()
+
+    assert client.post('/api/v1/media', content=data, headers={"content-type": 'image/png'}).status_code == 415
+    assert client.post('/api/v1/media', files={"other": ('photo.png', data, 'image/png')}).status_code == 422
+    monkeypatch.setattr(config, 'MEDIA_MAX_BYTES', 1000)
+    assert client.post('/api/v1/media', files={"file": ('photo.png', data, 'image/png')}).status_code == 413
+
+def test_attach_media_to_a_photo_certificate(client):
+    certificate_id = _certificate(client).json()['Id']
+    data = _png(8)
+    response = client.put(f'/api/v1/photocertificate/{certificate_id}/media', files={"file": ('photo.png', data, 'image/png')})
+    assert response.status_code == 200, response.text
+    assert response.json()['Media'] == hashlib.sha256(data).hexdigest()
+    assert client.get(f'/api/v1/media/{response.json()["Media"]}').content == data
@@ -0,0 +1,28 @@
+import json
+import os
+import subprocess
+import sys
+from app import metrics
+
+def _write(directory, pid, requests):
+    snap = dict(metrics.snapshot(), pid=pid, counters=[['http_requests_total', [['method', 'GET'], ['route', '/x'], ['status', '200']], requests]])
+    with open(os.path.join(directory, f'{pid}.json'), 'w') as f:
+        json.dump(snap, f)
+
+def _requests():
+    counters, _, _ = metrics.collect()
+    return sum(value for (name, labels), value in counters.items() if name == 'http_requests_total' and ('route', '/x') in labels)
+
+def test_snapshots_of_exited_processes_are_dropped_on_start(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics.config, 'METRICS_DIR', str(tmp_path))
+    directory = metrics.metrics_dir()
+    os.makedirs(directory)
+    exited = subprocess.Popen([sys.executable, '-c', ''])
+    exited.wait()
+    _write(directory, exited.pid, 5)
+    _write(directory, os.getppid(), 2)
+    assert _requests() == 7
+
+    metrics._remove_dead_workers()
+    assert sorted(os.listdir(directory)) == [f'{os.getppid()}.json']
+    assert _requests() == 2
@@ -0,0 +1,162 @@
+import os
+import shutil
+import sqlite3
+import threading
+from datetime import date
+import pytest
+from app import counts, database, migrate, reports, search
+from app.schemas import PaginationParams
+
+def _wait_for_background():
+    thread = migrate._background._thread
+    if thread is not None:
+        thread.join(timeout=60)
+        assert not thread.is_alive()
+
+def _objects(conn, kind):
+    return {row[0] for row in conn.execute('SELECT name FROM sqlite_master WHERE type = ?', (kind,))}
+
+def _baseline_database(path):
+    # A database from before the migrations: the original schema and some rows
+    with open(os.path.join(migrate.MIGRATIONS_DIR, '0001_baseline.sql')) as f:
+        baseline = f.read()
+    conn = sqlite3.connect(path)
+    conn.executescript(baseline)
+    conn.executemany('INSERT INTO customers (Id, Name, Phone, Balance, DeletedAt) VALUES (?, ?, ?, ?, ?)', [
+        ('C1', 'Ramesh Kumar', '9876543210', 500, None),
+        ('C2', 'Sita Devi', '9123456780', 0, None),
+        ('C3', 'Gone Away', '9000000000', 0, '2024-01-01 00:00:00'),
+    ])
+    conn.executemany(
+        'INSERT INTO credithistory (CustomerId, Type, Amount, ModeOfPayment, PreviousBalance, CreatedDate) VALUES (?, ?, ?, ?, ?, ?)', [
+            ('C1', 'credit', 300, 'cash', 0, '2024-05-01 10:00:00'),
+            ('C1', 'credit', 200, 'upi', 300, '2024-05-02 10:00:00'),
+            ('C2', 'debit', 50, 'cash', 50, '2024-05-03 10:00:00'),
+        ])
+    conn.executemany(
+        'INSERT INTO goldcertificate (CustomerId, ModeOfPayment, Status, Total, GST, TotalTax, CreatedDate) VALUES (?, ?, ?, ?, ?, ?, ?)', [
+            ('C1', 'cash', 'completed', 1000, 30, 60, '2024-05-01 10:00:00'),
+            ('C2', 'upi', 'pending', 400, 12, 24, '2024-05-01 11:00:00'),
+        ])
+    conn.commit()
+    conn.close()
+
+def test_new_database_is_migrated_before_serving(db_path):
+    database.init_db()
+    assert migrate._background._thread is None
+    with database.get_db() as conn:
+        assert migrate.user_version(conn) == migrate.latest_version()
+        assert migrate.verify(conn, migrate.discover()) == []
+        assert 'idx_customers_createddate' in _objects(conn, 'index')
+
+def test_startup_is_a_no_op_when_up_to_date(db_path, monkeypatch):
+    database.init_db()
+
+    def fail(*args):
+        raise AssertionError('migration files read on an up to date database')
+    monkeypatch.setattr(migrate, 'discover', fail)
+    database.init_db()
+
+def test_existing_database_is_upgraded(db_path):
+    _baseline_database(db_path)
+    database.init_db()
+
+    with database.get_db() as conn:
+        # Triggers and tables before serving; indexes and backfills after
+        triggers = _objects(conn, 'trigger')
+        assert 'customers_touch_lastmodified' in triggers
+        assert 'customers_update_lastmodified' not in triggers
+        assert 'revenuedaily' in _objects(conn, 'table')
+        assert migrate.user_version(conn) >= 2
+
+    _wait_for_background()
+
+    with database.get_db() as conn:
+        assert migrate.user_version(conn) == migrate.latest_version()
+        assert migrate.verify(conn, migrate.discover()) == []
+        indexes = _objects(conn, 'index')
+        assert 'idx_credithistory_customer_history' in indexes
+        assert 'idx_credithistory_customerid' not in indexes
+
+        assert counts.verify_counts(conn) == []
+        assert counts.get_count(conn, 'customers') == 2
+        assert counts.get_count(conn, 'credithistory', 'C1') == 2
+        assert reports.verify_revenue(conn) == []
+        rows, total = search.search_customers(conn, 'Ramesh', PaginationParams(page=1, limit=10, include_total=True))
+        assert total == 1 and rows[0]['Id'] == 'C1'
+
+def test_upgraded_database_is_correct_before_the_backfill(db_path):
+    _baseline_database(db_path)
+    migrations = migrate.discover()
+    with database.get_db() as conn:
+        # Everything up to the backfill, as if it were still running
+        migrate.apply(conn, [migration for migration in migrations if migration.version < migrate.ROLLUPS_VERSION])
+        assert not migrate.rollups_ready(conn)
+        assert conn.execute('SELECT COUNT(*) FROM rowcounts').fetchone()[0] == 0
+
+        assert counts.get_count(conn, 'customers') == 2
+        assert counts.get_count(conn, 'credithistory', 'C1') == 2
+        rows, total = search.search_customers(conn, 'Ramesh', PaginationParams(page=1, limit=10, include_total=True))
+        assert total == 1 and rows[0]['Id'] == 'C1'
+        before = reports.revenue_report(conn, date(2024, 5, 1), date(2024, 5, 31), group_by=('table',))
+        versions = dict(conn.execute('SELECT TableName, Version FROM tableversions').fetchall())
+
+        migrate.apply(conn, migrations)
+        assert migrate.rollups_ready(conn)
+        assert reports.revenue_report(conn, date(2024, 5, 1), date(2024, 5, 31), group_by=('table',)) == before
+        assert before['totals']['Total'] == 1400
+        # Cached list and search responses from before the backfill are stale now
+        after = dict(conn.execute('SELECT TableName, Version FROM tableversions').fetchall())
+        for table in ('customers', 'credithistory', 'goldcertificate'):
+            assert after[table] > versions.get(table, 0)
+
+def test_backfill_can_run_again(db_path):
+    _baseline_database(db_path)
+    database.init_db()
+    _wait_for_background()
+    with database.get_db() as conn:
+        backfill = next(migration for migration in migrate.discover() if migration.name == '0004_backfill_rollups.py')
+        conn.execute('DELETE FROM schema_version WHERE Version = ?', (backfill.version,))
+        conn.commit()
+        assert [migration.name for migration in migrate.apply(conn)] == [backfill.name]
+        assert counts.verify_counts(conn) == []
+        assert reports.verify_revenue(conn) == []
+
+def test_newer_database_is_refused(db_path):
+    database.init_db()
+    with database.get_db() as conn:
+        conn.execute(f'PRAGMA user_version = {migrate.latest_version() + 1}')
+    with pytest.raises(migrate.MigrationError):
+        database.init_db()
+
+def test_verify_reports_edited_migrations(db_path, tmp_path):
+    directory = tmp_path / 'migrations'
+    directory.mkdir()
+    shutil.copy(os.path.join(migrate.MIGRATIONS_DIR, '0001_baseline.sql'), directory)
+    (directory / '0002_note.sql').write_text("CREATE TABLE IF NOT EXISTS note (Text TEXT);\n")
+    with database.get_db() as conn:
+        migrate.apply(conn, migrate.discover(str(directory)))
+        assert migrate.verify(conn, migrate.discover(str(directory))) == []
+        (directory / '0002_note.sql').write_text("CREATE TABLE IF NOT EXISTS note (Text TEXT, More TEXT);\n")
+        assert migrate.verify(conn, migrate.discover(str(directory))) == ['0002_note.sql: changed after it was applied']
+
+def test_interrupted_online_migration_resumes(db_path, tmp_path):
+    directory = tmp_path / 'migrations'
+    directory.mkdir()
+    (directory / '0001_note.sql').write_text("CREATE TABLE note (Text TEXT);\n")
+    (directory / '0002_fill.sql').write_text(
+        "-- migrate: online\nINSERT INTO note VALUES ('a');\nCREATE INDEX IF NOT EXISTS idx_note ON note(Text);\n"
+    )
+    migrations = migrate.discover(str(directory))
+    stop = threading.Event()
+    stop.set()
+    with database.get_db() as conn:
+        with pytest.raises(migrate.Stopped):
+            migrate.apply(conn, migrations, stop=stop)
+        # The claim is given up, so the next run needn't wait for it to go stale
+        assert tuple(conn.execute('SELECT Owner, AppliedAt FROM schema_version WHERE Version = 2').fetchone()) == (None, None)
+        assert migrate.user_version(conn) == 1
+
+        assert migrate.apply(conn, migrations) == [migrations[1]]
+        assert migrate.user_version(conn) == 2
+        assert migrate.verify(conn, migrations) == []
@@ -0,0 +1,41 @@
+from app import database
+
+def _page(client, **params):
+    response = client.get('/api/v1/customers', params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_cursor_pages_cover_every_row_once(client, customer):
+    ids = [customer(name=f'Customer {i}')['Id'] for i in range(8)]
+    client.delete(f'/api/v1/customers/{ids.pop()}')
+    # Same timestamp everywhere: Id breaks the ties
+    with database.get_db() as conn:
+        conn.execute("UPDATE customers SET CreatedDate = '2024-05-01 10:00:00' WHERE Id IN (?, ?, ?)", ids[:3])
+        conn.commit()
+
+    pages = []
+    page = _page(client, limit=3)
+    assert page['pagination']['total_records'] == 7 and page['pagination']['total_pages'] == 3
+    while True:
+        pages.append([row['Id'] for row in page['data']])
+        cursor = page['pagination']['next_cursor']
+        if cursor is None:
+            break
+        page = _page(client, limit=3, cursor=cursor)
+        assert page['pagination']['current_page'] is None
+
+    assert [len(ids_on_page) for ids_on_page in pages] == [3, 3, 1]
+    walked = [row_id for ids_on_page in pages for row_id in ids_on_page]
+    assert sorted(walked) == sorted(ids)
+
+    # Cursor and offset paging agree
+    assert [row['Id'] for row in _page(client, limit=3, page=2)['data']] == pages[1]
+    with database.get_db() as conn:
+        expected = [row[0] for row in conn.execute(
+            'SELECT Id FROM customers WHERE DeletedAt IS NULL ORDER BY CreatedDate DESC, Id DESC'
+        )]
+    assert walked == expected
+
+def test_invalid_cursor(client):
+    assert client.get('/api/v1/customers', params={"cursor": 'not-a-cursor'}).status_code == 400
+    assert client.get('/api/v1/customers', params={"cursor": 'WzFd'}).status_code == 400
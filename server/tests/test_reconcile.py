@@ -0,0 +1,47 @@
+import threading
+from app import database, reconcile
+
+def _post(client, customer_id, entry_type, amount):
+    response = client.post('/api/v1/credithistory', json={
+        "CustomerId": customer_id, "Type": entry_type, "Amount": amount, "ModeOfPayment": 'cash'
+    })
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def test_drifted_balances_are_found_and_repaired(client, customer):
+    steady, drifted = customer(name='Steady')['Id'], customer(name='Drifted')['Id']
+    for customer_id in (steady, drifted):
+        _post(client, customer_id, 'credit', 500)
+        _post(client, customer_id, 'debit', 120)
+    # A direct edit and a deleted entry that did not reverse the balance
+    deleted = _post(client, drifted, 'credit', 40)
+    with database.get_db() as conn:
+        conn.execute("UPDATE customers SET Balance = Balance + 7 WHERE Id = ?", (drifted,))
+        conn.execute("UPDATE credithistory SET DeletedAt = CURRENT_TIMESTAMP WHERE Id = ?", (deleted['Id'],))
+        conn.commit()
+
+    report = client.get('/api/v1/admin/reconcile').json()
+    assert report['ledger_rows'] == 5 and report['customers_checked'] == 2
+    assert [(item['CustomerId'], item['ExpectedBalance'], item['Difference']) for item in report['drift']] == [(drifted, 380, 47)]
+
+    assert client.post('/api/v1/admin/reconcile').json()['repaired'] == 1
+    assert client.get('/api/v1/admin/reconcile').json()['drifted'] == 0
+    assert client.get(f'/api/v1/customers/{drifted}').json()['Balance'] == 380
+
+def test_repair_runs_on_the_writer(client, customer, monkeypatch):
+    customer_id = customer(name='Drifted')['Id']
+    _post(client, customer_id, 'credit', 100)
+    with database.get_db() as conn:
+        conn.execute("UPDATE customers SET Balance = Balance + 3 WHERE Id = ?", (customer_id,))
+        conn.commit()
+
+    threads = []
+    repair = reconcile.repair
+    def recording_repair(db, drift):
+        threads.append(threading.current_thread().name)
+        return repair(db, drift)
+    monkeypatch.setattr(reconcile, 'repair', recording_repair)
+
+    assert client.post('/api/v1/admin/reconcile').json()['repaired'] == 1
+    assert threads == ['sqlite-writer']
+    assert client.get(f'/api/v1/customers/{customer_id}').json()['Balance'] == 100
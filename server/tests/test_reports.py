@@ -0,0 +1,41 @@
+from datetime import date
+from app import config, reports
+
+def _customer(conn):
+    conn.execute("INSERT INTO customers (Id, Name) VALUES ('C1', 'Ramesh Kumar')")
+
+def _sale(conn, created_date, total=100, mode='cash'):
+    conn.execute(
+        'INSERT INTO goldcertificate (CustomerId, ModeOfPayment, Status, Total, GST, TotalTax, CreatedDate) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        ('C1', mode, 'completed', total, 3, 6, created_date)
+    )
+    conn.commit()
+
+def _days(conn):
+    report = reports.revenue_report(conn, date(2024, 4, 1), date(2024, 6, 30))
+    return {row['Day']: row['Total'] for row in report['rows']}
+
+def test_days_follow_the_configured_offset(db):
+    _customer(db)
+    assert config.REPORT_UTC_OFFSET_MINUTES == 330
+    # 20:00 UTC is 01:30 the next morning in India
+    _sale(db, '2024-05-01 20:00:00', 100)
+    _sale(db, '2024-05-01 10:00:00', 50)
+    assert _days(db) == {'2024-05-01': 50, '2024-05-02': 100}
+    assert reports.verify_revenue(db) == []
+
+def test_changing_the_offset_rebuilds_the_rollup(db, monkeypatch):
+    _customer(db)
+    _sale(db, '2024-05-01 20:00:00', 100)
+    _sale(db, '2024-05-01 10:00:00', 50)
+    assert not reports.sync_day_offset(db)
+
+    monkeypatch.setattr(config, 'REPORT_UTC_OFFSET_MINUTES', 0)
+    assert reports.sync_day_offset(db)
+    assert _days(db) == {'2024-05-01': 150}
+    assert reports.verify_revenue(db) == []
+
+    # Triggers use the new offset for sales recorded after the change
+    _sale(db, '2024-05-02 23:00:00', 10)
+    assert _days(db) == {'2024-05-01': 150, '2024-05-02': 10}
+    assert reports.verify_revenue(db) == []
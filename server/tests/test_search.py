@@ -0,0 +1,42 @@
+import pytest
+
+@pytest.fixture
+def people(customer):
+    return {
+        "ramesh": customer(name='Ramesh Kumar', phone='9876543210')['Id'],
+        "suresh": customer(name='Suresh Patel', phone='9123456789')['Id'],
+        "kumari": customer(name='Kumari Devi', phone='1098765432')['Id'],
+        "asha": customer(name='Asha Mehta', phone='8000000010')['Id'],
+    }
+
+def _search(client, q):
+    response = client.get('/api/v1/customers/search', params={"q": q})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body['pagination']['total_records'] == len(body['data'])
+    return [row['Id'] for row in body['data']]
+
+def test_substrings_match_through_the_trigram_index(client, people):
+    assert sorted(_search(client, 'uma')) == sorted([people['kumari'], people['ramesh']])
+    assert _search(client, 'esh kum') == [people['ramesh']]
+    assert sorted(_search(client, '5432')) == sorted([people['ramesh'], people['kumari']])
+    assert _search(client, 'nobody') == []
+
+def test_short_terms_match_name_and_phone_prefixes(client, people):
+    assert _search(client, 'Su') == [people['suresh']]
+    assert _search(client, 'r') == [people['ramesh']]
+    assert _search(client, '91') == [people['suresh']]
+
+def test_short_digits_match_the_end_of_the_phone(client, people):
+    # The last digits first, then the phone prefix
+    assert _search(client, '10') == [people['asha'], people['ramesh'], people['kumari']]
+    assert _search(client, '9') == [people['suresh'], people['ramesh']]
+
+def test_deleted_customers_are_not_found(client, people):
+    assert client.delete(f"/api/v1/customers/{people['ramesh']}").status_code in (200, 204)
+    assert _search(client, '10') == [people['asha'], people['kumari']]
+    assert _search(client, 'Ramesh') == []
+
+def test_name_prefixes_rank_before_other_matches(client, people):
+    assert _search(client, 'kum') == [people['kumari'], people['ramesh']]
+    assert _search(client, 'Kumar') == [people['kumari'], people['ramesh']]
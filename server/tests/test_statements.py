@@ -0,0 +1,100 @@
+from app import config, database, writer
+
+AMOUNTS = [('credit', 300), ('debit', 100), ('credit', 50), ('debit', 200), ('credit', 400),
+           ('debit', 25), ('credit', 75), ('debit', 300), ('credit', 10), ('credit', 90)]
+
+def _post_same_second(client, customer_id, amounts=AMOUNTS):
+    for entry_type, amount in amounts:
+        response = client.post('/api/v1/credithistory', json={
+            "CustomerId": customer_id, "Type": entry_type, "Amount": amount, "ModeOfPayment": 'cash'
+        })
+        assert response.status_code == 201, response.text
+    # Random Ids, one timestamp: only posting order (rowid) tells the entries apart
+    with database.get_db() as conn:
+        conn.execute("UPDATE credithistory SET CreatedDate = '2024-05-01 10:00:00' WHERE CustomerId = ?", (customer_id,))
+        conn.commit()
+
+def _statement(client, customer_id, **params):
+    response = client.get(f'/api/v1/customers/{customer_id}/statement', params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def _assert_chained(entries):
+    for entry in entries:
+        signed = entry['Amount'] if entry['Type'] == 'credit' else -entry['Amount']
+        assert entry['Balance'] == entry['PreviousBalance'] + signed
+    for entry, following in zip(entries, entries[1:]):
+        assert entry['Balance'] == following['PreviousBalance']
+
+def _wait_for_writer():
+    # Jobs run in order, so this returns once everything queued before it has
+    writer.call(lambda db: None)
+
+def test_entries_in_the_same_second_keep_posting_order(client, customer):
+    customer_id = customer()['Id']
+    _post_same_second(client, customer_id)
+
+    statement = _statement(client, customer_id)
+    entries = statement['entries']
+    assert [(entry['Type'], entry['Amount']) for entry in entries] == AMOUNTS
+    _assert_chained(entries)
+    assert statement['opening_balance'] == 0
+    assert statement['closing_balance'] == entries[-1]['Balance'] == 300
+    assert statement['total_credit'] == 925 and statement['total_debit'] == 625
+
+def test_checkpoints_are_written_by_the_writer(client, customer, monkeypatch):
+    monkeypatch.setattr(config, 'STATEMENT_CHECKPOINT_INTERVAL', 3)
+    customer_id = customer()['Id']
+    _post_same_second(client, customer_id)
+
+    before = _statement(client, customer_id)
+    _wait_for_writer()
+    with database.get_db() as conn:
+        checkpoints = conn.execute(
+            'SELECT EntryRowid, Balance FROM balancecheckpoints WHERE CustomerId = ? ORDER BY CreatedDate, EntryRowid',
+            (customer_id,)
+        ).fetchall()
+    assert [row[1] for row in checkpoints] == [before['entries'][i]['Balance'] for i in (2, 5, 8)]
+
+    # Balances read through the checkpoints match the ones computed without them
+    pages = []
+    cursor = None
+    while True:
+        page = _statement(client, customer_id, limit=4, **({"cursor": cursor} if cursor else {}))
+        pages.append(page['entries'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+        assert page['closing_balance'] == before['closing_balance']
+    assert [len(page) for page in pages] == [4, 4, 2]
+    assert [entry for page in pages for entry in page] == before['entries']
+
+def test_statement_is_paged(client, customer, monkeypatch):
+    monkeypatch.setattr(config, 'STATEMENT_PAGE_LIMIT', 4)
+    customer_id = customer()['Id']
+    _post_same_second(client, customer_id)
+
+    first = _statement(client, customer_id)
+    assert len(first['entries']) == 4 and first['next_cursor']
+    rest = _statement(client, customer_id, cursor=first['next_cursor'], limit=100)
+    assert rest['next_cursor'] is None
+    _assert_chained(first['entries'] + rest['entries'])
+
+    response = client.get(f'/api/v1/customers/{customer_id}/statement', params={"cursor": 'not-a-cursor'})
+    assert response.status_code == 400
+
+def test_date_range_uses_local_days(client, customer, monkeypatch):
+    monkeypatch.setattr(config, 'REPORT_UTC_OFFSET_MINUTES', 330)
+    customer_id = customer()['Id']
+    _post_same_second(client, customer_id, AMOUNTS[:4])
+    # 2024-05-01 in IST is 2024-04-30 18:30:00 to 2024-05-01 18:30:00 UTC
+    with database.get_db() as conn:
+        for created_date, amount in [('2024-04-30 18:29:59', 300), ('2024-04-30 18:30:00', 100),
+                                     ('2024-05-01 18:29:59', 50), ('2024-05-01 18:30:00', 200)]:
+            conn.execute('UPDATE credithistory SET CreatedDate = ? WHERE CustomerId = ? AND Amount = ?', (created_date, customer_id, amount))
+        conn.commit()
+
+    statement = _statement(client, customer_id, **{"from": '2024-05-01', "to": '2024-05-01'})
+    assert statement['opening_balance'] == 300
+    assert [entry['Amount'] for entry in statement['entries']] == [100, 50]
+    assert statement['closing_balance'] == 250
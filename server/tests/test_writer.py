@@ -0,0 +1,51 @@
+import threading
+import pytest
+from app import database, writer
+
+def _insert(db, key):
+    db.execute('INSERT INTO globals (Key, Value) VALUES (?, ?)', (key, 'x'))
+    return key
+
+def _insert_then_fail(db, key):
+    _insert(db, key)
+    raise ValueError(f'{key} failed')
+
+def _own_transaction(db, key):
+    # Write functions begin, commit and roll back themselves; in the writer
+    # that is the job's savepoint
+    db.execute('BEGIN IMMEDIATE')
+    _insert(db, key)
+    db.rollback()
+    return 'rolled back'
+
+def _keys():
+    with database.get_db() as conn:
+        return sorted(row[0] for row in conn.execute('SELECT Key FROM globals'))
+
+def test_failing_job_is_rolled_back_alone(db):
+    # Hold the writer so the next jobs are committed as one batch
+    release = threading.Event()
+    blocker = writer.submit(lambda db: release.wait(10))
+    futures = [
+        writer.submit(_insert, 'a'),
+        writer.submit(_insert_then_fail, 'b'),
+        writer.submit(_own_transaction, 'c'),
+        writer.submit(_insert, 'a'),
+        writer.submit(_insert, 'd'),
+    ]
+    release.set()
+    assert blocker.result(10) is True
+
+    assert futures[0].result(10) == 'a'
+    with pytest.raises(ValueError, match='b failed'):
+        futures[1].result(10)
+    assert futures[2].result(10) == 'rolled back'
+    with pytest.raises(Exception, match='UNIQUE'):
+        futures[3].result(10)
+    assert futures[4].result(10) == 'd'
+    assert _keys() == ['a', 'd']
+
+def test_call_returns_after_commit(db):
+    assert writer.call(_insert, 'e') == 'e'
+    # Visible to another connection as soon as call() returns
+    assert _keys() == ['e']